@@ -0,0 +1,314 @@
+"""Conversion of the graphics used by a document before it is compiled.
+
+SVG and EPS graphics are converted by the engine on every pass (which also
+requires shell escape) and large photos bloat the runtime and the size of the
+PDF. The operation in this module finds the graphics of the build copy,
+converts them once and points the build copy at the converted files.
+
+    - SVG and EPS graphics are converted to PDF.
+    - Raster graphics larger than the target resolution are downsampled.
+      Optionally, PNG files without transparency are stored as JPEG.
+
+Conversions run on a process pool and are cached under a hash of the source
+file, the converter, its settings and whether Pillow is installed. The
+converters are looked up by file extension in CONVERTERS and can be replaced
+with register_converter.
+
+Only the graphics of the main file are converted. Graphics of files loaded
+with \\input or \\include are used as they are, as these files are the
+sources of the project and are not rewritten.
+
+@author: Max Weise
+created: 19.10.2026
+"""
+
+from pipetex import cache
+from pipetex import events
+from pipetex import exceptions
+from pipetex import runlog
+from pipetex import texsource
+from pipetex.enums import SeverityLevels, ConfigDictKeys
+
+from collections.abc import Callable
+from typing import Any, Optional, Tuple
+
+import json
+import os
+import re
+import subprocess
+import tempfile
+
+try:
+    from PIL import Image
+    _HAS_PILLOW = True
+except ImportError:
+    _HAS_PILLOW = False
+
+
+# === Type Def ===
+Monad = Tuple[bool, Optional[exceptions.InternalException]]
+
+# A converter writes the converted source to the target path. It returns False
+# if the source can be used as it is and raises an exception if it fails.
+Converter = Callable[[str, str, dict[str, Any]], bool]
+
+CACHE_STAGE = "assets"
+
+DEFAULT_SETTINGS: dict[str, Any] = {
+    "target_dpi": 300,
+    "max_width_inches": 8.27,     # Width of an A4 page
+    "png_to_jpeg": False,
+    "jpeg_quality": 85
+}
+
+_GRAPHIC_PATTERN = re.compile(
+    r"\\(includegraphics|includesvg)(\s*\[[^\]]*\])?\s*\{([^}]+)\}"
+)
+
+# Marks graphics which the converter decided to use as they are
+_KEEP_SUFFIX = ".keep"
+
+
+# === Converters ===
+def _run_converter(argument_list: list[str]) -> None:
+    subprocess.run(argument_list, check=True, stdin=subprocess.DEVNULL,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def convert_svg(source: str, target: str, settings: dict[str, Any]) -> bool:
+    """Converts an SVG graphic to PDF using inkscape."""
+    _run_converter(["inkscape", source, "--export-type=pdf",
+                    f"--export-filename={target}"])
+    return True
+
+
+def convert_eps(source: str, target: str, settings: dict[str, Any]) -> bool:
+    """Converts an EPS graphic to PDF using epstopdf."""
+    _run_converter(["epstopdf", f"--outfile={target}", source])
+    return True
+
+
+def downsample_raster(source: str, target: str,
+                      settings: dict[str, Any]) -> bool:
+    """Scales a raster graphic down to the target resolution.
+
+    The resolution is measured against the maximum width of a graphic on the
+    page. Graphics which are small enough are used as they are. Requires
+    Pillow, without it all raster graphics are used as they are.
+    """
+    if not _HAS_PILLOW:
+        return False
+
+    max_pixels = int(settings["target_dpi"] * settings["max_width_inches"])
+    as_jpeg = target.endswith(".jpg")
+    change_format = as_jpeg and not source.lower().endswith((".jpg", ".jpeg"))
+
+    with Image.open(source) as image:
+        if max(image.size) <= max_pixels and not change_format:
+            return False
+
+        image.thumbnail((max_pixels, max_pixels))
+        if as_jpeg:
+            image.convert("RGB").save(target, "JPEG",
+                                      quality=settings["jpeg_quality"])
+        else:
+            image.save(target, optimize=True)
+
+    return True
+
+
+CONVERTERS: dict[str, tuple[Converter, str]] = {
+    ".svg": (convert_svg, ".pdf"),
+    ".eps": (convert_eps, ".pdf"),
+    ".png": (downsample_raster, ".png"),
+    ".jpg": (downsample_raster, ".jpg"),
+    ".jpeg": (downsample_raster, ".jpg"),
+}
+
+
+def register_converter(extension: str, converter: Converter,
+                       target_extension: str) -> None:
+    """Uses the converter for all graphics with the given extension.
+
+    The converter must be a module level function, so it can be sent to the
+    worker processes.
+
+    Args:
+        extension: Extension of the source graphics, including the dot.
+        converter: The function converting the graphics.
+        target_extension: Extension of the converted graphics.
+    """
+    CONVERTERS[extension.lower()] = (converter, target_extension)
+
+
+# === Discovery ===
+def _settings(config_dict: dict[str, Any]) -> dict[str, Any]:
+    return dict(DEFAULT_SETTINGS,
+                **config_dict.get(ConfigDictKeys.ASSET_SETTINGS.value) or {})
+
+
+def _target_extension(source: str, settings: dict[str, Any]) -> str:
+    extension = os.path.splitext(source)[1].lower()
+    _, target_extension = CONVERTERS[extension]
+    if extension == ".png" and settings["png_to_jpeg"] and _HAS_PILLOW:
+        with Image.open(source) as image:
+            if "A" not in image.getbands():
+                return ".jpg"
+
+    return target_extension
+
+
+# === Conversion ===
+def _convert(converter: Converter, source: str, key: str,
+             target_extension: str, settings: dict[str, Any]) -> str:
+    """Runs a converter in a worker process and stores its result.
+
+    Returns:
+        str: Path of the converted graphic or the source if the converter
+            decided that no conversion is needed. This decision is cached as
+            an empty marker entry.
+    """
+    with tempfile.TemporaryDirectory(prefix="pipetex-asset-") as build_dir:
+        target = os.path.join(build_dir, f"converted{target_extension}")
+        if converter(source, target, settings):
+            return cache.store(CACHE_STAGE, key, target, target_extension)
+
+        open(target, "wb").close()
+        cache.store(CACHE_STAGE, key, target, _KEEP_SUFFIX)
+        return source
+
+
+def convert_assets(file_name: str, config_dict: dict[str, Any]) -> Monad:
+    """Points the graphics of the file at converted, cached versions.
+
+    Args:
+        file_name: The name of the file to be compiled. Does not contain any
+            file extension.
+        config_dict: Dictionary containing further settings to run the engine.
+
+    Returns:
+        Monad: Tuple which contains a boolean to indicate success of the
+            function. If its true, the second value will be None. If its
+            false, the second value will contain an InternalException object
+            containing further information.
+
+    Raises:
+        InternalException: Indicates an internal error and is used to comunicate
+            exceptions and how to handle them back to the calling interface.
+            [Please see class definition]
+        Raised Levels: CRITICAL, LOW
+    """
+
+    if f"{file_name}.tex" not in os.listdir():
+        ex = exceptions.InternalException(
+            f"The file {file_name}.tex is not found in the current "
+            "working directory",
+            SeverityLevels.CRITICAL
+        )
+
+        return False, ex
+
+    with open(f"{file_name}.tex", "r", encoding="utf-8") as read_file:
+        content = read_file.read()
+
+    settings = _settings(config_dict)
+    folders = [""] + texsource.graphicspath_folders(content)
+
+    sources: dict[str, Optional[str]] = {}
+    for match in _GRAPHIC_PATTERN.finditer(content):
+        if not texsource.is_commented(content, match.start()):
+            sources[match.group(3)] = texsource.resolve_graphic(
+                match.group(3).strip(), folders
+            )
+
+    # Only graphics with a known converter are sent to the workers
+    jobs: dict[str, tuple[Converter, str, str, str]] = {}
+    for name, source in sources.items():
+        extension = os.path.splitext(source or "")[1].lower()
+        if source and extension in CONVERTERS:
+            converter, _ = CONVERTERS[extension]
+            target_extension = _target_extension(source, settings)
+            key = _conversion_key(source, converter, settings,
+                                  target_extension)
+            jobs[name] = (converter, source, key, target_extension)
+
+    converted, failed = _run_conversions(jobs, settings, config_dict)
+
+    def _replace(match: re.Match[str]) -> str:
+        name = match.group(3)
+        if (name not in converted or
+                texsource.is_commented(content, match.start())):
+            return match.group(0)
+
+        options = match.group(2) or ""
+        return f"\\includegraphics{options}{{{converted[name]}}}"
+
+    with open(f"{file_name}.tex", "w", encoding="utf-8") as write_file:
+        write_file.write(_GRAPHIC_PATTERN.sub(_replace, content))
+
+    if failed:
+        ex = exceptions.InternalException(
+            f"The graphics {', '.join(sorted(failed))} could not be "
+            "converted and are used as they are.",
+            SeverityLevels.LOW
+        )
+
+        return False, ex
+
+    return True, None
+
+
+def _conversion_key(source: str, converter: Converter,
+                    settings: dict[str, Any], target_extension: str) -> str:
+    """The cache key of a conversion.
+
+    A converter may keep a graphic as it is because Pillow is missing, so
+    that decision must not outlive the installation of Pillow.
+    """
+    return cache.digest(cache.file_digest(source), converter.__name__,
+                        json.dumps(settings, sort_keys=True),
+                        target_extension, "pillow" if _HAS_PILLOW else "")
+
+
+def _run_conversions(
+    jobs: dict[str, tuple[Converter, str, str, str]],
+    settings: dict[str, Any],
+    config_dict: dict[str, Any]
+) -> tuple[dict[str, str], set[str]]:
+    """Converts all graphics which are not cached on a process pool.
+
+    Returns:
+        tuple: The paths of the converted graphics keyed by the name used in
+            the tex file and the names of the graphics which failed.
+    """
+    converted: dict[str, str] = {}
+    pending: dict[str, tuple[Converter, str, str, str]] = {}
+    bus = events.bus_of(config_dict)
+
+    for name, (converter, source, key, target_extension) in jobs.items():
+        cached = cache.lookup(CACHE_STAGE, key, target_extension, bus)
+        if cached:
+            converted[name] = cached
+        elif not cache.lookup(CACHE_STAGE, key, _KEEP_SUFFIX, bus):
+            pending[name] = (converter, source, key, target_extension)
+
+    failed: set[str] = set()
+    if not pending:
+        return converted, failed
+
+    workers = config_dict.get(ConfigDictKeys.JOBS.value) or os.cpu_count()
+    with runlog.process_pool(workers) as pool:
+        futures = {name: pool.submit(_convert, *job, settings)
+                   for name, job in pending.items()}
+
+        for name, future in futures.items():
+            try:
+                path = future.result()
+            except Exception:   # Any failing converter keeps the original
+                failed.add(name)
+                continue
+
+            if path != pending[name][1]:
+                converted[name] = path
+
+    return converted, failed
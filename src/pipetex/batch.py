@@ -0,0 +1,171 @@
+"""Builds many documents in parallel, ordered by their predicted cost.
+
+The builds run in worker processes, each in the folder of its document. The
+order and the concurrency follow the predictions of history.py:
+
+    - The longest builds start first (longest processing time first). Short
+      builds fill the gaps at the end, which shortens the total runtime of
+      the batch compared to starting the builds in the given order.
+    - A build only starts if the predicted peak memory of all running builds
+      stays within the memory budget. A build which is larger than the
+      budget runs alone.
+
+All builds of a batch use the history database of the working directory of
+the batch, unless PIPETEX_HISTORY_DB says else.
+
+@author: Max Weise
+created: 19.10.2026
+"""
+
+from pipetex import buildlock
+from pipetex import exceptions
+from pipetex import history
+from pipetex import metrics
+from pipetex import pipeline
+from pipetex import runlog
+from pipetex.enums import SeverityLevels
+
+from concurrent.futures import Executor, Future, FIRST_COMPLETED, wait
+from collections.abc import Callable
+from typing import Any, Optional, Tuple
+
+import logging
+import os
+
+
+# === Type Def ===
+Monad = Tuple[bool, Optional[exceptions.InternalException]]
+# Result of a worker, exceptions are sent as severity level and message
+WorkerResult = Tuple[bool, Optional[int], Optional[str]]
+
+
+def _split_path(document: str) -> tuple[str, str]:
+    """Splits the path of a document into its folder and file name."""
+    if document.endswith(".tex"):
+        document = document[:-4]
+
+    return (os.path.abspath(os.path.dirname(document) or "."),
+            os.path.basename(document))
+
+
+def _build_document(work_dir: str, file_name: str, options: dict[str, Any],
+                    history_path: str) -> WorkerResult:
+    """Builds one document in a worker process."""
+    os.environ["PIPETEX_HISTORY_DB"] = history_path
+    os.chdir(work_dir)
+
+    p = pipeline.Pipeline(file_name, **options)
+    success, error = buildlock.run_coalesced(
+        file_name, options, lambda: p.execute(file_name)
+    )
+
+    return (success, error.severity_level if error else None,
+            error.message if error else None)
+
+
+def schedule_order(documents: list[str],
+                   predictions: dict[str, history.Prediction]) -> list[str]:
+    """Orders the documents by their predicted duration, longest first."""
+    return sorted(documents, key=lambda d: predictions[d].duration,
+                  reverse=True)
+
+
+def _next_admissible(pending: list[str],
+                     predictions: dict[str, history.Prediction],
+                     running_memory: int, is_idle: bool,
+                     memory_budget: Optional[int]) -> Optional[str]:
+    """Picks the first pending document which fits into the memory budget."""
+    for document in pending:
+        peak_rss = predictions[document].peak_rss
+        if (is_idle or not memory_budget or
+                running_memory + peak_rss <= memory_budget):
+            return document
+
+    return None
+
+
+def run_batch(documents: list[str],
+              options: dict[str, Any],
+              max_builds: Optional[int] = None,
+              memory_budget: Optional[int] = None,
+              executor_factory: Callable[[int], Executor] = (
+                  runlog.process_pool),
+              document_options: Optional[dict[str, dict[str, Any]]] = None
+              ) -> dict[str, Monad]:
+    """Builds the documents, scheduled by their predicted cost.
+
+    Args:
+        documents: Paths of the tex files, with or without extension.
+        options: Keyword options the pipelines are created with.
+        max_builds (optional): Number of builds running at the same time.
+            Defaults to the number of CPUs.
+        memory_budget (optional): Predicted peak memory of all running
+            builds in bytes. Unlimited if not given.
+        executor_factory (optional): Creates the pool running the builds
+            from the number of workers.
+        document_options (optional): Options of single documents, which
+            override the options of the batch.
+
+    Returns:
+        dict[str, Monad]: The result of each document.
+    """
+    logger = logging.getLogger("main.batch")
+    history_path = os.path.abspath(history.history_path())
+    paths = {document: _split_path(document) for document in documents}
+
+    predictions = history.predict(
+        [os.path.join(*paths[d]) for d in documents], history_path
+    )
+    predictions = {d: predictions[os.path.join(*paths[d])] for d in documents}
+
+    pending = schedule_order(documents, predictions)
+    running: dict[Future[WorkerResult], str] = {}
+    results: dict[str, Monad] = {}
+    running_memory = 0
+
+    with executor_factory(max_builds or os.cpu_count() or 1) as pool:
+        while pending or running:
+            while len(running) < (max_builds or os.cpu_count() or 1):
+                document = _next_admissible(pending, predictions,
+                                            running_memory, not running,
+                                            memory_budget)
+                if not document:
+                    break
+
+                pending.remove(document)
+                metrics.REGISTRY.set_queue_depth(len(pending))
+                metrics.REGISTRY.build_started()
+                running_memory += predictions[document].peak_rss
+                logger.info("Starting %s (predicted %r)", document,
+                            predictions[document])
+                running[pool.submit(
+                    _build_document, *paths[document],
+                    {**options, **(document_options or {}).get(document, {})},
+                    history_path
+                )] = document
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                document = running.pop(future)
+                running_memory -= predictions[document].peak_rss
+                results[document] = result_to_monad(future)
+                metrics.REGISTRY.build_finished(*results[document])
+
+    return results
+
+
+def result_to_monad(future: Future[WorkerResult]) -> Monad:
+    """Turns the result of a worker back into a Monad."""
+    try:
+        success, severity_level, message = future.result()
+    except Exception as e:
+        return False, exceptions.InternalException(
+            f"The build stopped unexpectedly: {e}", SeverityLevels.CRITICAL, e
+        )
+
+    if severity_level is None:
+        return success, None
+
+    return success, exceptions.InternalException(
+        message or "", SeverityLevels(severity_level)
+    )
@@ -0,0 +1,319 @@
+"""Reduction of large bibliography databases to the entries a document cites.
+
+Biber and bibtex read the whole .bib database on every build, even if the
+document cites a handful of its entries. The operation in this module writes
+a .bib file which only contains the cited entries (and the entries they link
+to through crossref and xdata) and points the bibliography tool at it.
+
+To find the entries quickly, every database is indexed once. The index maps
+each entry key to the position of the entry in the file and is cached until
+the database changes. Later builds only read the entries they need.
+
+@author: Max Weise
+created: 19.10.2026
+"""
+
+from pipetex import cache
+from pipetex import events
+from pipetex import exceptions
+from pipetex.enums import SeverityLevels
+
+from typing import Any, Optional, Tuple
+
+import json
+import os
+import re
+import tempfile
+
+
+# === Type Def ===
+Monad = Tuple[bool, Optional[exceptions.InternalException]]
+# Maps each key to the offset, length and linked keys of its entry
+EntryIndex = dict[str, tuple[int, int, list[str]]]
+
+CACHE_STAGE = "bibliography"
+
+_ENTRY_START_PATTERN = re.compile(rb"@\s*([A-Za-z]+)\s*([{(])")
+_DELIMITER_PATTERN = re.compile(rb"[{}()]")
+_LINK_PATTERN = re.compile(
+    rb"\b(?:crossref|xdata)\s*=\s*[{\"]([^}\"]*)[}\"]", re.IGNORECASE
+)
+
+_BCF_CITEKEY_PATTERN = re.compile(r"<bcf:citekey[^>]*>([^<]+)</bcf:citekey>")
+_BCF_DATASOURCE_PATTERN = re.compile(
+    r"<bcf:datasource([^>]*)>([^<]+)</bcf:datasource>"
+)
+_AUX_CITATION_PATTERN = re.compile(r"\\(?:citation|abx@aux@cite)"
+                                   r"(?:\{[^}]*\})?\{([^}]+)\}")
+_AUX_BIBDATA_PATTERN = re.compile(r"\\bibdata\{([^}]+)\}")
+_AUX_INPUT_PATTERN = re.compile(r"\\@input\{([^}]+)\}")
+
+# Entry types which are not referenced by a key but needed by all entries
+_MACRO_TYPES = {b"string", b"preamble"}
+
+
+# === Index ===
+def _entry_end(data: bytes, open_index: int) -> int:
+    """Finds the end of the entry whose delimiter opens at open_index."""
+    closing = b"}" if data[open_index:open_index + 1] == b"{" else b")"
+    depth = 0
+
+    for match in _DELIMITER_PATTERN.finditer(data, open_index + 1):
+        delimiter = match.group(0)
+        if depth == 0 and delimiter == closing:
+            return match.end()
+
+        if delimiter == b"{":
+            depth += 1
+        elif delimiter == b"}":
+            depth -= 1
+
+    return len(data)
+
+
+def build_index(bib_path: str) -> tuple[EntryIndex, list[tuple[int, int]]]:
+    """Reads a .bib file once and records the position of each entry.
+
+    Args:
+        bib_path: Path of the .bib file.
+
+    Returns:
+        tuple: The index of all keyed entries and the positions of all
+            @string and @preamble entries.
+    """
+    with open(bib_path, "rb") as bib_file:
+        data = bib_file.read()
+
+    entries: EntryIndex = {}
+    macros: list[tuple[int, int]] = []
+    position = 0
+
+    while match := _ENTRY_START_PATTERN.search(data, position):
+        entry_type = match.group(1).lower()
+        end = _entry_end(data, match.end() - 1)
+        position = end
+
+        if entry_type in _MACRO_TYPES:
+            macros.append((match.start(), end - match.start()))
+            continue
+
+        if entry_type == b"comment":
+            continue
+
+        key_end = data.find(b",", match.end(), end)
+        key = data[match.end():key_end].strip().decode("utf-8", "replace")
+        links = [link.strip().decode("utf-8", "replace")
+                 for found in _LINK_PATTERN.findall(data, match.end(), end)
+                 for link in found.split(b",") if link.strip()]
+
+        entries.setdefault(key, (match.start(), end - match.start(), links))
+
+    return entries, macros
+
+
+def load_index(
+    bib_path: str, bus: Optional[events.EventBus] = None
+) -> tuple[EntryIndex, list[tuple[int, int]]]:
+    """Returns the index of a .bib file, building it if it is not cached.
+
+    The index is cached under the path, size and modification time of the
+    file, so it is rebuilt whenever the database changes.
+    """
+    stat = os.stat(bib_path)
+    key = cache.digest(os.path.abspath(bib_path), str(stat.st_size),
+                       str(stat.st_mtime_ns))
+
+    cached = cache.lookup(CACHE_STAGE, key, ".json", bus)
+    if cached:
+        with open(cached, "r", encoding="utf-8") as index_file:
+            record = json.load(index_file)
+
+        return ({k: (v[0], v[1], v[2]) for k, v in record["entries"].items()},
+                [(m[0], m[1]) for m in record["macros"]])
+
+    entries, macros = build_index(bib_path)
+
+    with tempfile.NamedTemporaryFile("w", suffix=".json", encoding="utf-8",
+                                     delete=False) as tmp_file:
+        json.dump({"entries": entries, "macros": macros}, tmp_file)
+
+    cache.store(CACHE_STAGE, key, tmp_file.name, ".json")
+    os.remove(tmp_file.name)
+
+    return entries, macros
+
+
+def _resolve_links(cited: set[str], indices: list[EntryIndex]) -> set[str]:
+    """Adds all entries reachable through crossref and xdata links."""
+    needed: set[str] = set()
+    pending = list(cited)
+
+    while pending:
+        key = pending.pop()
+        if key in needed:
+            continue
+
+        needed.add(key)
+        for index in indices:
+            if key in index:
+                pending.extend(index[key][2])
+                break
+
+    return needed
+
+
+# === Aux files ===
+def _read_text(path: str) -> str:
+    if not os.path.isfile(path):
+        return ""
+
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        return f.read()
+
+
+def _read_aux(file_name: str) -> str:
+    """Reads the .aux file together with those of the included files.
+
+    Each included file writes its own .aux file, which the main .aux file
+    loads with an @input command.
+    """
+    texts: list[str] = []
+    pending = [f"{file_name}.aux"]
+    seen: set[str] = set()
+
+    while pending:
+        path = os.path.normpath(pending.pop())
+        if path in seen:
+            continue
+
+        seen.add(path)
+        text = _read_text(path)
+        texts.append(text)
+        pending.extend(_AUX_INPUT_PATTERN.findall(text))
+
+    return "\n".join(texts)
+
+
+def cited_keys(file_name: str) -> Optional[set[str]]:
+    """Reads the keys cited by the document from its .bcf and .aux files.
+
+    Returns:
+        Optional[set[str]]: The cited keys or None if the document cites the
+            whole database (nocite with a star).
+    """
+    keys: set[str] = set(_BCF_CITEKEY_PATTERN.findall(
+        _read_text(f"{file_name}.bcf")
+    ))
+
+    for found in _AUX_CITATION_PATTERN.findall(_read_aux(file_name)):
+        keys.update(key.strip() for key in found.split(","))
+
+    return None if "*" in keys else keys
+
+
+def bib_resources(file_name: str) -> list[str]:
+    """Reads the .bib files used by the document from its .bcf or .aux file."""
+    resources = [source for attributes, source
+                 in _BCF_DATASOURCE_PATTERN.findall(
+                     _read_text(f"{file_name}.bcf"))
+                 if 'datatype="bibtex"' in attributes]
+
+    for found in _AUX_BIBDATA_PATTERN.findall(_read_aux(file_name)):
+        resources.extend(os.path.splitext(name.strip())[0] + ".bib"
+                         for name in found.split(","))
+
+    return resources
+
+
+def _point_to_subset(file_name: str, subset_name: str) -> None:
+    """Replaces the databases in the .bcf and .aux file with the subset."""
+    bcf = _read_text(f"{file_name}.bcf")
+    if bcf:
+        replaced = False
+
+        def _datasource(match: re.Match[str]) -> str:
+            nonlocal replaced
+            if 'datatype="bibtex"' not in match.group(1):
+                return match.group(0)
+
+            if replaced:
+                return ""
+
+            replaced = True
+            return (f"<bcf:datasource{match.group(1)}>{subset_name}.bib"
+                    "</bcf:datasource>")
+
+        with open(f"{file_name}.bcf", "w", encoding="utf-8") as bcf_file:
+            bcf_file.write(_BCF_DATASOURCE_PATTERN.sub(_datasource, bcf))
+
+    aux = _read_text(f"{file_name}.aux")
+    if _AUX_BIBDATA_PATTERN.search(aux):
+        with open(f"{file_name}.aux", "w", encoding="utf-8") as aux_file:
+            aux_file.write(_AUX_BIBDATA_PATTERN.sub(
+                lambda _: f"\\bibdata{{{subset_name}}}", aux
+            ))
+
+
+def subset_bibliography(file_name: str, config_dict: dict[str, Any]) -> Monad:
+    """Writes a .bib file with the cited entries and points biber at it.
+
+    Must run after the first compilation, which writes the cited keys to the
+    .bcf and .aux file.
+
+    Args:
+        file_name: The name of the file to be compiled. Does not contain any
+            file extension.
+        config_dict: Dictionary containing further settings to run the engine.
+
+    Returns:
+        Monad: Tuple which contains a boolean to indicate success of the
+            function. If its true, the second value will be None. If its
+            false, the second value will contain an InternalException object
+            containing further information.
+
+    Raises:
+        InternalException: Indicates an internal error and is used to comunicate
+            exceptions and how to handle them back to the calling interface.
+            [Please see class definition]
+        Raised Levels: LOW
+    """
+    keys = cited_keys(file_name)
+    resources = bib_resources(file_name)
+
+    if keys is None or not resources:
+        # Nothing to reduce, the bibliography tool uses the full databases
+        return True, None
+
+    missing = [r for r in resources if not os.path.isfile(r)]
+    if missing:
+        ex = exceptions.InternalException(
+            f"The databases {', '.join(missing)} are not in the project. "
+            "The bibliography is created from the full databases.",
+            SeverityLevels.LOW
+        )
+
+        return False, ex
+
+    bus = events.bus_of(config_dict)
+    loaded = [(resource, *load_index(resource, bus))
+              for resource in resources]
+    needed = _resolve_links(keys, [entries for _, entries, _ in loaded])
+    subset_name = f"{file_name}-subset"
+
+    with open(f"{subset_name}.bib", "wb") as subset_file:
+        written: set[str] = set()
+        for resource, entries, macros in loaded:
+            selected = sorted(
+                list(macros) +
+                [entries[k][:2] for k in needed - written if k in entries]
+            )
+            written.update(k for k in needed if k in entries)
+
+            with open(resource, "rb") as bib_file:
+                for offset, length in selected:
+                    bib_file.seek(offset)
+                    subset_file.write(bib_file.read(length) + b"\n\n")
+
+    _point_to_subset(file_name, subset_name)
+
+    return True, None
@@ -0,0 +1,209 @@
+"""State of one run of a pipeline, shared by its operations.
+
+The operations used to share a plain dict keyed by the values of
+ConfigDictKeys. A BuildContext holds the same values in typed attributes
+and adds what a run needs to be independent of other runs in the same
+process:
+
+    - work_dir: The absolute folder of the document. The operations work with
+      paths relative to it.
+    - artifacts: The files created by each stage, see registry.Operation.
+    - timings: Label, duration, success and peak memory of each stage.
+
+For compatibility the context is also a mutable mapping with the keys of
+ConfigDictKeys, so operations written against the config dict keep working.
+Attributes which are None are not part of the mapping, like a key which was
+never set in the dict.
+
+The working directory is shared by all threads of a process. A run holds it
+while its operations execute, so several pipelines can run in threads of one
+process. While an engine runs, the working directory is handed to the other
+runs, see WorkingDirectory.lend. The engines, which take most of the time of
+a build, therefore run in parallel.
+
+@author: Max Weise
+created: 19.10.2026
+"""
+
+from pipetex.enums import ConfigDictKeys
+
+from collections.abc import Iterator, MutableMapping
+from typing import Any, Optional
+
+import contextlib
+import os
+import threading
+
+
+# === Type Def ===
+StageResult = tuple[str, float, bool, Optional[int]]
+
+# The mapping keys, each is an attribute of the context
+_KEYS = tuple(key.value for key in ConfigDictKeys)
+
+
+class WorkingDirectory:
+    """The working directory of the process, lent to one run at a time."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._owner: Optional[int] = None
+
+    @contextlib.contextmanager
+    def enter(self, path: str) -> Iterator[None]:
+        """Makes path the working directory of the calling thread.
+
+        Other threads entering a directory wait until the block is left. The
+        previous working directory is restored afterwards.
+        """
+        if self._owner == threading.get_ident():
+            previous_dir = os.getcwd()
+            os.chdir(path)
+            try:
+                yield
+            finally:
+                os.chdir(previous_dir)
+            return
+
+        with self._lock:
+            self._owner = threading.get_ident()
+            previous_dir = os.getcwd()
+            try:
+                os.chdir(path)
+                yield
+            finally:
+                os.chdir(previous_dir)
+                self._owner = None
+
+    @contextlib.contextmanager
+    def lend(self) -> Iterator[None]:
+        """Lets other threads enter a directory while the block runs.
+
+        The block must not use relative paths. Does nothing if the calling
+        thread did not enter a directory.
+        """
+        if self._owner != threading.get_ident():
+            yield
+            return
+
+        path = os.getcwd()
+        self._owner = None
+        self._lock.release()
+        try:
+            yield
+        finally:
+            self._lock.acquire()
+            self._owner = threading.get_ident()
+            os.chdir(path)
+
+
+WORKING_DIRECTORY = WorkingDirectory()
+
+
+class BuildContext(MutableMapping[str, Any]):
+    """Settings and results of one run of a pipeline.
+
+    The attributes named like the values of ConfigDictKeys are described
+    there and in Pipeline.__init__.
+
+    Attributes:
+        work_dir: Absolute folder of the document.
+        artifacts: Absolute paths of the files created by each stage, keyed
+            by the labels of planner.stage_labels.
+        timings: Label, duration, success and peak memory of the engines of
+            each stage which ran.
+    """
+
+    __slots__ = _KEYS + ("work_dir", "artifacts", "timings", "_extra")
+
+    new_name: Optional[str]
+    file_prefix: str
+    verbose: bool
+    quiet: Optional[bool]
+    include_only: list[str]
+    timeouts: dict[str, float]
+    cpu_limit: Optional[int]
+    memory_limit: Optional[int]
+    output_buffer_size: Optional[int]
+    tee_engine_output: Optional[bool]
+    engine_output: dict[str, str]
+    jobs: Optional[int]
+    asset_settings: dict[str, Any]
+    bib_backend: Optional[str]
+    events: Any
+    peak_rss: Optional[int]
+    variant: Optional[dict[str, Any]]
+    operations: Optional[list[str]]
+    source_date_epoch: Optional[int]
+    work_dir: str
+    artifacts: dict[str, list[str]]
+    timings: list[StageResult]
+    _extra: dict[str, Any]
+
+    def __init__(self, work_dir: Optional[str] = None, **values: Any) -> None:
+        """Creates the context of a run.
+
+        Args:
+            work_dir (optional): Folder of the document. Defaults to the
+                current working directory.
+            values: Initial values, keyed like the config dict.
+        """
+        for key in _KEYS:
+            setattr(self, key, None)
+
+        self.file_prefix = "[piped]"
+        self.verbose = False
+        self.include_only = []
+        self.timeouts = {}
+        self.engine_output = {}
+        self.asset_settings = {}
+
+        self.work_dir = os.path.abspath(work_dir or os.getcwd())
+        self.artifacts = {}
+        self.timings = []
+        self._extra = {}
+
+        self.update(values)
+
+    def __repr__(self) -> str:
+        return f"<BuildContext {self.work_dir}>"
+
+    def path(self, name: str) -> str:
+        """The absolute path of a file of the document."""
+        return os.path.join(self.work_dir, name)
+
+    def entered(self) -> contextlib.AbstractContextManager[None]:
+        """Makes the folder of the document the working directory."""
+        return WORKING_DIRECTORY.enter(self.work_dir)
+
+    # === Mapping of the config dict ===
+    def __getitem__(self, key: str) -> Any:
+        value = (getattr(self, key) if key in _KEYS
+                 else self._extra.get(key))
+        if value is None:
+            raise KeyError(key)
+
+        return value
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key in _KEYS:
+            setattr(self, key, value)
+        else:
+            self._extra[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        if key not in self:
+            raise KeyError(key)
+
+        if key in _KEYS:
+            setattr(self, key, None)
+        else:
+            del self._extra[key]
+
+    def __iter__(self) -> Iterator[str]:
+        yield from (key for key in _KEYS if getattr(self, key) is not None)
+        yield from (key for key, value in self._extra.items()
+                    if value is not None)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
@@ -0,0 +1,166 @@
+"""Per document build lock shared by all pipetex processes on a host.
+
+Concurrent builds of the same document fight over the same [piped]_ files in
+the working directory. Every build therefore takes an exclusive file lock for
+its document. A caller which finds the lock taken waits for the running build.
+If that build was started for the same input digest, the waiting caller
+receives its result instead of building the document a second time.
+
+The digest covers the options of the pipeline and the content of every input
+of the document which planner.project_inputs finds, i.e. the main tex file,
+the files it loads, its bibliographies and its graphics.
+
+File locks are only available on unix systems. On other platforms builds run
+without coordination.
+
+@author: Max Weise
+created: 19.10.2026
+"""
+
+from pipetex import buildcontext
+from pipetex import exceptions
+from pipetex import planner
+from pipetex.enums import SeverityLevels
+
+from collections.abc import Callable
+from typing import Any, Optional, Tuple
+
+import hashlib
+import json
+import logging
+import os
+import time
+
+try:
+    import fcntl
+    _HAS_FILE_LOCKS = True
+except ImportError:     # pragma: no cover - not available on windows
+    _HAS_FILE_LOCKS = False
+
+
+# === Type Def ===
+Monad = Tuple[bool, Optional[exceptions.InternalException]]
+
+LOCK_FOLDER = os.path.join(".pipetex", "locks")
+
+
+def input_digest(file_name: str, options: dict[str, Any]) -> str:
+    """Hashes the inputs of the document together with the pipeline options.
+
+    Args:
+        file_name: The name of the file to be compiled. Does not contain any
+            file extension.
+        options: Keyword options the pipeline is created with.
+
+    Returns:
+        str: Hex digest identifying the build. If the file does not exist,
+            only the options are hashed.
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps(options, sort_keys=True).encode("utf-8"))
+
+    inputs = planner.project_inputs(file_name)
+    for path in sorted(path for group in inputs.values() for path in group):
+        digest.update(path.encode("utf-8") + b"\0")
+        try:
+            with open(path, "rb") as input_file:
+                for chunk in iter(lambda: input_file.read(1 << 16), b""):
+                    digest.update(chunk)
+        except FileNotFoundError:
+            pass
+
+    return digest.hexdigest()
+
+
+def _write_result(result_path: str, digest: str, result: Monad) -> None:
+    """Stores the result of a build so waiting callers can pick it up."""
+    success, error = result
+    record = {
+        "digest": digest,
+        "finished": time.time(),
+        "success": success,
+        "severity_level": error.severity_level if error else None,
+        "message": error.message if error else None
+    }
+
+    tmp_path = f"{result_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as result_file:
+        json.dump(record, result_file)
+
+    os.replace(tmp_path, result_path)
+
+
+def _read_result(result_path: str, digest: str,
+                 not_before: float) -> Optional[Monad]:
+    """Loads the stored result if it belongs to a build of the same digest.
+
+    Results of builds which finished before the caller started to wait are
+    ignored, the inputs might have been changed back and forth since then.
+    """
+    try:
+        with open(result_path, "r", encoding="utf-8") as result_file:
+            record = json.load(result_file)
+    except (FileNotFoundError, ValueError):
+        return None
+
+    if record["digest"] != digest or record["finished"] < not_before:
+        return None
+
+    error = None
+    if record["severity_level"] is not None:
+        error = exceptions.InternalException(
+            record["message"],
+            SeverityLevels(record["severity_level"])
+        )
+
+    return record["success"], error
+
+
+def run_coalesced(file_name: str, options: dict[str, Any],
+                  build: Callable[[], Monad]) -> Monad:
+    """Runs a build while holding the lock of the document.
+
+    Args:
+        file_name: The name of the file to be compiled. Does not contain any
+            file extension.
+        options: Keyword options the pipeline is created with.
+        build: Executes the pipeline and returns its result.
+
+    Returns:
+        Monad: The result of the build. This is either the result of the
+            given build or of an equal build which ran at the same time.
+    """
+    if not _HAS_FILE_LOCKS:
+        return build()
+
+    logger = logging.getLogger("main.buildlock")
+    lock_folder = os.path.abspath(LOCK_FOLDER)
+    os.makedirs(lock_folder, exist_ok=True)
+    lock_name = os.path.basename(file_name)
+    lock_path = os.path.join(lock_folder, f"{lock_name}.lock")
+    result_path = os.path.join(lock_folder, f"{lock_name}.result")
+    digest = input_digest(file_name, options)
+
+    with open(lock_path, "a+", encoding="utf-8") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            logger.info(f"Waiting for a running build of {file_name}")
+            wait_started = time.time()
+            # The running build may be a pipeline of this process, which
+            # needs the working directory to finish
+            with buildcontext.WORKING_DIRECTORY.lend():
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+            result = _read_result(result_path, digest, wait_started)
+            if result:
+                logger.info(f"Reusing the result of the build of {file_name}")
+                return result
+
+        try:
+            result = build()
+            _write_result(result_path, digest, result)
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    return result
@@ -0,0 +1,397 @@
+"""Cache for build artifacts which are shared between builds.
+
+Stages which produce expensive artifacts (e.g. externalized figures) store
+them here under a key which is derived from everything the artifact depends
+on. A later build which computes the same key can use the stored artifact
+instead of producing it again.
+
+The cache lives in .pipetex/cache in the working directory. The environment
+variable PIPETEX_CACHE_DIR can be used to move it, e.g. to share it between
+several checkouts of a project. Entries are grouped in one folder per stage.
+
+The index of the cache (index.sqlite in the cache folder) records the
+content hash of every stored entry, so corrupted entries can be found, and
+the number of hits and misses of every stage. The lookups are counted in
+memory and written to the index once per pipeline run, see flush_lookups.
+The index is only a record, the cache works without it.
+
+The modification time of an entry is the time it was last used. gc evicts
+entries by age and, least recently used first, by the total size of the
+cache. Entries used in the last minutes are kept, as running builds may
+still read them.
+
+@author: Max Weise
+created: 19.10.2026
+"""
+
+from pipetex import events
+
+from typing import Optional, Union
+
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+
+CACHE_FOLDER = os.path.join(".pipetex", "cache")
+INDEX_FILE = "index.sqlite"
+
+# Entries used more recently than this many seconds are never evicted
+GC_GRACE_PERIOD = 300.0
+
+_INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    path TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    stored REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS lookups (
+    stage TEXT PRIMARY KEY,
+    hits INTEGER NOT NULL,
+    misses INTEGER NOT NULL
+);
+"""
+
+# Hits and misses of each cache and stage not written to the index yet
+_pending_lookups: dict[tuple[str, str], list[int]] = {}
+_pending_lock = threading.Lock()
+
+
+class CacheEntry:
+    """A file in the cache.
+
+    Attributes:
+        stage: Name of the stage owning the entry.
+        name: File name of the entry, its key and suffix.
+        path: Path of the file.
+        size: Size of the file in bytes.
+        last_used: Time the entry was stored or last looked up.
+    """
+
+    stage: str
+    name: str
+    path: str
+    size: int
+    last_used: float
+
+    def __init__(self, stage: str, name: str, path: str, size: int,
+                 last_used: float) -> None:
+        self.stage = stage
+        self.name = name
+        self.path = path
+        self.size = size
+        self.last_used = last_used
+
+    def __repr__(self) -> str:
+        return f"<CacheEntry {self.stage}/{self.name} ({self.size} bytes)>"
+
+    @property
+    def index_key(self) -> str:
+        """Key of the entry in the index of the cache."""
+        return f"{self.stage}/{self.name}"
+
+    @property
+    def is_partial(self) -> bool:
+        """True for temporary files of an unfinished or crashed store."""
+        return self.name.endswith(".tmp")
+
+
+def cache_root() -> str:
+    """The folder which contains the cache of all stages."""
+    return os.environ.get("PIPETEX_CACHE_DIR") or CACHE_FOLDER
+
+
+def digest(*parts: Union[str, bytes]) -> str:
+    """Hashes the given parts into a key for the cache.
+
+    The parts are separated in the hash, so ("ab", "c") and ("a", "bc") lead
+    to different keys.
+    """
+    hasher = hashlib.sha256()
+    for part in parts:
+        data = part.encode("utf-8") if isinstance(part, str) else part
+        hasher.update(len(data).to_bytes(8, "little"))
+        hasher.update(data)
+
+    return hasher.hexdigest()
+
+
+def file_digest(path: str) -> str:
+    """Hashes the content of a file without loading it into memory."""
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            hasher.update(chunk)
+
+    return hasher.hexdigest()
+
+
+def entry_path(stage: str, key: str, suffix: str = "") -> str:
+    """Path of the cache entry, regardless if it exists or not.
+
+    Args:
+        stage: Name of the stage owning the entry.
+        key: Key of the entry, see digest.
+        suffix: File extension of the entry, including the dot.
+
+    Returns:
+        str: Path of the entry using forward slashes, so it can be used in
+            tex files as well.
+    """
+    return os.path.join(cache_root(), stage, f"{key}{suffix}").replace(
+        os.sep, "/"
+    )
+
+
+def lookup(stage: str, key: str, suffix: str = "",
+           bus: Optional[events.EventBus] = None) -> Optional[str]:
+    """Returns the path of a cached artifact if it exists.
+
+    The modification time of a found entry is updated, so it counts as
+    recently used. If a bus is given, the lookup is published on it.
+    """
+    path = entry_path(stage, key, suffix)
+    try:
+        # Another build may evict the entry at any time, so touching it is
+        # the check for its existence
+        os.utime(path)
+        hit = True
+    except FileNotFoundError:
+        hit = False
+
+    if bus:
+        bus.publish(events.CacheLookup(stage, key, hit))
+
+    with _pending_lock:
+        _pending_lookups.setdefault(
+            (os.path.abspath(cache_root()), stage), [0, 0]
+        )[0 if hit else 1] += 1
+
+    return path if hit else None
+
+
+def store(stage: str, key: str, source_path: str, suffix: str = "") -> str:
+    """Copies an artifact into the cache.
+
+    The entry is written to a temporary file first and moved into place
+    afterwards, so concurrent builds never read a partially written entry.
+
+    Args:
+        stage: Name of the stage owning the entry.
+        key: Key of the entry, see digest.
+        source_path: The artifact to store.
+        suffix: File extension of the entry, including the dot.
+
+    Returns:
+        str: Path of the new cache entry.
+    """
+    path = entry_path(stage, key, suffix)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    shutil.copyfile(source_path, tmp_path)
+    content_digest = file_digest(tmp_path)
+    os.replace(tmp_path, path)
+
+    try:
+        with _connect_index() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                (f"{stage}/{key}{suffix}", content_digest,
+                 os.path.getsize(path), time.time())
+            )
+        connection.close()
+    except (OSError, sqlite3.Error):
+        pass
+
+    return path
+
+
+# === Index ===
+def _connect_index(root: Optional[str] = None) -> sqlite3.Connection:
+    root = root or cache_root()
+    os.makedirs(root, exist_ok=True)
+
+    connection = sqlite3.connect(os.path.join(root, INDEX_FILE), timeout=30)
+    connection.executescript(_INDEX_SCHEMA)
+    return connection
+
+
+def flush_lookups() -> None:
+    """Adds the lookups counted by this process to the indexes."""
+    with _pending_lock:
+        pending = dict(_pending_lookups)
+        _pending_lookups.clear()
+
+    for root in {root for root, _ in pending}:
+        with _connect_index(root) as connection:
+            connection.executemany(
+                "INSERT INTO lookups VALUES (?, ?, ?) ON CONFLICT (stage) "
+                "DO UPDATE SET hits = hits + excluded.hits, "
+                "misses = misses + excluded.misses",
+                [(stage, hits, misses)
+                 for (other, stage), (hits, misses) in pending.items()
+                 if other == root]
+            )
+
+        connection.close()
+
+
+def _indexed_digests() -> dict[str, str]:
+    """The recorded content hash of each entry."""
+    if not os.path.isfile(os.path.join(cache_root(), INDEX_FILE)):
+        return {}
+
+    with _connect_index() as connection:
+        digests = dict(connection.execute(
+            "SELECT path, sha256 FROM entries"
+        ).fetchall())
+
+    connection.close()
+    return digests
+
+
+# === Maintenance ===
+def scan(include_partial: bool = False) -> list[CacheEntry]:
+    """Lists the entries of all stages in a single walk of the cache.
+
+    Args:
+        include_partial (optional): Also list temporary files, see
+            CacheEntry.is_partial. Defaults to false.
+    """
+    entries: list[CacheEntry] = []
+    if not os.path.isdir(cache_root()):
+        return entries
+
+    with os.scandir(cache_root()) as stage_dirs:
+        for stage_dir in stage_dirs:
+            if not stage_dir.is_dir():
+                continue
+
+            with os.scandir(stage_dir.path) as files:
+                for file in files:
+                    if not file.is_file():
+                        continue
+
+                    stat = file.stat()
+                    entries.append(CacheEntry(stage_dir.name, file.name,
+                                              file.path, stat.st_size,
+                                              stat.st_mtime))
+
+    return [entry for entry in entries
+            if include_partial or not entry.is_partial]
+
+
+def stats() -> dict[str, dict[str, int]]:
+    """Number of entries, size, hits and misses of each stage."""
+    flush_lookups()
+    result: dict[str, dict[str, int]] = {}
+
+    for entry in scan():
+        stage = result.setdefault(entry.stage, {"entries": 0, "size": 0,
+                                                "hits": 0, "misses": 0})
+        stage["entries"] += 1
+        stage["size"] += entry.size
+
+    if os.path.isfile(os.path.join(cache_root(), INDEX_FILE)):
+        with _connect_index() as connection:
+            lookups = connection.execute(
+                "SELECT stage, hits, misses FROM lookups"
+            ).fetchall()
+
+        connection.close()
+        for name, hits, misses in lookups:
+            stage = result.setdefault(name, {"entries": 0, "size": 0,
+                                             "hits": 0, "misses": 0})
+            stage["hits"], stage["misses"] = hits, misses
+
+    return result
+
+
+def _forget(entries: list[CacheEntry]) -> None:
+    """Removes the entries from the disk and from the index."""
+    for entry in entries:
+        try:
+            os.remove(entry.path)
+        except FileNotFoundError:
+            pass    # Removed by a concurrent gc
+
+    if os.path.isfile(os.path.join(cache_root(), INDEX_FILE)):
+        with _connect_index() as connection:
+            connection.executemany("DELETE FROM entries WHERE path = ?",
+                                   [(e.index_key,) for e in entries])
+
+        connection.close()
+
+
+def gc(max_size: Optional[int] = None,
+       max_age: Optional[float] = None,
+       dry_run: bool = False) -> list[CacheEntry]:
+    """Evicts entries by age and by the total size of the cache.
+
+    Temporary files older than the grace period are removed as well.
+
+    Args:
+        max_size (optional): Size of the cache in bytes after the gc. The
+            least recently used entries are evicted first.
+        max_age (optional): Evict entries not used for this many seconds.
+        dry_run (optional): Only report the entries which would be evicted.
+            Defaults to false.
+
+    Returns:
+        list[CacheEntry]: The evicted entries, least recently used first.
+    """
+    now = time.time()
+    entries = sorted(scan(include_partial=True), key=lambda e: e.last_used)
+    evictable = [e for e in entries if now - e.last_used > GC_GRACE_PERIOD]
+
+    evicted = [e for e in evictable
+               if e.is_partial or
+               (max_age is not None and now - e.last_used > max_age)]
+    evicted_paths = {e.path for e in evicted}
+    size = sum(e.size for e in entries if e.path not in evicted_paths)
+
+    for entry in evictable:
+        if max_size is None or size <= max_size:
+            break
+
+        if entry.path not in evicted_paths:
+            evicted.append(entry)
+            size -= entry.size
+
+    if not dry_run:
+        _forget(evicted)
+
+    return sorted(evicted, key=lambda e: e.last_used)
+
+
+def verify(remove: bool = False) -> list[tuple[CacheEntry, str]]:
+    """Re-hashes the entries and compares them with the index.
+
+    Args:
+        remove (optional): Remove the corrupted entries. Defaults to false.
+
+    Returns:
+        list: Each entry and its state, ok, corrupt or unknown if the entry
+            is not recorded in the index.
+    """
+    digests = _indexed_digests()
+    result: list[tuple[CacheEntry, str]] = []
+
+    for entry in scan():
+        recorded = digests.get(entry.index_key)
+        if not recorded:
+            result.append((entry, "unknown"))
+        elif file_digest(entry.path) != recorded:
+            result.append((entry, "corrupt"))
+        else:
+            result.append((entry, "ok"))
+
+    if remove:
+        _forget([entry for entry, state in result if state == "corrupt"])
+
+    return result
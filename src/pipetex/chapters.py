@@ -0,0 +1,338 @@
+"""Parallel compilation of the chapters of large documents.
+
+A pdflatex run uses a single core, so a long document takes minutes no
+matter how many cores the host has. The operations in this module split the
+last compilation of a document into one job per \\include'd chapter:
+
+    - track_chapters adds hooks to the build copy which record the physical
+      pages of every chapter in the file [jobname].pages.
+    - compile_chapters runs after the first full compilation. Each job
+      compiles the document with \\includeonly{chapter} in its own folder.
+      The .aux files of the first compilation restore the page counter and
+      the references of the other chapters, just like for include_only.
+      The pages of the chapters are then stitched into the final PDF.
+
+The chapters are checkpointed by the first compilation. If a job ends a
+chapter with a different page count or checkpoint, the later chapters were
+numbered wrongly. The document is then compiled as a whole instead. The
+same happens if the hooks are not supported (LaTeX before 2020-10) or pypdf,
+which stitches the PDF files together, is not installed.
+
+@author: Max Weise
+created: 19.10.2026
+"""
+
+from pipetex import engine
+from pipetex import exceptions
+from pipetex import operations
+from pipetex import texsource
+from pipetex.enums import SeverityLevels, ConfigDictKeys
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional, Tuple
+
+import os
+import re
+import shutil
+import tempfile
+
+try:
+    import pypdf
+    _HAS_PYPDF = True
+except ImportError:
+    _HAS_PYPDF = False
+
+
+# === Type Def ===
+Monad = Tuple[bool, Optional[exceptions.InternalException]]
+PageRange = Tuple[int, int]
+
+# Every \include writes one line with the number of pages shipped out so far.
+# Excluded chapters write a skip line at the position they would start.
+_PAGE_HOOKS = r"""\makeatletter
+\IfFormatAtLeastTF{2020/10/01}{%
+\newwrite\pipetex@pages
+\immediate\openout\pipetex@pages=\jobname.pages
+\AddToHook{include/before}{%
+\immediate\write\pipetex@pages{start \the\ReadonlyShipoutCounter}}%
+\AddToHook{include/after}{%
+\immediate\write\pipetex@pages{end \the\ReadonlyShipoutCounter}}%
+\AddToHook{include/excluded}{%
+\immediate\write\pipetex@pages{skip \the\ReadonlyShipoutCounter}}%
+}{}
+\makeatother
+"""
+
+_CHECKPOINT_PATTERN = re.compile(r"\\@setckpt\{.*", re.DOTALL)
+
+
+def track_chapters(file_name: str, config_dict: dict[str, Any]) -> Monad:
+    """Adds the hooks recording the pages of each chapter to the file.
+
+    Args:
+        file_name: The name of the file to be compiled. Does not contain any
+            file extension.
+        config_dict: Dictionary containing further settings to run the engine.
+
+    Returns:
+        Monad: Tuple which contains a boolean to indicate success of the
+            function. If its true, the second value will be None. If its
+            false, the second value will contain an InternalException object
+            containing further information.
+
+    Raises:
+        InternalException: Indicates an internal error and is used to comunicate
+            exceptions and how to handle them back to the calling interface.
+            [Please see class definition]
+        Raised Levels: CRITICAL
+    """
+
+    if f"{file_name}.tex" not in os.listdir():
+        ex = exceptions.InternalException(
+            f"The file {file_name}.tex is not found in the current "
+            "working directory",
+            SeverityLevels.CRITICAL
+        )
+
+        return False, ex
+
+    with open(f"{file_name}.tex", "r", encoding="utf-8") as read_file:
+        content = read_file.read()
+
+    begin_index = content.find("\\begin{document}")
+    if begin_index < 0:
+        return True, None
+
+    with open(f"{file_name}.tex", "w", encoding="utf-8") as write_file:
+        write_file.write(content[:begin_index] + _PAGE_HOOKS +
+                         content[begin_index:])
+
+    return True, None
+
+
+def read_page_ranges(pages_path: str) -> list[PageRange]:
+    """Reads the pages of the chapters recorded by the hooks.
+
+    Args:
+        pages_path: Path of the .pages file written by a compilation.
+
+    Returns:
+        list[PageRange]: Start and end of every \\include in order, as
+            zero based page indices. Excluded chapters start and end at the
+            same page. Empty if the file does not exist.
+    """
+    ranges: list[PageRange] = []
+    start = 0
+
+    try:
+        with open(pages_path, "r", encoding="utf-8") as pages_file:
+            lines = [line.split() for line in pages_file if line.strip()]
+    except FileNotFoundError:
+        return []
+
+    for kind, value in lines:
+        if kind == "start":
+            start = int(value)
+        elif kind == "end":
+            ranges.append((start, int(value)))
+        else:
+            ranges.append((int(value), int(value)))
+
+    return ranges
+
+
+def _job_source(content: str, part: str) -> str:
+    """The document restricted to one chapter."""
+    begin_index = content.find("\\begin{document}")
+    return (content[:begin_index] + f"\\includeonly{{{part}}}\n" +
+            content[begin_index:])
+
+
+def _compile_chapter(file_name: str, content: str, part: str,
+                     parts: list[str], job_dir: str,
+                     config_dict: dict[str, Any]) -> Monad:
+    """Compiles one chapter of the document in its own folder.
+
+    The .aux files of the first compilation are copied into the folder. The
+    folder of the project is added to the TEXINPUTS of the engine, so the
+    chapters and all other files of the project are still found.
+    """
+    for aux_name in [file_name] + parts:
+        os.makedirs(os.path.join(job_dir, os.path.dirname(aux_name)),
+                    exist_ok=True)
+        if os.path.isfile(f"{aux_name}.aux"):
+            shutil.copy(f"{aux_name}.aux",
+                        os.path.join(job_dir, f"{aux_name}.aux"))
+
+    with open(os.path.join(job_dir, f"{file_name}.tex"), "w",
+              encoding="utf-8") as tex_file:
+        tex_file.write(_job_source(content, part))
+
+    return engine.run_engine(
+        ["pdflatex", "-interaction=nonstopmode", "-halt-on-error",
+         f"{file_name}.tex"],
+        config_dict,
+        "compile",
+        log_file_name=os.path.join(job_dir, f"{file_name}.log"),
+        cwd=job_dir,
+        env={"TEXINPUTS": engine.texinputs(os.getcwd())}
+    )
+
+
+def _checkpoint(aux_path: str) -> Optional[str]:
+    """The counters saved at the end of a chapter, see \\@setckpt."""
+    try:
+        with open(aux_path, "r", encoding="utf-8",
+                  errors="replace") as aux_file:
+            match = _CHECKPOINT_PATTERN.search(aux_file.read())
+    except FileNotFoundError:
+        return None
+
+    return match.group(0) if match else None
+
+
+def _layout_change(file_name: str, parts: list[str],
+                   expected: list[PageRange],
+                   job_dirs: list[str]) -> Optional[str]:
+    """Describes the first chapter whose layout differs from the first pass.
+
+    Returns:
+        str: The change, None if every job agrees with the first pass.
+    """
+    for index, (part, job_dir) in enumerate(zip(parts, job_dirs)):
+        ranges = read_page_ranges(os.path.join(job_dir, f"{file_name}.pages"))
+        if (len(ranges) != len(parts) or
+                not os.path.isfile(os.path.join(job_dir, f"{file_name}.pdf"))):
+            return f"the job of {part} did not create a PDF file"
+
+        start, end = ranges[index]
+        if end - start != expected[index][1] - expected[index][0]:
+            return (f"{part} has {end - start} instead of "
+                    f"{expected[index][1] - expected[index][0]} pages")
+
+        if (_checkpoint(os.path.join(job_dir, f"{part}.aux")) !=
+                _checkpoint(f"{part}.aux")):
+            return f"the counters at the end of {part} changed"
+
+    return None
+
+
+def stitch_chapters(file_name: str, parts: list[str],
+                    job_dirs: list[str]) -> None:
+    """Combines the pages of the chapter jobs into the final PDF.
+
+    Each job contributes its chapter and the pages in front of it, down to
+    the end of the previous chapter. The last job also contributes the pages
+    after its chapter. Outlines and links of the selected pages are kept.
+    """
+    writer = pypdf.PdfWriter()
+    # pypdf tells the copied objects apart by the id of their reader, so no
+    # reader may be freed while the writer is in use
+    readers = []
+
+    for index, job_dir in enumerate(job_dirs):
+        ranges = read_page_ranges(os.path.join(job_dir, f"{file_name}.pages"))
+        readers.append(pypdf.PdfReader(os.path.join(job_dir,
+                                                    f"{file_name}.pdf")))
+
+        first = ranges[index - 1][1] if index else 0
+        last = (ranges[index][1] if index < len(parts) - 1
+                else len(readers[-1].pages))
+        writer.append(readers[-1], pages=list(range(first, last)))
+
+    with open(f"{file_name}.pdf", "wb") as pdf_file:
+        writer.write(pdf_file)
+
+
+def _compile_sequentially(file_name: str, config_dict: dict[str, Any],
+                          reason: Optional[str]) -> Monad:
+    """Compiles the whole document, reporting why it was not split."""
+    success, error = operations.compile_latex_file(file_name, config_dict)
+    if error or not reason:
+        return success, error
+
+    ex = exceptions.InternalException(
+        f"The chapters were compiled as one document, because {reason}.",
+        SeverityLevels.LOW
+    )
+
+    return False, ex
+
+
+def compile_chapters(file_name: str, config_dict: dict[str, Any]) -> Monad:
+    """Compiles the chapters of the file in parallel and stitches the PDF.
+
+    Falls back to a normal compilation if the document can not be split,
+    see the module docs.
+
+    Args:
+        file_name: The name of the file to be compiled. Does not contain any
+            file extension.
+        config_dict: Dictionary containing further settings to run the engine.
+
+    Returns:
+        Monad: Tuple which contains a boolean to indicate success of the
+            function. If its true, the second value will be None. If its
+            false, the second value will contain an InternalException object
+            containing further information.
+
+    Raises:
+        InternalException: Indicates an internal error and is used to comunicate
+            exceptions and how to handle them back to the calling interface.
+            [Please see class definition]
+        Raised Levels: CRITICAL, LOW
+    """
+
+    if f"{file_name}.tex" not in os.listdir():
+        ex = exceptions.InternalException(
+            f"The file {file_name}.tex is not found in the current "
+            "working directory",
+            SeverityLevels.CRITICAL
+        )
+
+        return False, ex
+
+    with open(f"{file_name}.tex", "r", encoding="utf-8") as read_file:
+        content = read_file.read()
+
+    parts = texsource.find_included_parts(content.splitlines())
+    expected = read_page_ranges(f"{file_name}.pages")
+
+    # Documents which are already restricted or too short are not split
+    if len(parts) < 2 or "\\includeonly{" in content:
+        return _compile_sequentially(file_name, config_dict, None)
+
+    if not _HAS_PYPDF:
+        return _compile_sequentially(file_name, config_dict,
+                                     "pypdf is not installed")
+
+    if len(expected) != len(parts):
+        return _compile_sequentially(
+            file_name, config_dict,
+            "the first compilation did not record the pages of the chapters"
+        )
+
+    job_dirs = [tempfile.mkdtemp(prefix="pipetex-chapter-") for _ in parts]
+    try:
+        jobs = config_dict.get(ConfigDictKeys.JOBS.value) or os.cpu_count()
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(
+                lambda item: _compile_chapter(file_name, content, item[0],
+                                              parts, item[1], config_dict),
+                zip(parts, job_dirs)
+            ))
+
+        for success, error in results:
+            if error and error.severity_level >= SeverityLevels.CRITICAL:
+                return False, error
+
+        change = _layout_change(file_name, parts, expected, job_dirs)
+        if change:
+            return _compile_sequentially(file_name, config_dict, change)
+
+        stitch_chapters(file_name, parts, job_dirs)
+        return True, None
+
+    finally:
+        for job_dir in job_dirs:
+            shutil.rmtree(job_dir, ignore_errors=True)
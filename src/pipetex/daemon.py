@@ -0,0 +1,368 @@
+"""Long running pipeline server which accepts build requests over a socket.
+
+Starting a fresh interpreter for every build means re-importing the package,
+building the logger and parsing arguments again. Editor integrations trigger
+a build on every save, so this module keeps one process alive which listens
+on a unix socket and runs the builds it is asked for.
+
+Requests and responses are exchanged as one JSON object per line. A client
+sends a single request and receives the progress of the build as a stream of
+messages, the last of which contains the result of the pipeline.
+
+Builds are queued in the order they arrive. A request for a document which is
+already waiting in the queue with the same options is coalesced with the
+waiting build, all clients receive the messages of the single build.
+
+@author: Max Weise
+created: 19.10.2026
+"""
+
+from pipetex import buildcontext
+from pipetex import buildlock
+from pipetex import exceptions
+from pipetex import metrics
+from pipetex import pipeline
+from pipetex.enums import SeverityLevels
+
+from collections import OrderedDict
+from collections.abc import Iterator
+from typing import Any, Optional
+
+import errno
+import getpass
+import json
+import logging
+import os
+import socket
+import socketserver
+import tempfile
+import threading
+
+
+# === Type Def ===
+Message = dict[str, Any]
+RequestKey = tuple[str, str, str]
+
+
+def default_socket_path() -> str:
+    """Path of the socket used when the user does not specify one."""
+    return os.path.join(tempfile.gettempdir(),
+                        f"pipetex-{getpass.getuser()}.sock")
+
+
+def _request_key(request: Message) -> RequestKey:
+    """Identifies requests which would produce the exact same build."""
+    return (
+        os.path.abspath(request["work_dir"]),
+        request["file_name"],
+        json.dumps(request.get("options", {}), sort_keys=True)
+    )
+
+
+class BuildJob:
+    """A queued build and the messages it produced so far.
+
+    Every client which is interested in the build reads the message list from
+    the start, so clients which join a coalesced build late still receive the
+    complete progress.
+
+    Attributes:
+        key: Identifies the build, see _request_key.
+        request: The request which created the job.
+        done: True, once the result message has been published.
+    """
+
+    key: RequestKey
+    request: Message
+    done: bool
+
+    # Private attributes
+    _messages: list[Message]
+    _condition: threading.Condition
+
+    def __init__(self, key: RequestKey, request: Message) -> None:
+        """Instantiates a job for the given request."""
+        self.key = key
+        self.request = request
+        self.done = False
+        self._messages = []
+        self._condition = threading.Condition()
+
+    def publish(self, message: Message, final: bool = False) -> None:
+        """Appends a message and wakes up all waiting clients."""
+        with self._condition:
+            self._messages.append(message)
+            self.done = self.done or final
+            self._condition.notify_all()
+
+    def stream(self) -> Iterator[Message]:
+        """Yields all messages of the job until the result is published."""
+        index = 0
+        while True:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: index < len(self._messages) or self.done
+                )
+                messages = self._messages[index:]
+                finished = self.done
+
+            index += len(messages)
+            yield from messages
+
+            if finished and index >= len(self._messages):
+                return
+
+
+class _JobLogHandler(logging.Handler):
+    """Forwards the log records of the running build to its clients."""
+
+    def __init__(self, job: BuildJob) -> None:
+        super().__init__(logging.DEBUG)
+        self.job = job
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.job.publish({
+            "event": "log",
+            "level": record.levelno,
+            "message": record.getMessage()
+        })
+
+
+class BuildQueue:
+    """Runs the requested builds one after another in a worker thread.
+
+    Operations work relative to the current working directory of the process,
+    so only one build can run at a time.
+    """
+
+    # Private attributes
+    _pending: "OrderedDict[RequestKey, BuildJob]"
+    _condition: threading.Condition
+    _worker: threading.Thread
+    _running: bool
+
+    def __init__(self) -> None:
+        """Creates the queue and starts its worker thread."""
+        self.logger = logging.getLogger("main.daemon")
+        self._pending = OrderedDict()
+        self._condition = threading.Condition()
+        self._running = True
+        self._worker = threading.Thread(target=self._run_forever, daemon=True)
+        self._worker.start()
+
+    @property
+    def depth(self) -> int:
+        """Number of builds which wait to be executed."""
+        with self._condition:
+            return len(self._pending)
+
+    def submit(self, request: Message) -> BuildJob:
+        """Queues a build or returns the queued build it coalesces with.
+
+        Args:
+            request: Build request containing the work_dir, file_name and the
+                keyword options of the pipeline.
+
+        Returns:
+            BuildJob: The job which will execute the request.
+        """
+        key = _request_key(request)
+        with self._condition:
+            job = self._pending.get(key)
+            if job:
+                job.publish({"event": "coalesced"})
+                return job
+
+            job = BuildJob(key, request)
+            self._pending[key] = job
+            metrics.REGISTRY.set_queue_depth(len(self._pending))
+            job.publish({"event": "queued", "position": len(self._pending)})
+            self._condition.notify()
+
+        return job
+
+    def stop(self) -> None:
+        """Stops the worker after the currently running build."""
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+
+    def _run_forever(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: bool(self._pending) or not self._running
+                )
+                if not self._running:
+                    return
+
+                _, job = self._pending.popitem(last=False)
+                metrics.REGISTRY.set_queue_depth(len(self._pending))
+
+            self._run_job(job)
+
+    def _run_job(self, job: BuildJob) -> None:
+        """Executes the pipeline for a job and publishes the result."""
+        request = job.request
+        error: Optional[exceptions.InternalException] = None
+        success = False
+
+        handler = _JobLogHandler(job)
+        main_logger = logging.getLogger("main")
+        main_logger.addHandler(handler)
+        job.publish({"event": "started"})
+        self.logger.info(
+            f"Building {request['file_name']} in {request['work_dir']}"
+        )
+
+        work_dir = buildcontext.WORKING_DIRECTORY.enter(request["work_dir"])
+        try:
+            with work_dir:
+                options = request.get("options", {})
+                p = pipeline.Pipeline(request["file_name"], **options)
+                stop_recording = metrics.REGISTRY.observe(p.event_bus)
+                try:
+                    success, error = buildlock.run_coalesced(
+                        p.file_name, options, lambda: p.execute(p.file_name)
+                    )
+                finally:
+                    stop_recording()
+        except Exception as e:  # A failing build must not kill the daemon
+            error = exceptions.InternalException(
+                f"The build could not be executed: {e}",
+                SeverityLevels.CRITICAL,
+                e
+            )
+        finally:
+            main_logger.removeHandler(handler)
+
+        job.publish(_result_message(success, error), final=True)
+
+
+def _result_message(success: bool,
+                    error: Optional[exceptions.InternalException]) -> Message:
+    """Converts the Monad returned by the pipeline to a message."""
+    return {
+        "event": "result",
+        "success": success,
+        "severity_level": error.severity_level if error else None,
+        "message": error.message if error else None
+    }
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """Reads one request from a client and streams back the messages."""
+
+    server: "PipelineDaemon"
+
+    def handle(self) -> None:
+        try:
+            request: Message = json.loads(self.rfile.readline())
+        except ValueError:
+            self._send({"event": "error", "message": "Malformed request"})
+            return
+
+        match request.get("command", "build"):
+            case "build":
+                job = self.server.build_queue.submit(request)
+                try:
+                    for message in job.stream():
+                        self._send(message)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The build keeps running for other clients
+                    pass
+
+            case "ping":
+                self._send({"event": "pong",
+                            "queue_depth": self.server.build_queue.depth})
+
+            case "shutdown":
+                self._send({"event": "shutdown"})
+                threading.Thread(target=self.server.shutdown).start()
+
+            case _:
+                self._send({"event": "error", "message": "Unknown command"})
+
+    def _send(self, message: Message) -> None:
+        self.wfile.write((json.dumps(message) + "\n").encode("utf-8"))
+        self.wfile.flush()
+
+
+def _remove_stale_socket(socket_path: str) -> None:
+    """Removes the socket file if no daemon accepts connections on it."""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            probe.connect(socket_path)
+    except FileNotFoundError:
+        return
+    except ConnectionRefusedError:
+        os.remove(socket_path)
+        return
+
+    raise OSError(errno.EADDRINUSE,
+                  f"A pipeline daemon is already running on {socket_path}")
+
+
+class PipelineDaemon(socketserver.ThreadingMixIn,
+                     socketserver.UnixStreamServer):
+    """Socket server which hands all build requests to one BuildQueue."""
+
+    daemon_threads = True
+    build_queue: BuildQueue
+
+    def __init__(self, socket_path: str) -> None:
+        """Binds the server to the socket path.
+
+        A socket file left behind by a daemon which did not shut down cleanly
+        is removed before binding.
+
+        Raises:
+            OSError: If another daemon is listening on the socket path.
+        """
+        _remove_stale_socket(socket_path)
+
+        self.build_queue = BuildQueue()
+        super().__init__(socket_path, _RequestHandler)
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.build_queue.stop()
+        if os.path.exists(self.server_address):   # type: ignore
+            os.remove(self.server_address)         # type: ignore
+
+
+def serve(socket_path: Optional[str] = None) -> None:
+    """Runs the daemon until it receives a shutdown request."""
+    socket_path = socket_path or default_socket_path()
+    logger = logging.getLogger("main.daemon")
+
+    with PipelineDaemon(socket_path) as server:
+        logger.info(f"Pipeline daemon listening on {socket_path}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+    logger.info("Pipeline daemon stopped")
+
+
+def send_request(request: Message,
+                 socket_path: Optional[str] = None) -> Iterator[Message]:
+    """Sends a request to a running daemon and yields its responses.
+
+    Args:
+        request: The request which is sent. Build requests must contain the
+            work_dir, file_name and the keyword options of the pipeline.
+        socket_path: Path of the daemon socket. Uses the default path if
+            none is given.
+
+    Yields:
+        Message: The messages sent by the daemon, ending with the result.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(socket_path or default_socket_path())
+        client.sendall((json.dumps(request) + "\n").encode("utf-8"))
+
+        with client.makefile("r", encoding="utf-8") as responses:
+            for line in responses:
+                yield json.loads(line)
@@ -0,0 +1,528 @@
+"""Execution of the external latex engines and tools.
+
+All operations which call an external program (pdflatex, biber,
+makeglossaries, ...) go through run_engine. It guards the build against
+engines which never finish. A document which makes pdflatex wait for terminal
+input would otherwise block the pipeline forever.
+
+    - The engine reads from an empty stdin, so it can not wait for input.
+    - Each stage has a wall clock timeout. When it runs out, the whole process
+      group of the engine is killed.
+    - CPU time and memory of the engine can be limited (unix only). The
+      limits are set with prlimit right after the engine started (linux),
+      or by a small wrapper which sets them and executes the engine. A
+      preexec_fn is not used, as it may deadlock in a process with threads.
+
+The peak memory (RSS) of each engine is measured when it exits (unix only)
+and the maximum of the current operation is kept in the config dict.
+
+The output of the engine is captured through a pipe which is drained by a
+background thread, so a chatty engine can never fill the pipe and block. Only
+the last few KB are kept in a ring buffer per stage. They are stored in the
+config dict and added to error messages. If requested, the output is also
+written line by line to the main.engine logger.
+
+For reproducible builds the config dict holds the timestamp of
+SOURCE_DATE_EPOCH, which the user must set. The engines get it as
+SOURCE_DATE_EPOCH, so pdfTeX writes it as creation date and derives the
+trailer ID of the PDF from it instead of the current time. FORCE_SOURCE_DATE
+makes \\today use it as well.
+
+@author: Max Weise
+created: 19.10.2026
+"""
+
+from pipetex import buildcontext
+from pipetex import events
+from pipetex import exceptions
+from pipetex.enums import SeverityLevels, ConfigDictKeys
+
+from collections import deque
+from collections.abc import Collection
+from typing import IO, Any, Optional, Tuple
+
+import logging
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+try:
+    import resource
+    _HAS_RLIMITS = True
+except ImportError:     # pragma: no cover - not available on windows
+    _HAS_RLIMITS = False
+
+
+# === Type Def ===
+Monad = Tuple[bool, Optional[exceptions.InternalException]]
+
+# Grace period for the engine to exit after it received SIGTERM
+KILL_GRACE_PERIOD = 2.0
+
+# Number of lines of the engine log shown in error messages
+LOG_TAIL_LINES = 20
+
+# Sets the rlimits given as first argument, then executes the engine
+_LIMIT_WRAPPER = (
+    "import os, resource, sys\n"
+    "for limit in sys.argv[1].split(','):\n"
+    "    name, value = map(int, limit.split('='))\n"
+    "    resource.setrlimit(name, (value, value))\n"
+    "os.execvp(sys.argv[2], sys.argv[2:])\n"
+)
+
+# Bytes of engine output kept per stage if the config dict does not say else
+DEFAULT_BUFFER_SIZE = 64 * 1024
+
+# Bytes read from the engine pipe at once
+_CHUNK_SIZE = 8 * 1024
+
+# Longest pause between two checks if the engine has exited
+_MAX_POLL_INTERVAL = 0.05
+
+# ru_maxrss is given in bytes on macOS and in kilobytes elsewhere
+_MAXRSS_UNIT = 1 if sys.platform == "darwin" else 1024
+
+
+class OutputBuffer:
+    """Ring buffer which keeps the most recent bytes written to it.
+
+    Attributes:
+        capacity: Maximum number of bytes held by the buffer.
+        total_bytes: Number of bytes written to the buffer since its creation.
+    """
+
+    capacity: int
+    total_bytes: int
+
+    # Private attributes
+    _chunks: deque[bytes]
+    _size: int
+    _lock: threading.Lock
+
+    def __init__(self, capacity: int = DEFAULT_BUFFER_SIZE) -> None:
+        """Creates an empty buffer holding at most capacity bytes."""
+        self.capacity = capacity
+        self.total_bytes = 0
+        self._chunks = deque()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def write(self, chunk: bytes) -> None:
+        """Appends a chunk and drops the oldest bytes beyond the capacity."""
+        with self._lock:
+            self.total_bytes += len(chunk)
+            chunk = chunk[-self.capacity:]
+            self._chunks.append(chunk)
+            self._size += len(chunk)
+
+            while self._size > self.capacity:
+                overflow = self._size - self.capacity
+                oldest = self._chunks.popleft()
+                if len(oldest) > overflow:
+                    self._chunks.appendleft(oldest[overflow:])
+
+                self._size -= min(len(oldest), overflow)
+
+    def getvalue(self) -> bytes:
+        """The bytes currently held by the buffer."""
+        with self._lock:
+            return b"".join(self._chunks)
+
+    def tail(self, number_of_lines: int = LOG_TAIL_LINES) -> str:
+        """The last lines held by the buffer, decoded as utf-8."""
+        text = self.getvalue().decode("utf-8", errors="replace")
+        return "\n".join(text.splitlines()[-number_of_lines:])
+
+
+def stage_timeout(config_dict: dict[str, Any], stage: str) -> Optional[float]:
+    """Looks up the wall clock timeout of a stage.
+
+    The timeouts are stored as a dict in the config dict. A timeout given for
+    the stage itself takes precedence over the "default" entry.
+
+    Args:
+        config_dict: Dictionary containing further settings to run the engine.
+        stage: Name of the stage, e.g. compile, bibliography or glossary.
+
+    Returns:
+        Optional[float]: The timeout in seconds or None if the stage may run
+            without a time limit.
+    """
+    timeouts: dict[str, float] = config_dict.get(
+        ConfigDictKeys.TIMEOUTS.value
+    ) or {}
+
+    return timeouts.get(stage, timeouts.get("default"))
+
+
+def _resource_limits(config_dict: dict[str, Any]) -> list[tuple[int, int]]:
+    """The rlimits of the engine as pairs of resource and value.
+
+    Returns:
+        list: The limits, empty if none are configured or they are not
+            supported.
+    """
+    cpu_limit: Optional[int] = config_dict.get(ConfigDictKeys.CPU_LIMIT.value)
+    memory_limit: Optional[int] = config_dict.get(
+        ConfigDictKeys.MEMORY_LIMIT.value
+    )
+
+    if not _HAS_RLIMITS:
+        return []
+
+    return [(limit, value)
+            for limit, value in [(resource.RLIMIT_CPU, cpu_limit),
+                                 (resource.RLIMIT_AS, memory_limit)]
+            if value]
+
+
+def _limited_arguments(argument_list: list[str],
+                       limits: list[tuple[int, int]]) -> list[str]:
+    """Runs the engine through _LIMIT_WRAPPER if prlimit is not available.
+
+    Raises:
+        FileNotFoundError: If the engine is not installed, which the wrapper
+            could not report.
+    """
+    if not limits or hasattr(resource, "prlimit"):
+        return argument_list
+
+    if not shutil.which(argument_list[0]):
+        raise FileNotFoundError(argument_list[0])
+
+    return ([sys.executable, "-c", _LIMIT_WRAPPER,
+             ",".join(f"{limit}={value}" for limit, value in limits)] +
+            argument_list)
+
+
+def _apply_limits(process: subprocess.Popen[bytes],
+                  limits: list[tuple[int, int]]) -> None:
+    """Sets the limits of the started engine, where prlimit is available."""
+    if not limits or not hasattr(resource, "prlimit"):
+        return
+
+    for limit, value in limits:
+        try:
+            resource.prlimit(process.pid, limit, (value, value))
+        except OSError:     # The engine already exited
+            return
+
+
+def _kill_process_group(process: subprocess.Popen[bytes]) -> None:
+    """Stops the engine and every process it started.
+
+    The engine runs in its own session, so its process group id equals its
+    pid. The group is asked to terminate first and killed if it does not
+    exit within the grace period.
+    """
+    if not hasattr(os, "killpg"):
+        process.kill()
+        process.wait()
+        return
+
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=KILL_GRACE_PERIOD)
+    except (ProcessLookupError, subprocess.TimeoutExpired):
+        pass
+
+    # Children of the engine may outlive it, so the group is always killed
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+    process.wait()
+
+
+def _wait_with_usage(process: subprocess.Popen[bytes],
+                     timeout: Optional[float]) -> Optional[int]:
+    """Waits for the engine to exit and measures its peak memory.
+
+    The engine is reaped with wait4, which reports its resource usage.
+    Platforms without wait4 fall back to Popen.wait.
+
+    Returns:
+        Optional[int]: Peak resident memory of the engine in bytes, None if
+            it can not be measured.
+
+    Raises:
+        subprocess.TimeoutExpired: If the engine runs longer than timeout.
+    """
+    if not hasattr(os, "wait4"):
+        process.wait(timeout=timeout)
+        return None
+
+    deadline = None if timeout is None else time.monotonic() + timeout
+    interval = 0.001
+
+    while True:
+        pid, status, usage = os.wait4(process.pid, os.WNOHANG)
+        if pid:
+            process.returncode = os.waitstatus_to_exitcode(status)
+            return int(usage.ru_maxrss) * _MAXRSS_UNIT
+
+        if deadline is not None and time.monotonic() > deadline:
+            raise subprocess.TimeoutExpired(process.args, timeout or 0)
+
+        time.sleep(interval)
+        interval = min(interval * 2, _MAX_POLL_INTERVAL)
+
+
+def log_tail(log_file_name: Optional[str],
+             number_of_lines: int = LOG_TAIL_LINES) -> str:
+    """Returns the last lines of a log file written by an engine.
+
+    Args:
+        log_file_name: Name of the log file including its extension.
+        number_of_lines: How many lines are returned.
+
+    Returns:
+        str: The last lines of the file or an empty string if the file does
+            not exist.
+    """
+    if not log_file_name or not os.path.isfile(log_file_name):
+        return ""
+
+    with open(log_file_name, "r", encoding="utf-8",
+              errors="replace") as log_file:
+        lines = log_file.readlines()
+
+    return "".join(lines[-number_of_lines:])
+
+
+def _drain_output(stream: IO[bytes], buffer: OutputBuffer, echo: bool,
+                  logger: Optional[logging.Logger]) -> None:
+    """Reads the engine output until the pipe is closed.
+
+    Args:
+        stream: Read end of the engine pipe.
+        buffer: Ring buffer receiving the output.
+        echo: Write the output to the terminal as well.
+        logger (optional): Logger which receives every line of the output.
+    """
+    terminal = getattr(sys.stdout, "buffer", None) if echo else None
+    pending = b""
+
+    for chunk in iter(lambda: stream.read1(_CHUNK_SIZE), b""):  # type: ignore
+        buffer.write(chunk)
+
+        if terminal:
+            terminal.write(chunk)
+            terminal.flush()
+
+        if logger:
+            *lines, pending = (pending + chunk).split(b"\n")
+            # A line without line break must not grow without limit
+            if len(pending) > buffer.capacity:
+                lines.append(pending)
+                pending = b""
+
+            for line in lines:
+                logger.debug(line.decode("utf-8", errors="replace"))
+
+    if logger and pending:
+        logger.debug(pending.decode("utf-8", errors="replace"))
+
+    stream.close()
+
+
+def _output_tail(buffer: OutputBuffer, log_file_name: Optional[str]) -> str:
+    """Context for error messages, preferring the captured engine output."""
+    return buffer.tail() if len(buffer) else log_tail(log_file_name)
+
+
+def source_date_epoch() -> int:
+    """The timestamp of reproducible builds, see reproducible-builds.org.
+
+    It is read from SOURCE_DATE_EPOCH, never from the files or the clock,
+    because checkouts of the same sources differ in both.
+
+    Returns:
+        int: The timestamp.
+
+    Raises:
+        ValueError: If SOURCE_DATE_EPOCH is not set or not a number of
+            seconds.
+    """
+    value = os.environ.get("SOURCE_DATE_EPOCH", "").strip()
+    if not value:
+        raise ValueError("SOURCE_DATE_EPOCH must be set for reproducible "
+                         "builds, e.g. to the time of the last commit: "
+                         "SOURCE_DATE_EPOCH=$(git log -1 --format=%ct)")
+
+    if not value.isdigit():
+        raise ValueError(f"SOURCE_DATE_EPOCH must be a number of seconds, "
+                         f"got {value!r}")
+
+    return int(value)
+
+
+def texinputs(folder: str) -> str:
+    """TEXINPUTS which searches the folder before the folders of the user."""
+    return folder + os.pathsep + os.environ.get("TEXINPUTS", "")
+
+
+def reproducible_environment(config_dict: dict[str, Any]) -> dict[str, str]:
+    """Variables which fix the dates written by the engines, if requested."""
+    epoch = config_dict.get(ConfigDictKeys.SOURCE_DATE_EPOCH.value)
+    if epoch is None:
+        return {}
+
+    return {"SOURCE_DATE_EPOCH": str(epoch), "FORCE_SOURCE_DATE": "1"}
+
+
+def _exit_error(returncode: int, stage: str,
+                exit_codes: Optional[Collection[int]]) -> Optional[str]:
+    """Describes why the exit status of an engine is an error, if it is."""
+    if returncode < 0:
+        return (f"The {stage} stage was stopped by "
+                f"{signal.Signals(-returncode).name}. It may have exceeded "
+                "its resource limits.")
+
+    if exit_codes is not None and returncode not in exit_codes:
+        return f"The {stage} stage failed with exit code {returncode}."
+
+    return None
+
+
+def run_engine(argument_list: list[str],
+               config_dict: dict[str, Any],
+               stage: str,
+               log_file_name: Optional[str] = None,
+               missing_level: SeverityLevels = SeverityLevels.CRITICAL,
+               cwd: Optional[str] = None,
+               env: Optional[dict[str, str]] = None,
+               exit_codes: Optional[Collection[int]] = None
+               ) -> Monad:
+    """Runs an external program under the limits set in the config dict.
+
+    Args:
+        argument_list: The program and its arguments.
+        config_dict: Dictionary containing further settings to run the engine.
+        stage: Name of the stage, used to look up the timeout.
+        log_file_name (optional): Log file of the engine. Its last lines are
+            added to the error message when the engine has to be stopped and
+            no output was captured.
+        missing_level (optional): Severity level used when the program is not
+            installed. Defaults to CRITICAL.
+        cwd (optional): Working directory of the engine. Defaults to the
+            working directory of the pipeline.
+        env (optional): Variables added to the environment of the engine,
+            besides those of reproducible_environment.
+        exit_codes (optional): Exit codes which count as success. By default
+            only timeouts and signals are errors, because the log of the
+            engine tells more than its exit code.
+
+    Returns:
+        Monad: Tuple which contains a boolean to indicate success of the
+            function. If its true, the second value will be None. If its
+            false, the second value will contain an InternalException object
+            containing further information.
+
+    Raises:
+        InternalException: Indicates an internal error and is used to comunicate
+            exceptions and how to handle them back to the calling interface.
+            [Please see class definition]
+        Raised Levels: CRITICAL, missing_level
+    """
+    timeout = stage_timeout(config_dict, stage)
+    buffer = OutputBuffer(
+        config_dict.get(ConfigDictKeys.OUTPUT_BUFFER_SIZE.value) or
+        DEFAULT_BUFFER_SIZE
+    )
+    engine_output: dict[str, str] = config_dict.setdefault(
+        ConfigDictKeys.ENGINE_OUTPUT.value, {}
+    )
+
+    env = dict(reproducible_environment(config_dict), **(env or {}))
+
+    limits = _resource_limits(config_dict)
+
+    started = time.monotonic()
+    try:
+        process = subprocess.Popen(
+            _limited_arguments(argument_list, limits),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+            cwd=cwd,
+            env=dict(os.environ, **env) if env else None
+        )
+    except FileNotFoundError as e:
+        ex = exceptions.InternalException(
+            f"The program {argument_list[0]} is not installed or can not be "
+            "found on the PATH.",
+            missing_level,
+            e
+        )
+
+        return False, ex
+
+    _apply_limits(process, limits)
+
+    tee = config_dict.get(ConfigDictKeys.TEE_ENGINE_OUTPUT.value)
+    reader = threading.Thread(
+        target=_drain_output,
+        args=(process.stdout, buffer,
+              bool(config_dict.get(ConfigDictKeys.VERBOSE.value)),
+              logging.getLogger(f"main.engine.{stage}") if tee else None),
+        daemon=True
+    )
+    reader.start()
+
+    timeout_error: Optional[subprocess.TimeoutExpired] = None
+    peak_rss: Optional[int] = None
+    try:
+        # Other builds of the process may use the working directory meanwhile
+        with buildcontext.WORKING_DIRECTORY.lend():
+            peak_rss = _wait_with_usage(process, timeout)
+    except subprocess.TimeoutExpired as e:
+        _kill_process_group(process)
+        timeout_error = e
+
+    # Children which outlive the engine may keep the pipe open
+    reader.join(KILL_GRACE_PERIOD)
+    engine_output[stage] = buffer.getvalue().decode("utf-8", errors="replace")
+
+    if peak_rss:
+        config_dict[ConfigDictKeys.PEAK_RSS.value] = max(
+            config_dict.get(ConfigDictKeys.PEAK_RSS.value) or 0, peak_rss
+        )
+
+    bus = events.bus_of(config_dict)
+    if bus:
+        bus.publish(events.EnginePass(
+            stage, argument_list[0], bus.next_pass(stage),
+            time.monotonic() - started, process.returncode, peak_rss
+        ))
+
+    if timeout_error:
+        ex = exceptions.InternalException(
+            f"The {stage} stage did not finish within {timeout} seconds and "
+            f"was stopped.\n{_output_tail(buffer, log_file_name)}",
+            SeverityLevels.CRITICAL,
+            timeout_error
+        )
+
+        return False, ex
+
+    exit_error = _exit_error(process.returncode, stage, exit_codes)
+    if exit_error:
+        ex = exceptions.InternalException(
+            f"{exit_error}\n{_output_tail(buffer, log_file_name)}",
+            SeverityLevels.CRITICAL
+        )
+
+        return False, ex
+
+    return True, None
@@ -32,4 +32,19 @@ class ConfigDictKeys(enum.Enum):
     FILE_PREFIX = "file_prefix"
     VERBOSE = "verbose"
     QUIET = "quiet"
+    INCLUDE_ONLY = "include_only"
+    TIMEOUTS = "timeouts"
+    CPU_LIMIT = "cpu_limit"
+    MEMORY_LIMIT = "memory_limit"
+    OUTPUT_BUFFER_SIZE = "output_buffer_size"
+    TEE_ENGINE_OUTPUT = "tee_engine_output"
+    ENGINE_OUTPUT = "engine_output"
+    JOBS = "jobs"
+    ASSET_SETTINGS = "asset_settings"
+    BIB_BACKEND = "bib_backend"
+    EVENTS = "events"
+    PEAK_RSS = "peak_rss"
+    VARIANT = "variant"
+    OPERATIONS = "operations"
+    SOURCE_DATE_EPOCH = "source_date_epoch"
 
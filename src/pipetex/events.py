@@ -0,0 +1,243 @@
+"""Events published while a pipeline runs.
+
+Programs which embed the pipeline (e.g. a web UI or a build scheduler) can
+observe its progress by subscribing to the event bus of the pipeline, or by
+iterating over Pipeline.stream. The bus is stored in the config dict, so
+operations and the engine can publish events as well.
+
+Publishers check if the bus has subscribers before they create an event, so
+a pipeline which nobody observes does not pay for its events:
+
+    bus = events.bus_of(config_dict)
+    if bus:
+        bus.publish(events.CacheLookup(stage, key, hit))
+
+@author: Max Weise
+created: 19.10.2026
+"""
+
+from pipetex import exceptions
+from pipetex.enums import ConfigDictKeys
+
+from collections.abc import Callable
+from typing import Any, Optional
+
+import threading
+import time
+
+
+class Event:
+    """Base class of all events.
+
+    Attributes:
+        timestamp: Time the event was created, see time.time.
+    """
+
+    timestamp: float
+
+    def __init__(self) -> None:
+        self.timestamp = time.time()
+
+    def __repr__(self) -> str:
+        attributes = ", ".join(f"{k}={v!r}" for k, v in vars(self).items()
+                               if k != "timestamp")
+        return f"{type(self).__name__}({attributes})"
+
+
+class StageStarted(Event):
+    """An operation of the pipeline starts.
+
+    Attributes:
+        stage: Name of the operation.
+        index: Position of the operation in the pipeline, starting at 0.
+        total: Number of operations in the pipeline.
+    """
+
+    stage: str
+    index: int
+    total: int
+
+    def __init__(self, stage: str, index: int, total: int) -> None:
+        super().__init__()
+        self.stage = stage
+        self.index = index
+        self.total = total
+
+
+class StageFinished(Event):
+    """An operation of the pipeline has finished.
+
+    Attributes:
+        stage: Name of the operation.
+        duration: Wall clock time of the operation in seconds.
+        success: The success value returned by the operation.
+        error: The error returned by the operation, if any.
+    """
+
+    stage: str
+    duration: float
+    success: bool
+    error: Optional[exceptions.InternalException]
+
+    def __init__(self, stage: str, duration: float, success: bool,
+                 error: Optional[exceptions.InternalException]) -> None:
+        super().__init__()
+        self.stage = stage
+        self.duration = duration
+        self.success = success
+        self.error = error
+
+
+class EnginePass(Event):
+    """An external program has finished.
+
+    Attributes:
+        stage: Stage which ran the program, see engine.run_engine.
+        program: Name of the program, e.g. pdflatex.
+        number: How often the stage ran a program in this pipeline run.
+        duration: Wall clock time of the program in seconds.
+        returncode: Exit status of the program.
+        peak_rss: Peak resident memory of the program in bytes, if known.
+    """
+
+    stage: str
+    program: str
+    number: int
+    duration: float
+    returncode: Optional[int]
+    peak_rss: Optional[int]
+
+    def __init__(self, stage: str, program: str, number: int,
+                 duration: float, returncode: Optional[int],
+                 peak_rss: Optional[int] = None) -> None:
+        super().__init__()
+        self.stage = stage
+        self.program = program
+        self.number = number
+        self.duration = duration
+        self.returncode = returncode
+        self.peak_rss = peak_rss
+
+
+class CacheLookup(Event):
+    """A stage looked up an artifact in the cache.
+
+    Attributes:
+        stage: Cache stage of the artifact.
+        key: Key of the artifact.
+        hit: True if the artifact was found.
+    """
+
+    stage: str
+    key: str
+    hit: bool
+
+    def __init__(self, stage: str, key: str, hit: bool) -> None:
+        super().__init__()
+        self.stage = stage
+        self.key = key
+        self.hit = hit
+
+
+class ArtifactProduced(Event):
+    """A file which outlives the build was written.
+
+    Attributes:
+        stage: Name of the stage which wrote the file.
+        path: Path of the file.
+    """
+
+    stage: str
+    path: str
+
+    def __init__(self, stage: str, path: str) -> None:
+        super().__init__()
+        self.stage = stage
+        self.path = path
+
+
+class PipelineFinished(Event):
+    """The pipeline has finished. This is the last event of a run.
+
+    Attributes:
+        success: The success value returned by execute.
+        error: The error returned by execute, if any.
+        duration: Wall clock time of the run in seconds.
+    """
+
+    success: bool
+    error: Optional[exceptions.InternalException]
+    duration: float
+
+    def __init__(self, success: bool,
+                 error: Optional[exceptions.InternalException],
+                 duration: float) -> None:
+        super().__init__()
+        self.success = success
+        self.error = error
+        self.duration = duration
+
+
+Subscriber = Callable[[Event], None]
+
+
+class EventBus:
+    """Delivers published events to all subscribers.
+
+    Subscribers are called on the thread which publishes the event, which
+    may be a worker thread of a stage. They must return quickly. A bus
+    without subscribers is false, see the module docs.
+    """
+
+    # Private attributes
+    _subscribers: tuple[Subscriber, ...]
+    _pass_counts: dict[str, int]
+    _lock: threading.Lock
+
+    def __init__(self) -> None:
+        self._subscribers = ()
+        self._pass_counts = {}
+        self._lock = threading.Lock()
+
+    def __bool__(self) -> bool:
+        return bool(self._subscribers)
+
+    def subscribe(self, subscriber: Subscriber) -> Callable[[], None]:
+        """Calls the subscriber with every published event.
+
+        Returns:
+            Callable: Function which removes the subscriber again.
+        """
+        with self._lock:
+            self._subscribers += (subscriber,)
+
+        def _unsubscribe() -> None:
+            with self._lock:
+                self._subscribers = tuple(
+                    s for s in self._subscribers if s is not subscriber
+                )
+
+        return _unsubscribe
+
+    def publish(self, event: Event) -> None:
+        """Delivers the event to the subscribers."""
+        # The tuple is replaced on change, so it can be read without lock
+        for subscriber in self._subscribers:
+            subscriber(event)
+
+    def next_pass(self, stage: str) -> int:
+        """Counts the runs of an external program by the stage."""
+        with self._lock:
+            self._pass_counts[stage] = self._pass_counts.get(stage, 0) + 1
+            return self._pass_counts[stage]
+
+    def reset_passes(self) -> None:
+        """Starts counting the runs of external programs again."""
+        with self._lock:
+            self._pass_counts.clear()
+
+
+def bus_of(config_dict: dict[str, Any]) -> Optional[EventBus]:
+    """The event bus stored in the config dict, if there is one."""
+    bus: Optional[EventBus] = config_dict.get(ConfigDictKeys.EVENTS.value)
+    return bus
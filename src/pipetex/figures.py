@@ -0,0 +1,226 @@
+"""Externalization of TikZ and pgfplots figures.
+
+Every compilation of a document renders all of its tikzpicture environments
+again, which dominates the build time of documents with many figures. The
+operation in this module takes the figures out of the build copy, compiles
+each of them once as a standalone PDF and includes the result as a graphic.
+
+A figure is cached under a hash of its body and the preamble of the document,
+so figures which did not change cost nothing on the next build. Figures which
+are not cached yet are compiled in parallel. Figures which fail to compile on
+their own stay in the document and are rendered inline as before.
+
+Only the figures of the main file are externalized. Figures of files loaded
+with \\input or \\include are rendered inline, as these files are the sources
+of the project and are not rewritten.
+
+@author: Max Weise
+created: 19.10.2026
+"""
+
+from pipetex import cache
+from pipetex import engine
+from pipetex import events
+from pipetex import exceptions
+from pipetex import texsource
+from pipetex.enums import SeverityLevels, ConfigDictKeys
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional, Tuple
+
+import os
+import re
+import shutil
+import tempfile
+
+
+# === Type Def ===
+Monad = Tuple[bool, Optional[exceptions.InternalException]]
+
+CACHE_STAGE = "figures"
+
+_FIGURE_PATTERN = re.compile(
+    r"\\begin\{tikzpicture\}.*?\\end\{tikzpicture\}", re.DOTALL
+)
+_DOCUMENT_CLASS_PATTERN = re.compile(
+    r"\\documentclass\s*(\[[^\]]*\])?\s*\{[^}]*\}"
+)
+_GRAPHICX_PATTERN = re.compile(
+    r"\\usepackage\s*(\[[^\]]*\])?\s*\{[^}]*\bgraphicx\b"
+)
+
+
+def find_figures(body: str) -> list[re.Match[str]]:
+    """Finds all tikzpicture environments which are not commented out.
+
+    Args:
+        body: The document body, starting with the document environment.
+
+    Returns:
+        list[re.Match]: Matches spanning the whole environment of each figure.
+    """
+    return [match for match in _FIGURE_PATTERN.finditer(body)
+            if not texsource.is_commented(body, match.start())]
+
+
+def _standalone_source(preamble: str, figure: str) -> str:
+    """Creates a document which contains nothing but the figure."""
+    preamble = _DOCUMENT_CLASS_PATTERN.sub(
+        lambda _: "\\documentclass[tikz]{standalone}", preamble, count=1
+    )
+
+    return f"{preamble}\\begin{{document}}\n{figure}\n\\end{{document}}\n"
+
+
+def _compile_figure(key: str, source: str,
+                    config_dict: dict[str, Any]) -> Monad:
+    """Compiles a standalone figure in a temporary folder and caches it.
+
+    The folder of the project is added to the TEXINPUTS of the engine, so
+    files loaded by the preamble or the figure are still found.
+    """
+    project_dir = os.getcwd()
+    build_dir = tempfile.mkdtemp(prefix="pipetex-figure-")
+
+    try:
+        with open(os.path.join(build_dir, "figure.tex"), "w",
+                  encoding="utf-8") as tex_file:
+            tex_file.write(source)
+
+        success, error = engine.run_engine(
+            ["pdflatex", "-interaction=nonstopmode", "-halt-on-error",
+             "figure.tex"],
+            config_dict,
+            CACHE_STAGE,
+            missing_level=SeverityLevels.LOW,
+            cwd=build_dir,
+            env={"TEXINPUTS": engine.texinputs(project_dir)}
+        )
+
+        pdf_path = os.path.join(build_dir, "figure.pdf")
+        if success and not os.path.isfile(pdf_path):
+            error = exceptions.InternalException(
+                f"The figure {key[:12]} could not be compiled on its own.",
+                SeverityLevels.LOW
+            )
+
+        if error:
+            return False, error
+
+        cache.store(CACHE_STAGE, key, pdf_path, ".pdf")
+        return True, None
+
+    finally:
+        shutil.rmtree(build_dir, ignore_errors=True)
+
+
+def _compile_missing_figures(preamble: str, figures: dict[str, str],
+                             config_dict: dict[str, Any]) -> dict[str, Monad]:
+    """Compiles all figures which are not in the cache in parallel.
+
+    Args:
+        preamble: Preamble of the document, used for every figure.
+        figures: The source of every figure, keyed by its cache key.
+        config_dict: Dictionary containing further settings to run the engine.
+
+    Returns:
+        dict[str, Monad]: The result of each compilation, keyed by the cache
+            key of the figure.
+    """
+    bus = events.bus_of(config_dict)
+    missing = {key: figure for key, figure in figures.items()
+               if not cache.lookup(CACHE_STAGE, key, ".pdf", bus)}
+
+    if not missing:
+        return {}
+
+    jobs = config_dict.get(ConfigDictKeys.JOBS.value) or os.cpu_count()
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        results = pool.map(
+            lambda item: _compile_figure(
+                item[0], _standalone_source(preamble, item[1]), config_dict
+            ),
+            missing.items()
+        )
+
+        return dict(zip(missing, results))
+
+
+def externalize_figures(file_name: str, config_dict: dict[str, Any]) -> Monad:
+    """Replaces the figures of the file with their precompiled PDFs.
+
+    Args:
+        file_name: The name of the file to be compiled. Does not contain any
+            file extension.
+        config_dict: Dictionary containing further settings to run the engine.
+
+    Returns:
+        Monad: Tuple which contains a boolean to indicate success of the
+            function. If its true, the second value will be None. If its
+            false, the second value will contain an InternalException object
+            containing further information.
+
+    Raises:
+        InternalException: Indicates an internal error and is used to comunicate
+            exceptions and how to handle them back to the calling interface.
+            [Please see class definition]
+        Raised Levels: CRITICAL, LOW
+    """
+
+    if f"{file_name}.tex" not in os.listdir():
+        ex = exceptions.InternalException(
+            f"The file {file_name}.tex is not found in the current "
+            "working directory",
+            SeverityLevels.CRITICAL
+        )
+
+        return False, ex
+
+    with open(f"{file_name}.tex", "r", encoding="utf-8") as read_file:
+        content = read_file.read()
+
+    begin_index = content.find("\\begin{document}")
+    preamble, body = content[:begin_index], content[begin_index:]
+    matches = find_figures(body) if begin_index >= 0 else []
+
+    if not matches or not _DOCUMENT_CLASS_PATTERN.search(preamble):
+        return True, None
+
+    # Figures of reproducible builds carry the fixed date in their metadata
+    epoch = config_dict.get(ConfigDictKeys.SOURCE_DATE_EPOCH.value)
+    reproducible = [] if epoch is None else [str(epoch)]
+    keys = [cache.digest(preamble, match.group(0), *reproducible)
+            for match in matches]
+    results = _compile_missing_figures(
+        preamble, dict(zip(keys, (m.group(0) for m in matches))), config_dict
+    )
+
+    for _, error in results.values():
+        if error and error.severity_level >= SeverityLevels.CRITICAL:
+            return False, error
+
+    failed = {key for key, (success, _) in results.items() if not success}
+
+    # Replace from the back, so the positions of earlier matches stay valid
+    for key, match in reversed(list(zip(keys, matches))):
+        if key not in failed:
+            graphic = cache.entry_path(CACHE_STAGE, key, ".pdf")
+            body = (body[:match.start()] + f"\\includegraphics{{{graphic}}}" +
+                    body[match.end():])
+
+    if not _GRAPHICX_PATTERN.search(preamble):
+        preamble += "\\usepackage{graphicx}\n"
+
+    with open(f"{file_name}.tex", "w", encoding="utf-8") as write_file:
+        write_file.write(preamble + body)
+
+    if failed:
+        ex = exceptions.InternalException(
+            f"{len(failed)} of {len(set(keys))} figures could not be "
+            "externalized and are compiled inline.",
+            SeverityLevels.LOW
+        )
+
+        return False, ex
+
+    return True, None
@@ -0,0 +1,353 @@
+"""Reduction of large glossary definition files to the used entries.
+
+A project often loads one central file with all glossary entries, although a
+document only references a few of them. LaTeX defines every entry on every
+compilation and makeglossaries sorts all of them. The operation in this
+module writes a copy of each definition file which only contains the entries
+the document references and points the build copy at it.
+
+The used entries are found by scanning the source of the document for the
+commands of the glossaries package (gls, glspl, acrshort, glsadd, ...).
+Entries referenced by a used entry (its parent, see and seealso keys or a
+command in its definition) are kept as well. The trimmed files are cached
+under the definition file and the set of used keys.
+
+@author: Max Weise
+created: 19.10.2026
+"""
+
+from pipetex import cache
+from pipetex import events
+from pipetex import exceptions
+from pipetex.enums import SeverityLevels
+
+from typing import Any, Optional, Tuple
+
+import os
+import re
+import tempfile
+
+
+# === Type Def ===
+Monad = Tuple[bool, Optional[exceptions.InternalException]]
+# Maps each key to the start, end and referenced keys of its definition
+DefinitionIndex = dict[str, tuple[int, int, set[str]]]
+
+CACHE_STAGE = "glossary"
+
+# Defining commands and the number of mandatory arguments they take
+_DEFINING_COMMANDS = {
+    "newglossaryentry": 2,
+    "provideglossaryentry": 2,
+    "longnewglossaryentry": 3,
+    "longprovideglossaryentry": 3,
+    "newacronym": 3,
+    "newabbreviation": 3,
+}
+
+_DEFINITION_PATTERN = re.compile(
+    r"\\(" + "|".join(_DEFINING_COMMANDS) + r")\b\s*"
+)
+_REFERENCE_PATTERN = re.compile(
+    r"\\(?:[gG][lL][sS][a-zA-Z]*|[aA][cC][rR][a-zA-Z]*|[aA]c[slfp]?p?)"
+    r"\*?\s*(?:\[[^\]]*\])?\s*\{([^}]+)\}"
+)
+_LINK_PATTERN = re.compile(r"\b(?:parent|see|seealso)\s*=\s*"
+                           r"(?:\{([^}]*)\}|\[[^\]]*\]\{([^}]*)\}|([^,}]+))")
+_LOADING_PATTERN = re.compile(
+    r"\\(usepackage|loadglsentries|input|include)\s*(?:\[[^\]]*\])?"
+    r"\s*\{([^}]+)\}"
+)
+
+# Commands which use every entry, so nothing can be pruned
+_USE_ALL_PATTERN = re.compile(r"\\(?:glsaddall|glsaddallunused)\b")
+
+# Commands whose argument is not a glossary key
+_NON_KEY_COMMANDS = re.compile(
+    r"\\(?:glossarystyle|glssetwidest|glsnoidxdisplayloc)\b"
+)
+
+
+# === Parsing ===
+def _mask_comments(text: str) -> str:
+    """Blanks out the tex comments, keeping the position of all other code."""
+    return re.sub(r"(?<!\\)%[^\n]*", lambda m: " " * len(m.group(0)), text)
+
+
+def _group_end(text: str, open_index: int) -> int:
+    """Finds the end of the group whose delimiter opens at open_index."""
+    closing = "}" if text[open_index] == "{" else "]"
+    depth = 0
+
+    for index in range(open_index + 1, len(text)):
+        char = text[index]
+        if depth == 0 and char == closing:
+            return index + 1
+
+        if char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+
+    return len(text)
+
+
+def _skip_space(text: str, index: int) -> int:
+    while index < len(text) and text[index].isspace():
+        index += 1
+
+    return index
+
+
+def referenced_keys(text: str) -> Optional[set[str]]:
+    """Finds the glossary keys used by the commands in a piece of tex.
+
+    Returns:
+        Optional[set[str]]: The referenced keys or None if the text uses
+            all entries (glsaddall).
+    """
+    code = _mask_comments(text)
+    if _USE_ALL_PATTERN.search(code):
+        return None
+
+    keys: set[str] = set()
+    for match in _REFERENCE_PATTERN.finditer(code):
+        if not _NON_KEY_COMMANDS.match(code, match.start()):
+            keys.update(key.strip() for key in match.group(1).split(","))
+
+    return keys
+
+
+def index_definitions(text: str) -> DefinitionIndex:
+    """Locates the glossary entries defined in a piece of tex.
+
+    Args:
+        text: Content of the definition file.
+
+    Returns:
+        DefinitionIndex: The span of each definition and the keys it refers
+            to, keyed by the key of the defined entry.
+    """
+    definitions: DefinitionIndex = {}
+    code = _mask_comments(text)
+
+    for match in _DEFINITION_PATTERN.finditer(code):
+        index = _skip_space(code, match.end())
+        if index < len(code) and code[index] == "[":
+            index = _skip_space(code, _group_end(code, index))
+
+        groups: list[str] = []
+        for _ in range(_DEFINING_COMMANDS[match.group(1)]):
+            if index >= len(code) or code[index] != "{":
+                break
+
+            end = _group_end(code, index)
+            groups.append(code[index + 1:end - 1])
+            index = _skip_space(code, end)
+
+        if not groups:
+            continue
+
+        body = code[match.end():index]
+        links = {key.strip()
+                 for found in _LINK_PATTERN.findall(body)
+                 for key in "".join(found).split(",") if key.strip()}
+
+        definitions[groups[0].strip()] = (
+            match.start(), index, links | (referenced_keys(body) or set())
+        )
+
+    return definitions
+
+
+def _resolve_links(used: set[str], definitions: DefinitionIndex) -> set[str]:
+    """Adds all entries reachable from the used entries."""
+    needed: set[str] = set()
+    pending = list(used)
+
+    while pending:
+        key = pending.pop()
+        if key in needed:
+            continue
+
+        needed.add(key)
+        if key in definitions:
+            pending.extend(definitions[key][2])
+
+    return needed
+
+
+# === Discovery ===
+def _resolve_file(name: str, command: str) -> Optional[str]:
+    """Finds the file loaded by a command, relative to the working dir."""
+    extensions = [".sty"] if command == "usepackage" else ["", ".tex"]
+
+    for extension in extensions:
+        path = f"{name.strip()}{extension}"
+        if os.path.isfile(path):
+            return path
+
+    return None
+
+
+def _loaded_files(content: str) -> list[tuple[str, str]]:
+    """Collects the project files loaded by the tex file and its inputs.
+
+    Returns:
+        list[tuple]: The command and path of every loaded file, in the order
+            they are loaded. Packages not in the project are skipped.
+    """
+    loaded: list[tuple[str, str]] = []
+    pending = [content]
+    seen: set[str] = set()
+
+    while pending:
+        code = _mask_comments(pending.pop())
+        for match in _LOADING_PATTERN.finditer(code):
+            for name in match.group(2).split(","):
+                path = _resolve_file(name, match.group(1))
+                if not path or path in seen:
+                    continue
+
+                seen.add(path)
+                loaded.append((match.group(1), path))
+                with open(path, "r", encoding="utf-8",
+                          errors="replace") as loaded_file:
+                    pending.append(loaded_file.read())
+
+    return loaded
+
+
+def _trimmed_file(path: str, needed: set[str], definitions: DefinitionIndex,
+                  bus: Optional[events.EventBus] = None) -> str:
+    """Returns the cached copy of the definition file with the needed keys.
+
+    Everything in the file which is not part of an unused definition is
+    kept, so other macros defined in the file still work.
+    """
+    used = sorted(needed & definitions.keys())
+    extension = os.path.splitext(path)[1]
+    key = cache.digest(cache.file_digest(path), *used)
+
+    cached = cache.lookup(CACHE_STAGE, key, extension, bus)
+    if cached:
+        return cached
+
+    with open(path, "r", encoding="utf-8", errors="replace") as source_file:
+        code = source_file.read()
+
+    # Remove from the back, so the positions of earlier definitions stay valid
+    for definition_key, (start, end, _) in sorted(
+        definitions.items(), key=lambda item: item[1][0], reverse=True
+    ):
+        if definition_key not in needed:
+            code = code[:start] + code[end:]
+
+    with tempfile.NamedTemporaryFile("w", suffix=extension, encoding="utf-8",
+                                     delete=False) as tmp_file:
+        tmp_file.write(code)
+
+    trimmed_path = cache.store(CACHE_STAGE, key, tmp_file.name, extension)
+    os.remove(tmp_file.name)
+
+    return trimmed_path
+
+
+def prune_glossary(file_name: str, config_dict: dict[str, Any]) -> Monad:
+    """Points the file at copies of its glossary files with the used entries.
+
+    Must run before the first compilation. Documents which use every entry
+    (glsaddall) are left as they are.
+
+    Args:
+        file_name: The name of the file to be compiled. Does not contain any
+            file extension.
+        config_dict: Dictionary containing further settings to run the engine.
+
+    Returns:
+        Monad: Tuple which contains a boolean to indicate success of the
+            function. If its true, the second value will be None. If its
+            false, the second value will contain an InternalException object
+            containing further information.
+
+    Raises:
+        InternalException: Indicates an internal error and is used to comunicate
+            exceptions and how to handle them back to the calling interface.
+            [Please see class definition]
+        Raised Levels: CRITICAL
+    """
+
+    if f"{file_name}.tex" not in os.listdir():
+        ex = exceptions.InternalException(
+            f"The file {file_name}.tex is not found in the current "
+            "working directory",
+            SeverityLevels.CRITICAL
+        )
+
+        return False, ex
+
+    with open(f"{file_name}.tex", "r", encoding="utf-8") as read_file:
+        content = read_file.read()
+
+    # Only files loaded by the tex file itself can be replaced
+    direct = {_resolve_file(match.group(2), match.group(1))
+              for match in _LOADING_PATTERN.finditer(_mask_comments(content))
+              if match.group(1) != "include" and "," not in match.group(2)}
+
+    sources = [content]
+    definition_files: dict[str, DefinitionIndex] = {}
+
+    for _, path in _loaded_files(content):
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            text = f.read()
+
+        definitions = index_definitions(text)
+        if definitions and path in direct:
+            definition_files[path] = definitions
+        else:
+            sources.append(text)
+
+    used = referenced_keys("\n".join(sources))
+    if used is None or not definition_files:
+        return True, None
+
+    all_definitions: DefinitionIndex = {}
+    for definitions in definition_files.values():
+        all_definitions.update(definitions)
+
+    needed = _resolve_links(used, all_definitions)
+    bus = events.bus_of(config_dict)
+    replacements = {
+        path: _trimmed_file(path, needed, definitions, bus)
+        for path, definitions in definition_files.items()
+    }
+
+    _point_to_trimmed(file_name, content, replacements)
+
+    return True, None
+
+
+def _point_to_trimmed(file_name: str, content: str,
+                      replacements: dict[str, str]) -> None:
+    """Replaces the references to the definition files in the build copy.
+
+    Only references in the tex file itself are replaced. Definition files
+    loaded by another file of the project are used in full.
+    """
+    code = _mask_comments(content)
+
+    def _replace(match: re.Match[str]) -> str:
+        command = match.group(1)
+        path = _resolve_file(match.group(2), command)
+        if path not in replacements or code[match.start()] != "\\":
+            return match.group(0)
+
+        trimmed = replacements[str(path)]
+        if command == "usepackage":
+            trimmed = os.path.splitext(trimmed)[0]
+
+        return match.group(0).replace(f"{{{match.group(2)}}}",
+                                      f"{{{trimmed}}}")
+
+    with open(f"{file_name}.tex", "w", encoding="utf-8") as write_file:
+        write_file.write(_LOADING_PATTERN.sub(_replace, content))
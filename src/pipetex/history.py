@@ -0,0 +1,170 @@
+"""Database of past builds, used to predict the cost of the next ones.
+
+After each run the pipeline stores the duration and the peak memory (RSS)
+of every stage in a local SQLite database. The batch scheduler uses the
+predictions of this module to start the longest builds first and to keep
+the predicted memory of the running builds below a budget.
+
+The database lives in .pipetex/history.sqlite in the working directory. The
+environment variable PIPETEX_HISTORY_DB can be used to move it, e.g. to
+share it between all documents of a batch.
+
+@author: Max Weise
+created: 19.10.2026
+"""
+
+from typing import Optional
+
+import os
+import sqlite3
+import time
+
+
+HISTORY_FILE = os.path.join(".pipetex", "history.sqlite")
+
+# Number of past runs of a document used for its prediction
+PREDICTION_RUNS = 5
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS stage_runs (
+    document TEXT NOT NULL,
+    run_id INTEGER NOT NULL,
+    stage TEXT NOT NULL,
+    finished REAL NOT NULL,
+    duration REAL NOT NULL,
+    peak_rss INTEGER,
+    success INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS stage_runs_document
+    ON stage_runs (document, run_id);
+"""
+
+
+class Prediction:
+    """The expected cost of building a document.
+
+    Attributes:
+        duration: Expected wall clock time of the build in seconds.
+        peak_rss: Expected peak memory of its engines in bytes.
+        known: False if the document was never built and the prediction is
+            a guess based on the other documents.
+    """
+
+    duration: float
+    peak_rss: int
+    known: bool
+
+    def __init__(self, duration: float, peak_rss: int, known: bool) -> None:
+        self.duration = duration
+        self.peak_rss = peak_rss
+        self.known = known
+
+    def __repr__(self) -> str:
+        return (f"<Prediction {self.duration:.1f}s, "
+                f"{self.peak_rss // (1024 * 1024)} MB>")
+
+
+def history_path() -> str:
+    """Path of the history database."""
+    return os.environ.get("PIPETEX_HISTORY_DB") or HISTORY_FILE
+
+
+def document_id(file_name: str) -> str:
+    """Identifies a document by the absolute path of its tex file."""
+    return os.path.abspath(f"{file_name}.tex")
+
+
+def _connect(path: Optional[str] = None) -> sqlite3.Connection:
+    path = path or history_path()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    connection = sqlite3.connect(path, timeout=30)
+    connection.executescript(_SCHEMA)
+    return connection
+
+
+def record_run(file_name: str,
+               results: list[tuple[str, float, bool, Optional[int]]],
+               path: Optional[str] = None) -> None:
+    """Stores the stages of a finished run.
+
+    Args:
+        file_name: The name of the file which was compiled.
+        results: Label, duration, success and peak memory of each stage.
+        path (optional): Path of the database, see history_path.
+    """
+    document = document_id(file_name)
+    finished = time.time()
+
+    with _connect(path) as connection:
+        (run_id,) = connection.execute(
+            "SELECT COALESCE(MAX(run_id), 0) + 1 FROM stage_runs "
+            "WHERE document = ?", (document,)
+        ).fetchone()
+
+        connection.executemany(
+            "INSERT INTO stage_runs VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(document, run_id, stage, finished, duration, peak_rss,
+              int(success))
+             for stage, duration, success, peak_rss in results]
+        )
+
+    connection.close()
+
+
+def _known_predictions(connection: sqlite3.Connection,
+                       documents: list[str]) -> dict[str, Prediction]:
+    """Averages the last runs of each document which was built before."""
+    predictions: dict[str, Prediction] = {}
+
+    for document in documents:
+        rows = connection.execute(
+            "SELECT SUM(duration), MAX(peak_rss) FROM stage_runs "
+            "WHERE document = ? AND run_id > "
+            "(SELECT MAX(run_id) FROM stage_runs WHERE document = ?) - ? "
+            "GROUP BY run_id",
+            (document, document, PREDICTION_RUNS)
+        ).fetchall()
+
+        if rows:
+            predictions[document] = Prediction(
+                sum(row[0] for row in rows) / len(rows),
+                max(row[1] or 0 for row in rows),
+                True
+            )
+
+    return predictions
+
+
+def predict(file_names: list[str],
+            path: Optional[str] = None) -> dict[str, Prediction]:
+    """Predicts the cost of building each of the documents.
+
+    Documents without history are assumed to cost as much as the average
+    document with history.
+
+    Args:
+        file_names: Names of the files, without the .tex extension.
+        path (optional): Path of the database, see history_path.
+
+    Returns:
+        dict[str, Prediction]: The prediction of each file name.
+    """
+    documents = {name: document_id(name) for name in file_names}
+
+    with _connect(path) as connection:
+        all_documents = [row[0] for row in connection.execute(
+            "SELECT DISTINCT document FROM stage_runs"
+        )]
+        known = _known_predictions(connection, all_documents)
+
+    connection.close()
+
+    default = Prediction(
+        sum(p.duration for p in known.values()) / len(known) if known else 0,
+        max((p.peak_rss for p in known.values()), default=0),
+        False
+    )
+
+    return {name: known.get(document, default)
+            for name, document in documents.items()}
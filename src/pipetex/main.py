@@ -4,16 +4,73 @@ This file provides a CLI to the user and executes the pipeline with the
 specified parameters. It is not responsible for any errorhandling which occur
 while running the pipeline.
 
+The modules of the batch, variant, manifest, metrics, daemon and worker
+modes are imported by the functions using them, so a plain build does not
+pay for their startup.
+
 @author: Max Weise
 created: 11.08.2022
 """
 
+from pipetex import buildlock
+from pipetex import cache
+from pipetex import engine
 from pipetex import pipeline
+from pipetex import registry
+from pipetex import runlog
 
 
 import argparse
+import atexit
 # import coloredlogs
 import logging
+import os
+import sys
+import time
+from collections.abc import Callable
+from typing import TYPE_CHECKING, Any, Optional
+
+if TYPE_CHECKING:
+    from pipetex import variants
+
+
+def _timeout_argument(value: str) -> tuple[str, float]:
+    """Parses a timeout given as SECONDS or STAGE=SECONDS."""
+    stage, _, seconds = value.rpartition("=")
+    try:
+        return stage or "default", float(seconds)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid timeout: {value}")
+
+
+def _size_argument(value: str) -> int:
+    """Parses a size in bytes, e.g. 500M or 2G."""
+    units = {"k": 1024, "m": 1024 ** 2, "g": 1024 ** 3, "t": 1024 ** 4}
+    factor = units.get(value[-1:].lower())
+    try:
+        return int(float(value[:-1]) * factor if factor else float(value))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid size: {value}")
+
+
+def _age_argument(value: str) -> float:
+    """Parses a duration in seconds, e.g. 12h or 30d."""
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+    factor = units.get(value[-1:].lower())
+    try:
+        return float(value[:-1]) * factor if factor else float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid age: {value}")
+
+
+def _variant_argument(value: str) -> "variants.Variant":
+    """Parses a variant given as NAME[:OPTION,...][:MACRO=VALUE,...]."""
+    from pipetex import variants
+
+    try:
+        return variants.Variant.parse(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
 
 
 def _setup_sysarg_parser() -> argparse.Namespace:
@@ -30,7 +87,8 @@ def _setup_sysarg_parser() -> argparse.Namespace:
     # === Positional Arguments ===
     parser.add_argument(
         "filename",
-        help="Name of file which is processed by the pipeline."
+        help="Name of file which is processed by the pipeline.",
+        nargs="?"
     )
 
     # === Optional Arguments and Flags ===
@@ -52,28 +110,397 @@ def _setup_sysarg_parser() -> argparse.Namespace:
         action="store_true"
     )
 
+    parser.add_argument(
+        "--bib-backend",
+        help="Tool which creates the bibliography. By default the fastest "
+             "tool the document is compatible with is used.",
+        choices=["auto", "biber", "bibtex"],
+        default="auto"
+    )
+
+    parser.add_argument(
+        "--subset-bib",
+        help="Pass only the cited entries of the .bib files to biber.",
+        action="store_true"
+    )
+
     parser.add_argument(
         "-g", "--gls",
         help="Create a glossary in the current latex project",
         action="store_true"
     )
 
-    return parser.parse_args()
+    parser.add_argument(
+        "--prune-gls",
+        help="Load only the glossary entries used by the document.",
+        action="store_true"
+    )
+
+    parser.add_argument(
+        "--only",
+        help="Compile only the given \\include'd part. Can be repeated. The "
+             ".aux files of the other parts keep references valid.",
+        action="append",
+        metavar="PART"
+    )
+
+    parser.add_argument(
+        "--log-engine-output",
+        help="Write the output of the latex engines to the log file.",
+        action="store_true"
+    )
+
+    parser.add_argument(
+        "--externalize",
+        help="Compile TikZ and pgfplots figures separately and cache them.",
+        action="store_true"
+    )
+
+    parser.add_argument(
+        "--convert-assets",
+        help="Convert SVG and EPS graphics to PDF and downsample large "
+             "raster graphics before compiling.",
+        action="store_true"
+    )
+
+    parser.add_argument(
+        "--dpi",
+        help="Target resolution of downsampled raster graphics.",
+        type=int
+    )
+
+    parser.add_argument(
+        "--parallel-chapters",
+        help="Compile the \\include'd chapters in parallel and stitch their "
+             "pages together. Needs pypdf.",
+        action="store_true"
+    )
+
+    parser.add_argument(
+        "--preflight",
+        help="Check the inputs, environments and programs of the document "
+             "before any engine runs.",
+        action="store_true"
+    )
+
+    parser.add_argument(
+        "--reproducible",
+        help="Build a byte-identical PDF from identical sources. Dates are "
+             "taken from SOURCE_DATE_EPOCH, which must be set, and the "
+             "PDF is named by a hash of its content.",
+        action="store_true"
+    )
+
+    parser.add_argument(
+        "--optimize-pdf",
+        help="Compress and linearize the PDF before it is published. Uses "
+             "pikepdf or qpdf.",
+        action="store_true"
+    )
+
+    parser.add_argument(
+        "-j", "--jobs",
+        help="Number of parallel jobs. Defaults to the number of CPUs.",
+        type=int
+    )
+
+    # === Resource Limits ===
+    parser.add_argument(
+        "--timeout",
+        help="Wall clock timeout in seconds for the engine runs. Use "
+             "STAGE=SECONDS to set it for one stage (compile, bibliography, "
+             "glossary). Can be repeated.",
+        action="append",
+        type=_timeout_argument,
+        metavar="[STAGE=]SECONDS"
+    )
+
+    parser.add_argument(
+        "--max-cpu",
+        help="CPU time limit in seconds for each engine run.",
+        type=int,
+        metavar="SECONDS"
+    )
+
+    parser.add_argument(
+        "--max-memory",
+        help="Memory limit in MB for each engine run.",
+        type=int,
+        metavar="MB"
+    )
+
+    # === Stages ===
+    parser.add_argument(
+        "--stage",
+        help="Run a further registered operation, e.g. one of a plugin. "
+             "Can be given multiple times.",
+        action="append",
+        metavar="NAME"
+    )
+
+    parser.add_argument(
+        "--plan",
+        help="Report which stages a build would run and why, without "
+             "building anything. Exits with 1 if a build is needed.",
+        action="store_true"
+    )
+
+    parser.add_argument(
+        "--list-stages",
+        help="List the registered operations and exit.",
+        action="store_true"
+    )
+
+    # === Batch ===
+    parser.add_argument(
+        "--batch",
+        help="Build several documents in parallel, the longest first.",
+        nargs="+",
+        metavar="TEX_FILE"
+    )
+
+    parser.add_argument(
+        "--max-builds",
+        help="Number of documents built at the same time in a batch. "
+             "Defaults to the number of CPUs.",
+        type=int,
+        metavar="N"
+    )
+
+    parser.add_argument(
+        "--memory-budget",
+        help="Predicted peak memory in MB of all builds running at the same "
+             "time in a batch.",
+        type=int,
+        metavar="MB"
+    )
+
+    # === Variants ===
+    parser.add_argument(
+        "--variant",
+        help="Build a variant of the document with further class options "
+             "and \\def switches, e.g. print:twoside:isprint=1. Can be "
+             "repeated, the variants share their bibliography and glossary.",
+        action="append",
+        type=_variant_argument,
+        metavar="NAME[:OPTIONS][:DEFINES]"
+    )
+
+    # === Workers ===
+    parser.add_argument(
+        "--worker",
+        help="Build the jobs of the shared queue at BROKER until "
+             "interrupted, e.g. sqlite:/srv/pipetex-queue.",
+        metavar="BROKER"
+    )
+
+    parser.add_argument(
+        "--submit",
+        help="Send the build to the shared queue at BROKER and wait until a "
+             "worker has built it.",
+        metavar="BROKER"
+    )
+
+    # === Metrics ===
+    parser.add_argument(
+        "--metrics-port",
+        help="Serve the metrics of the builds of this process on "
+             "http://localhost:PORT/metrics, e.g. for the daemon.",
+        type=int,
+        metavar="PORT"
+    )
+
+    parser.add_argument(
+        "--metrics-file",
+        help="Write the metrics of the builds of this process to PATH "
+             "periodically and on exit.",
+        metavar="PATH"
+    )
+
+    # === Daemon ===
+    parser.add_argument(
+        "--daemon",
+        help="Start a long running pipeline server listening on a socket.",
+        action="store_true"
+    )
+
+    parser.add_argument(
+        "--use-daemon",
+        help="Send the build to a running pipeline server instead of "
+             "running it in this process.",
+        action="store_true"
+    )
+
+    parser.add_argument(
+        "--socket",
+        help="Path of the socket used by the pipeline server. Defaults to "
+             "pipetex-USER.sock in the temporary folder."
+    )
+
+    args = parser.parse_args()
+    if args.list_stages:
+        return args
+
+    if not args.filename and not (args.daemon or args.batch or args.worker):
+        parser.error("the filename is required unless --daemon, --batch or "
+                     "--worker is given")
+
+    for name in args.stage or []:
+        try:
+            registry.get(name)
+        except KeyError:
+            parser.error(f"unknown stage {name}, see --list-stages")
+
+    if args.reproducible:
+        try:
+            engine.source_date_epoch()
+        except ValueError as e:
+            parser.error(str(e))
+
+    return args
+
+
+def _setup_build_parser(argv: list[str]) -> argparse.Namespace:
+    """Creates the namespace of the build command, see manifest.py.
+
+    Returns:
+        parser: Namespace holding the arguments of `pipetex build`.
+    """
+    parser = argparse.ArgumentParser(
+        prog="pipetex build",
+        description="Rebuild the targets of the project manifest whose "
+                    "inputs changed since their last build."
+    )
+
+    parser.add_argument(
+        "targets",
+        help="Names of the targets to build, with the targets they need. "
+             "Defaults to all targets.",
+        nargs="*",
+        metavar="TARGET"
+    )
+
+    parser.add_argument(
+        "-q",
+        help="Turn the terminal log level down to WARNING",
+        action="store_true"
+    )
+
+    parser.add_argument(
+        "--manifest",
+        help="Path of the manifest. Defaults to pipetex.toml or the "
+             "[tool.pipetex] table of pyproject.toml.",
+        default=None
+    )
+
+    parser.add_argument(
+        "--force",
+        help="Rebuild all targets, even if they are up to date.",
+        action="store_true"
+    )
+
+    parser.add_argument(
+        "--max-builds",
+        help="Number of targets built at the same time. Defaults to the "
+             "number of CPUs.",
+        type=int,
+        metavar="N"
+    )
+
+    from pipetex import manifest
+
+    args = parser.parse_args(argv)
+    args.manifest = args.manifest or manifest.find_manifest()
+    if not args.manifest:
+        parser.error("no pipetex.toml or [tool.pipetex] table in "
+                     "pyproject.toml found")
+
+    return args
+
+
+def _setup_cache_parser(argv: list[str]) -> argparse.Namespace:
+    """Creates the namespace of the cache command, see cache.py.
+
+    Returns:
+        parser: Namespace holding the arguments of `pipetex cache`.
+    """
+    parser = argparse.ArgumentParser(
+        prog="pipetex cache",
+        description=f"Inspect and clean the artifact cache in "
+                    f"{cache.cache_root()}."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("stats", help="Size, hits and misses per stage.")
+
+    ls_parser = commands.add_parser("ls", help="List the cache entries.")
+    ls_parser.add_argument(
+        "--sort",
+        help="Order of the entries, the least recently used or the largest "
+             "first. Defaults to age.",
+        choices=["age", "size"],
+        default="age"
+    )
+    ls_parser.add_argument(
+        "--limit",
+        help="Number of entries listed. Defaults to 20, 0 lists all.",
+        type=int,
+        default=20,
+        metavar="N"
+    )
+    ls_parser.add_argument(
+        "--stage",
+        help="Only list the entries of this stage."
+    )
+
+    gc_parser = commands.add_parser(
+        "gc", help="Evict entries by age and size, least recently used first."
+    )
+    gc_parser.add_argument(
+        "--max-size",
+        help="Size of the cache after the gc, e.g. 2G.",
+        type=_size_argument,
+        metavar="SIZE"
+    )
+    gc_parser.add_argument(
+        "--max-age",
+        help="Evict entries not used for this long, e.g. 30d.",
+        type=_age_argument,
+        metavar="AGE"
+    )
+    gc_parser.add_argument(
+        "--dry-run",
+        help="Only list the entries which would be evicted.",
+        action="store_true"
+    )
+
+    verify_parser = commands.add_parser(
+        "verify", help="Re-hash the entries and report corrupted ones."
+    )
+    verify_parser.add_argument(
+        "--remove",
+        help="Remove the corrupted entries.",
+        action="store_true"
+    )
+
+    return parser.parse_args(argv)
 
 
 def _setup_logger(is_quiet: bool = False,
-                  log_file_path: str = "log_file.txt") -> logging.Logger:
+                  log_folder: str = runlog.LOG_FOLDER) -> logging.Logger:
     """Creates the logger instance for the script.
 
+    The handlers run on a background thread, see runlog.py.
+
     Args:
         is_quiet: When specified, the log level of the console handler will
             be set to WARNING. Defaults to False.
-        log_file_path: Path to the logfile where the FileHandler writes the
-            logs to. If no extra path is given, log_file.txt is used.
+        log_folder: Folder where the FileHandler writes the log file of this
+            run to. Defaults to .pipetex/logs.
 
     Returns:
-        logger: Logger object which has a Console- and FileHandler
-            added to it.
+        logger: Logger object whose records are written to the console and
+            the log file.
     """
     logger = logging.getLogger("main")
     logger.setLevel(logging.DEBUG)
@@ -82,13 +509,13 @@ def _setup_logger(is_quiet: bool = False,
     stream_level = logging.WARNING if is_quiet else logging.DEBUG
     console_handler = logging.StreamHandler()
     console_handler.setLevel(stream_level)
+    # Engine output is only written to the logfile, see engine.py
+    console_handler.addFilter(
+        lambda record: not record.name.startswith("main.engine")
+    )
 
-    # TODO: Create logfiles in seperate folder
-    #       Each run of the pipeline should create a seperate log file
-    #       (maybe limit this number to ~10 files in the folder)
-    #       Include a header for each logfile containing metadata
-    #       (logfolder needs to be created seperately)
-    file_handler = logging.FileHandler(log_file_path, encoding="utf-8")
+    file_handler = logging.FileHandler(runlog.new_log_file(log_folder),
+                                       encoding="utf-8")
     file_handler.setLevel(logging.DEBUG)
 
     # Set format for the logger
@@ -96,30 +523,392 @@ def _setup_logger(is_quiet: bool = False,
     console_handler.setFormatter(frmt)
     file_handler.setFormatter(frmt)
 
-    logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
+    runlog.start_listener(logger, console_handler, file_handler)
 
     return logger
 
 
+def _pipeline_options(cli_args: argparse.Namespace) -> dict[str, Any]:
+    """Collects the keyword arguments of the pipeline from the CLI args."""
+    return {
+        "create_bib": cli_args.bib,
+        "create_glo": cli_args.gls,
+        "prune_glo": cli_args.prune_gls,
+        "stages": cli_args.stage,
+        "subset_bib": cli_args.subset_bib,
+        "bib_backend": cli_args.bib_backend,
+        "verbose": cli_args.v,
+        "include_only": cli_args.only,
+        "timeouts": dict(cli_args.timeout or []),
+        "cpu_limit": cli_args.max_cpu,
+        "memory_limit": (cli_args.max_memory * 1024 * 1024
+                         if cli_args.max_memory else None),
+        "tee_engine_output": cli_args.log_engine_output,
+        "externalize_figures": cli_args.externalize,
+        "jobs": cli_args.jobs,
+        "parallel_chapters": cli_args.parallel_chapters,
+        "optimize_pdf": cli_args.optimize_pdf,
+        "preflight": cli_args.preflight,
+        "reproducible": cli_args.reproducible,
+        "convert_assets": cli_args.convert_assets,
+        "asset_settings": {"target_dpi": cli_args.dpi} if cli_args.dpi else {},
+        # "quiet": cli_args.q
+    }
+
+
+def _print_stages() -> None:
+    """Prints the operations which can be added with --stage."""
+    for operation in registry.available():
+        print(f"{operation.name:<22} {operation.phase:<8} "
+              f"{operation.cost:<8} {operation.description}")
+
+
+def _print_plan(p: pipeline.Pipeline) -> int:
+    """Prints the plan of the pipeline.
+
+    Returns:
+        int: Exit code, 0 if the document is up to date, 1 if a build is
+            needed and 2 if a stage is blocked.
+    """
+    plans = p.plan()
+    for stage in plans:
+        estimate = ("?" if stage.estimate is None
+                    else f"{stage.estimate:.1f}s")
+        print(f"{stage.stage:<22} {stage.status:<8} {estimate:>8}  "
+              f"{stage.reason}")
+
+    to_run = [s for s in plans if s.status == "run"]
+    print(f"{len(to_run)} of {len(plans)} stages would run, estimated "
+          f"{sum(s.estimate or 0 for s in to_run):.1f}s")
+
+    if any(s.status == "blocked" for s in plans):
+        return 2
+
+    return 1 if to_run else 0
+
+
+def _format_size(size: float) -> str:
+    """Formats a size in bytes for humans."""
+    for unit in ["B", "KB", "MB", "GB"]:
+        if size < 1024:
+            break
+        size /= 1024
+
+    return f"{size:.1f} {unit}" if unit != "B" else f"{size:.0f} B"
+
+
+def _print_cache_entries(entries: list[cache.CacheEntry]) -> None:
+    for entry in entries:
+        last_used = time.strftime("%Y-%m-%d %H:%M",
+                                  time.localtime(entry.last_used))
+        print(f"{last_used}  {_format_size(entry.size):>10}  "
+              f"{entry.stage}/{entry.name}")
+
+
+def _print_cache_stats() -> int:
+    """Prints the size and the hit rate of each stage of the cache."""
+    stages = cache.stats()
+    print(f"{'stage':<16} {'entries':>8} {'size':>10} {'hits':>8} "
+          f"{'misses':>8} {'hit rate':>9}")
+
+    for name, stage in sorted(stages.items()):
+        lookups = stage["hits"] + stage["misses"]
+        rate = f"{stage['hits'] / lookups:.0%}" if lookups else "-"
+        print(f"{name:<16} {stage['entries']:>8} "
+              f"{_format_size(stage['size']):>10} {stage['hits']:>8} "
+              f"{stage['misses']:>8} {rate:>9}")
+
+    print(f"{sum(s['entries'] for s in stages.values())} entries, "
+          f"{_format_size(sum(s['size'] for s in stages.values()))} in "
+          f"{cache.cache_root()}")
+    return 0
+
+
+def _manage_cache(cli_args: argparse.Namespace) -> int:
+    """Runs the cache command.
+
+    Returns:
+        int: Exit code, 1 if verify found corrupted entries.
+    """
+    match cli_args.command:
+        case "stats":
+            return _print_cache_stats()
+
+        case "ls":
+            entries = [e for e in cache.scan()
+                       if not cli_args.stage or e.stage == cli_args.stage]
+            entries.sort(key=lambda e: -e.size if cli_args.sort == "size"
+                         else e.last_used)
+            _print_cache_entries(entries[:cli_args.limit or None])
+
+        case "gc":
+            evicted = cache.gc(cli_args.max_size, cli_args.max_age,
+                               cli_args.dry_run)
+            _print_cache_entries(evicted)
+            print(f"{'Would evict' if cli_args.dry_run else 'Evicted'} "
+                  f"{len(evicted)} entries, "
+                  f"{_format_size(sum(e.size for e in evicted))}")
+
+        case "verify":
+            states = cache.verify(cli_args.remove)
+            for entry, state in states:
+                if state != "ok":
+                    print(f"{state:<8} {entry.stage}/{entry.name}")
+
+            corrupt = sum(1 for _, state in states if state == "corrupt")
+            print(f"{len(states)} entries checked, {corrupt} corrupt")
+            return 1 if corrupt else 0
+
+    return 0
+
+
+def _build_batch(cli_args: argparse.Namespace,
+                 logger: logging.Logger) -> int:
+    """Builds the documents of the batch and reports their results.
+
+    Returns:
+        int: Exit code, 0 if all documents were built successfully.
+    """
+    from pipetex import batch
+
+    documents = cli_args.batch + ([cli_args.filename]
+                                  if cli_args.filename else [])
+    results = batch.run_batch(
+        documents,
+        _pipeline_options(cli_args),
+        max_builds=cli_args.max_builds,
+        memory_budget=(cli_args.memory_budget * 1024 * 1024
+                       if cli_args.memory_budget else None)
+    )
+
+    for document, (success, error) in results.items():
+        if success:
+            logger.info("%s: built", document)
+        else:
+            logger.warning("%s: %s", document, error)
+
+    return 0 if all(success for success, _ in results.values()) else 1
+
+
+def _build_variants(cli_args: argparse.Namespace,
+                    logger: logging.Logger) -> int:
+    """Builds the variants of the document and reports their results.
+
+    Returns:
+        int: Exit code, 0 if all variants were built successfully.
+    """
+    from pipetex import variants
+
+    results = variants.build_variants(cli_args.filename, cli_args.variant,
+                                      _pipeline_options(cli_args),
+                                      max_builds=cli_args.max_builds)
+
+    for name, (success, error) in results.items():
+        if success:
+            logger.info("%s: built", name)
+        else:
+            logger.warning("%s: %s", name, error)
+
+    return 0 if all(success for success, _ in results.values()) else 1
+
+
+def _start_metrics(cli_args: argparse.Namespace) -> None:
+    """Exposes the metrics of this process if the user asked for them."""
+    if cli_args.metrics_port is None and not cli_args.metrics_file:
+        return
+
+    from pipetex import metrics
+
+    atexit.register(metrics.start_exporter(metrics.REGISTRY,
+                                           port=cli_args.metrics_port,
+                                           path=cli_args.metrics_file))
+
+
+def _build_targets(cli_args: argparse.Namespace,
+                   logger: logging.Logger) -> int:
+    """Rebuilds the stale targets of the manifest and reports their results.
+
+    Returns:
+        int: Exit code, 0 if no target failed.
+    """
+    from pipetex import manifest
+
+    try:
+        targets = manifest.load_manifest(cli_args.manifest)
+        if cli_args.targets:
+            targets = manifest.select_targets(targets, cli_args.targets)
+    except ValueError as e:
+        logger.error("%s", e)
+        return 2
+
+    results = manifest.build(targets, force=cli_args.force,
+                             max_builds=cli_args.max_builds)
+
+    for name, result in results.items():
+        if not result:
+            logger.info("%s: up to date", name)
+        elif result[0]:
+            logger.info("%s: built", name)
+        else:
+            logger.warning("%s: %s", name, result[1])
+
+    return 0 if all(not result or result[0]
+                    for result in results.values()) else 1
+
+
+def _build_with_workers(cli_args: argparse.Namespace,
+                        logger: logging.Logger) -> int:
+    """Queues the build for the workers and fetches the created PDF files.
+
+    Returns:
+        int: Exit code, 0 if the document was built successfully.
+    """
+    from pipetex import workers
+
+    broker = workers.open_broker(cli_args.submit)
+    job_id = broker.submit(os.getcwd(), cli_args.filename,
+                           _pipeline_options(cli_args))
+    logger.info("Queued job %s", job_id)
+
+    report = workers.wait_for(broker, job_id)
+    for path in broker.fetch_artifacts(job_id, "DEPLOY"):
+        logger.info("Received %s", path)
+
+    success, error = workers.report_to_monad(report)
+    if error:
+        logger.warning("Build on %s finished with an error (%s): %s",
+                       report["worker"], error.severity_level, error.message)
+    else:
+        logger.info("Build on %s finished in %.1fs", report["worker"],
+                    report["duration"])
+
+    return 0 if success else 1
+
+
+def _serve_daemon(cli_args: argparse.Namespace,
+                  logger: logging.Logger) -> Optional[int]:
+    """Runs the pipeline daemon until it receives a shutdown request.
+
+    Returns:
+        int: Exit code 1 if the daemon could not start, None else.
+    """
+    from pipetex import daemon
+
+    try:
+        daemon.serve(cli_args.socket or daemon.default_socket_path())
+    except OSError as e:
+        logger.critical(f"The pipeline daemon could not start: {e}")
+        return 1
+
+    return None
+
+
+def _build_with_daemon(cli_args: argparse.Namespace,
+                       logger: logging.Logger) -> None:
+    """Hands the build to a running daemon and reports its progress."""
+    from pipetex import daemon
+
+    request = {
+        "command": "build",
+        "work_dir": os.getcwd(),
+        "file_name": cli_args.filename,
+        "options": _pipeline_options(cli_args)
+    }
+
+    socket_path = cli_args.socket or daemon.default_socket_path()
+    for message in daemon.send_request(request, socket_path):
+        match message["event"]:
+            case "log":
+                logger.log(message["level"], message["message"])
+
+            case "result" if not message["success"]:
+                logger.warning(
+                    f"Build finished with an error "
+                    f"({message['severity_level']}): {message['message']}"
+                )
+
+            case "result":
+                logger.info("Build finished")
+
+            case _:
+                logger.debug(f"Daemon: {message['event']}")
+
+
+def _build_document(cli_args: argparse.Namespace,
+                    logger: logging.Logger) -> Optional[int]:
+    """Builds the document named on the command line, or prints its plan.
+
+    Returns:
+        int: Exit code of the plan, None after a build.
+    """
+    logger.info("Initializing pipeline")
+    options = _pipeline_options(cli_args)
+    p = pipeline.Pipeline(cli_args.filename, **options)
+
+    if cli_args.plan:
+        return _print_plan(p)
+
+    logger.info("Starting pipeline")
+    buildlock.run_coalesced(p.file_name, options,
+                            lambda: p.execute(p.file_name))
+    return None
+
+
+def _run_build(argv: list[str]) -> int:
+    build_args = _setup_build_parser(argv)
+    return _build_targets(build_args, _setup_logger(build_args.q))
+
+
+def _run_cache(argv: list[str]) -> int:
+    return _manage_cache(_setup_cache_parser(argv))
+
+
+# Commands given as the first argument, e.g. `pipetex build`. A document
+# of the same name in the working directory is compiled instead.
+_SUBCOMMANDS: dict[str, Callable[[list[str]], int]] = {
+    "build": _run_build,
+    "cache": _run_cache,
+}
+
+
 def main():
     """Main method of the module."""
+    command = sys.argv[1] if sys.argv[1:2] else ""
+    if command in _SUBCOMMANDS and not os.path.isfile(f"{command}.tex"):
+        return _SUBCOMMANDS[command](sys.argv[2:])
+
     cli_args = _setup_sysarg_parser()
     logger = _setup_logger()
+    _start_metrics(cli_args)
 
-    logger.info("Initializing pipeline")
-    p = pipeline.Pipeline(
-        cli_args.filename,
-        create_bib=cli_args.bib,
-        create_glo=cli_args.gls,
-        verbose=cli_args.v,
-        # quiet=cli_args.q
-    )
+    if cli_args.list_stages:
+        _print_stages()
+        return
 
-    logger.info("Starting pipeline")
-    p.execute(p.file_name)
+    if cli_args.daemon:
+        return _serve_daemon(cli_args, logger)
+
+    if cli_args.worker:
+        from pipetex import workers
+        workers.run_worker(workers.open_broker(cli_args.worker))
+        return
+
+    if cli_args.submit:
+        return _build_with_workers(cli_args, logger)
+
+    if cli_args.use_daemon:
+        _build_with_daemon(cli_args, logger)
+        return
+
+    if cli_args.batch:
+        return _build_batch(cli_args, logger)
+
+    if cli_args.variant:
+        return _build_variants(cli_args, logger)
+
+    return _build_document(cli_args, logger)
 
 
 if __name__ == "__main__":
-    main()
+    raise SystemExit(main())
 
@@ -0,0 +1,295 @@
+"""Project manifest declaring the documents of a project.
+
+Instead of naming a file and repeating its flags on every call, a project
+can declare its documents as targets in pipetex.toml or in the [tool.pipetex]
+table of its pyproject.toml:
+
+    [tool.pipetex.options]          # Defaults of all targets
+    verbose = false
+
+    [tool.pipetex.targets.requirements]
+    file = "documentation/requirements.tex"
+    create_glo = true
+    needs = ["styleguide"]          # Built after these targets
+
+    [tool.pipetex.targets.styleguide]
+    file = "documentation/styleguide.tex"
+
+The options of a target are the keyword arguments of the pipeline. Paths are
+relative to the folder of the manifest. In pipetex.toml the tables are
+written without the tool.pipetex prefix.
+
+`pipetex build` rebuilds the targets whose inputs or options changed since
+their last successful build, see planner.py. A target is rebuilt as well if
+a target it needs was rebuilt. Targets which do not need each other are
+built in parallel, see batch.py.
+
+@author: Max Weise
+created: 19.10.2026
+"""
+
+from pipetex import batch
+from pipetex import exceptions
+from pipetex import pipeline
+from pipetex import runlog
+from pipetex.enums import SeverityLevels
+
+from collections.abc import Callable
+from concurrent.futures import Executor
+from typing import Any, Optional, Tuple
+
+import inspect
+import os
+
+try:
+    import tomllib
+    _HAS_TOML = True
+except ImportError:     # pragma: no cover - Python 3.10
+    try:
+        import tomli as tomllib  # type: ignore[no-redef]
+        _HAS_TOML = True
+    except ImportError:
+        _HAS_TOML = False
+
+
+# === Type Def ===
+Monad = Tuple[bool, Optional[exceptions.InternalException]]
+
+MANIFEST_FILES = ("pipetex.toml", "pyproject.toml")
+
+# Keys of a target which are not options of the pipeline
+_TARGET_KEYS = ("file", "needs")
+
+
+class Target:
+    """A document declared in the manifest.
+
+    Attributes:
+        name: Name of the target, used on the command line.
+        file_name: Absolute path of the tex file, without extension.
+        options: Keyword options the pipeline is created with.
+        needs: Names of the targets which are built before this one.
+    """
+
+    name: str
+    file_name: str
+    options: dict[str, Any]
+    needs: list[str]
+
+    def __init__(self, name: str, file_name: str, options: dict[str, Any],
+                 needs: Optional[list[str]] = None) -> None:
+        self.name = name
+        self.file_name = file_name
+        self.options = options
+        self.needs = needs or []
+
+    def __repr__(self) -> str:
+        return f"<Target {self.name} ({self.file_name}.tex)>"
+
+
+def find_manifest(folder: str = ".") -> Optional[str]:
+    """Finds the manifest of the project in the folder.
+
+    Returns:
+        str: Path of pipetex.toml, or of pyproject.toml if it contains a
+            [tool.pipetex] table. None if the project has no manifest.
+    """
+    for name in MANIFEST_FILES:
+        path = os.path.join(folder, name)
+        if not os.path.isfile(path):
+            continue
+
+        if name != "pyproject.toml":
+            return path
+
+        with open(path, "r", encoding="utf-8") as f:
+            if "[tool.pipetex" in f.read():
+                return path
+
+    return None
+
+
+def _pipeline_parameters() -> set[str]:
+    """Names of the keyword options accepted by the pipeline."""
+    parameters = inspect.signature(pipeline.Pipeline.__init__).parameters
+    return set(parameters) - {"self", "file_name", "work_dir"}
+
+
+def _read_target(name: str, table: dict[str, Any], defaults: dict[str, Any],
+                 folder: str, parameters: set[str]) -> Target:
+    """Creates a target from its table in the manifest."""
+    options = {**defaults, **{key: value for key, value in table.items()
+                              if key not in _TARGET_KEYS}}
+    unknown = set(options) - parameters
+    if unknown:
+        raise ValueError(f"Unknown options of target {name}: "
+                         f"{', '.join(sorted(unknown))}")
+
+    if "file" not in table:
+        raise ValueError(f"The target {name} does not name a file")
+
+    file_name = os.path.join(folder, table["file"])
+    if file_name.endswith(".tex"):
+        file_name = file_name[:-4]
+
+    if not os.path.isfile(f"{file_name}.tex"):
+        raise ValueError(f"The file of target {name} does not exist: "
+                         f"{file_name}.tex")
+
+    return Target(name, file_name, options, table.get("needs"))
+
+
+def load_manifest(path: str) -> list[Target]:
+    """Reads the targets declared in the manifest.
+
+    Raises:
+        ValueError: If the manifest can not be read or declares an unknown
+            option, target or file.
+    """
+    if not _HAS_TOML:
+        raise ValueError("Reading a manifest needs Python 3.11 or tomli")
+
+    try:
+        with open(path, "rb") as f:
+            data = tomllib.load(f)
+    except tomllib.TOMLDecodeError as e:
+        raise ValueError(f"{path} is not valid TOML: {e}")
+
+    if os.path.basename(path) == "pyproject.toml":
+        data = data.get("tool", {}).get("pipetex", {})
+
+    folder = os.path.dirname(os.path.abspath(path))
+    defaults = data.get("options", {})
+    parameters = _pipeline_parameters()
+
+    targets = [_read_target(name, table, defaults, folder, parameters)
+               for name, table in data.get("targets", {}).items()]
+
+    build_order(targets)
+    return targets
+
+
+def select_targets(targets: list[Target], names: list[str]) -> list[Target]:
+    """Picks the named targets and the targets they need.
+
+    Raises:
+        ValueError: If a name is not a target of the manifest.
+    """
+    by_name = {target.name: target for target in targets}
+    selected: set[str] = set()
+    pending = list(names)
+
+    while pending:
+        name = pending.pop()
+        if name not in by_name:
+            raise ValueError(f"Unknown target {name}, the manifest declares "
+                             f"{', '.join(sorted(by_name))}")
+
+        if name not in selected:
+            selected.add(name)
+            pending += by_name[name].needs
+
+    return [target for target in targets if target.name in selected]
+
+
+def build_order(targets: list[Target]) -> list[list[Target]]:
+    """Groups the targets into stages which only need earlier stages.
+
+    Raises:
+        ValueError: If a target needs an unknown target or the targets need
+            each other.
+    """
+    names = {target.name for target in targets}
+    for target in targets:
+        missing = set(target.needs) - names
+        if missing:
+            raise ValueError(f"The target {target.name} needs the unknown "
+                             f"targets {', '.join(sorted(missing))}")
+
+    stages: list[list[Target]] = []
+    done: set[str] = set()
+    pending = list(targets)
+
+    while pending:
+        ready = [t for t in pending if set(t.needs) <= done]
+        if not ready:
+            raise ValueError("The targets need each other: " +
+                             ", ".join(t.name for t in pending))
+
+        stages.append(ready)
+        done.update(t.name for t in ready)
+        pending = [t for t in pending if t not in ready]
+
+    return stages
+
+
+def stale_reason(target: Target) -> Optional[str]:
+    """Explains why the target has to be rebuilt.
+
+    Returns:
+        str: The first stage which would run and why, None if the target is
+            up to date.
+    """
+    work_dir, name = os.path.split(target.file_name)
+    plans = pipeline.Pipeline(name, work_dir=work_dir or None,
+                              **target.options).plan()
+
+    for plan in plans:
+        if plan.status != "skip":
+            return f"{plan.stage}: {plan.reason}"
+
+    return None
+
+
+def build(targets: list[Target],
+          force: bool = False,
+          max_builds: Optional[int] = None,
+          executor_factory: Callable[[int], Executor] = runlog.process_pool
+          ) -> dict[str, Optional[Monad]]:
+    """Rebuilds the targets which changed since their last build.
+
+    Args:
+        targets: The targets of the manifest, see load_manifest.
+        force (optional): Rebuild all targets. Defaults to false.
+        max_builds (optional): Number of targets built at the same time.
+            Defaults to the number of CPUs.
+        executor_factory (optional): Creates the pool running the builds
+            from the number of workers.
+
+    Returns:
+        dict: The result of each target, None if it was up to date.
+    """
+    results: dict[str, Optional[Monad]] = {}
+
+    for stage in build_order(targets):
+        failed = {name for name, result in results.items()
+                  if result and not result[0]}
+        stale = [t for t in stage
+                 if force or any(results.get(n) for n in t.needs) or
+                 stale_reason(t)]
+        blocked = [t for t in stale if failed.intersection(t.needs)]
+
+        for target in stage:
+            if target in blocked:
+                results[target.name] = (False, exceptions.InternalException(
+                    f"The target {target.name} was not built, because "
+                    f"{', '.join(sorted(failed.intersection(target.needs)))} "
+                    "failed.",
+                    SeverityLevels.HIGH
+                ))
+            elif target not in stale:
+                results[target.name] = None
+
+        to_build = [t for t in stale if t not in blocked]
+        if not to_build:
+            continue
+
+        built = batch.run_batch(
+            [t.file_name for t in to_build], {},
+            max_builds=max_builds,
+            executor_factory=executor_factory,
+            document_options={t.file_name: t.options for t in to_build}
+        )
+        results.update({t.name: built[t.file_name] for t in to_build})
+
+    return results
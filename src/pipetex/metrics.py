@@ -0,0 +1,352 @@
+"""Operational metrics of long running pipetex processes.
+
+The daemon, the build workers and batches record their builds in REGISTRY.
+The pipelines report through their event bus, see Metrics.observe. The
+metrics are exposed in the Prometheus text format, either on an HTTP
+endpoint or in a file which is rewritten periodically, e.g. for the
+textfile collector of the node exporter:
+
+    - pipetex_builds_total: Finished builds by outcome and severity level.
+    - pipetex_stage_duration_seconds: Histogram of the stage durations.
+    - pipetex_engine_passes_total: Runs of external programs by stage.
+    - pipetex_cache_lookups_total, pipetex_cache_hit_ratio: Cache lookups by
+      cache stage and the share of hits.
+    - pipetex_queue_depth: Builds waiting to be executed.
+    - pipetex_builds_in_flight: Builds running at the moment.
+
+Builds of a batch run in worker processes, so only their outcome, the queue
+and the running builds are recorded.
+
+@author: Max Weise
+created: 19.10.2026
+"""
+
+from pipetex import events
+from pipetex import exceptions
+from pipetex.enums import SeverityLevels
+
+from collections.abc import Callable
+from typing import Optional
+
+import bisect
+import http.server
+import os
+import tempfile
+import threading
+
+
+# === Type Def ===
+Labels = tuple[tuple[str, str], ...]
+
+# Upper bounds of the stage duration buckets in seconds
+DEFAULT_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0,
+                   300.0, 600.0)
+
+DEFAULT_INTERVAL = 15.0
+
+# Interface of the HTTP endpoint, only local clients can connect by default
+DEFAULT_HOST = "127.0.0.1"
+
+OPENMETRICS_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+TEXT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Histogram:
+    """Distribution of observed values over fixed buckets.
+
+    Attributes:
+        buckets: Upper bounds of the buckets, the last bucket is unbounded.
+        counts: Number of values in each bucket, not cumulative.
+        total: Sum of all values.
+    """
+
+    buckets: tuple[float, ...]
+    counts: list[int]
+    total: float
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"')
+               .replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value
+                          in zip(labels, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    return "+Inf" if value == float("inf") else repr(float(value))
+
+
+class Metrics:
+    """Thread safe collection of the metrics of a process."""
+
+    buckets: tuple[float, ...]
+    builds: dict[Labels, int]
+    stage_durations: dict[str, Histogram]
+    engine_passes: dict[Labels, int]
+    cache_lookups: dict[str, list[int]]
+    queue_depth: int
+    in_flight: int
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.buckets = buckets
+        self.builds = {}
+        self.stage_durations = {}
+        self.engine_passes = {}
+        self.cache_lookups = {}
+        self.queue_depth = 0
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    # === Recording ===
+    def build_started(self) -> None:
+        with self._lock:
+            self.in_flight += 1
+
+    def build_finished(self, success: bool,
+                       error: Optional[exceptions.InternalException]) -> None:
+        """Counts a finished build by its outcome and severity level."""
+        severity = (SeverityLevels(error.severity_level).name.lower()
+                    if error else "none")
+        labels = (("outcome", "success" if success else "failure"),
+                  ("severity", severity))
+        with self._lock:
+            self.in_flight = max(self.in_flight - 1, 0)
+            self.builds[labels] = self.builds.get(labels, 0) + 1
+
+    def build_aborted(self) -> None:
+        """Stops counting a build which raised before it finished."""
+        with self._lock:
+            self.in_flight = max(self.in_flight - 1, 0)
+
+    def set_queue_depth(self, depth: int) -> None:
+        with self._lock:
+            self.queue_depth = depth
+
+    def record_event(self, event: events.Event) -> None:
+        """Records a stage, engine pass or cache lookup of a pipeline."""
+        with self._lock:
+            if isinstance(event, events.StageFinished):
+                self.stage_durations.setdefault(
+                    event.stage, Histogram(self.buckets)
+                ).observe(event.duration)
+
+            elif isinstance(event, events.EnginePass):
+                labels = (("stage", event.stage), ("program", event.program))
+                self.engine_passes[labels] = (
+                    self.engine_passes.get(labels, 0) + 1
+                )
+
+            elif isinstance(event, events.CacheLookup):
+                hits = self.cache_lookups.setdefault(event.stage, [0, 0])
+                hits[0 if event.hit else 1] += 1
+
+    def observe(self, bus: events.EventBus) -> Callable[[], None]:
+        """Records the runs of the pipeline publishing on the bus.
+
+        Returns:
+            Callable: Stops recording the bus. A run which did not finish
+                until then is no longer counted as in flight.
+        """
+        running = threading.Event()
+
+        def _record(event: events.Event) -> None:
+            if isinstance(event, events.StageStarted) and event.index == 0:
+                running.set()
+                self.build_started()
+
+            elif isinstance(event, events.PipelineFinished):
+                if running.is_set():
+                    running.clear()
+                    self.build_finished(event.success, event.error)
+
+            else:
+                self.record_event(event)
+
+        unsubscribe = bus.subscribe(_record)
+
+        def _stop() -> None:
+            unsubscribe()
+            if running.is_set():
+                running.clear()
+                self.build_aborted()
+
+        return _stop
+
+    # === Exposition ===
+    def _families(self) -> list[tuple[str, str, str,
+                                      list[tuple[str, Labels, float]]]]:
+        """Name, type, help and samples of each metric family."""
+        durations: list[tuple[str, Labels, float]] = []
+        for stage, histogram in sorted(self.stage_durations.items()):
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + (float("inf"),),
+                                    histogram.counts):
+                cumulative += count
+                durations.append(("_bucket", (("stage", stage),
+                                              ("le", _format_value(bound))),
+                                  cumulative))
+
+            durations += [("_count", (("stage", stage),), cumulative),
+                          ("_sum", (("stage", stage),), histogram.total)]
+
+        lookups = sorted(self.cache_lookups.items())
+        return [
+            ("pipetex_builds", "counter",
+             "Finished builds by outcome and severity level.",
+             [("_total", labels, count)
+              for labels, count in sorted(self.builds.items())]),
+            ("pipetex_stage_duration_seconds", "histogram",
+             "Wall clock time of the stages of the pipeline.", durations),
+            ("pipetex_engine_passes", "counter",
+             "Runs of external programs by stage.",
+             [("_total", labels, count)
+              for labels, count in sorted(self.engine_passes.items())]),
+            ("pipetex_cache_lookups", "counter",
+             "Lookups in the artifact cache by cache stage and result.",
+             [("_total", (("stage", stage), ("result", result)), count)
+              for stage, counts in lookups
+              for result, count in zip(("hit", "miss"), counts)]),
+            ("pipetex_cache_hit_ratio", "gauge",
+             "Share of the cache lookups which found the artifact.",
+             [("", (("stage", stage),), counts[0] / sum(counts))
+              for stage, counts in lookups]),
+            ("pipetex_queue_depth", "gauge",
+             "Builds waiting to be executed.", [("", (), self.queue_depth)]),
+            ("pipetex_builds_in_flight", "gauge",
+             "Builds running at the moment.", [("", (), self.in_flight)]),
+        ]
+
+    def render(self, openmetrics: bool = False) -> str:
+        """Formats the metrics for a scrape.
+
+        Args:
+            openmetrics (optional): Use the OpenMetrics format instead of the
+                Prometheus text format. Defaults to false.
+        """
+        with self._lock:
+            families = self._families()
+
+        lines: list[str] = []
+        for name, kind, description, samples in families:
+            # Counters are named by their samples in the text format
+            family = (f"{name}_total" if kind == "counter" and
+                      not openmetrics else name)
+            lines += [f"# HELP {family} {description}",
+                      f"# TYPE {family} {kind}"]
+            lines += [f"{name}{suffix}{_format_labels(labels)} "
+                      f"{_format_value(value)}"
+                      for suffix, labels, value in samples]
+
+        if openmetrics:
+            lines.append("# EOF")
+
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Metrics()
+
+
+def write_file(metrics: Metrics, path: str) -> None:
+    """Writes the metrics to the file, replacing it in one step."""
+    folder = os.path.dirname(os.path.abspath(path))
+    os.makedirs(folder, exist_ok=True)
+
+    descriptor, temp_path = tempfile.mkstemp(dir=folder, suffix=".tmp")
+    # mkstemp creates the file readable by its owner only, but collectors
+    # like the textfile collector of the node exporter run as another user
+    os.chmod(temp_path, 0o644)
+    with os.fdopen(descriptor, "w", encoding="utf-8") as metrics_file:
+        metrics_file.write(metrics.render())
+
+    os.replace(temp_path, path)
+
+
+class _MetricsHandler(http.server.BaseHTTPRequestHandler):
+    """Answers scrapes of /metrics."""
+
+    metrics: Metrics
+
+    def do_GET(self) -> None:
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+
+        openmetrics = ("application/openmetrics-text" in
+                       self.headers.get("Accept", ""))
+        body = self.metrics.render(openmetrics).encode("utf-8")
+
+        self.send_response(200)
+        self.send_header("Content-Type",
+                         OPENMETRICS_TYPE if openmetrics else TEXT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: object) -> None:
+        """Scrapes are not logged."""
+
+
+def serve_http(metrics: Metrics, port: int,
+               host: str = DEFAULT_HOST) -> http.server.ThreadingHTTPServer:
+    """Serves the metrics on http://host:port/metrics in the background.
+
+    Returns:
+        ThreadingHTTPServer: The running server, stopped by its shutdown.
+    """
+    handler = type("MetricsHandler", (_MetricsHandler,), {"metrics": metrics})
+    server = http.server.ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server
+
+
+def start_exporter(metrics: Metrics,
+                   port: Optional[int] = None,
+                   path: Optional[str] = None,
+                   interval: float = DEFAULT_INTERVAL) -> Callable[[], None]:
+    """Exposes the metrics on an HTTP port and/or in a file.
+
+    Args:
+        metrics: The metrics to expose.
+        port (optional): Port of the HTTP endpoint.
+        path (optional): File which is rewritten every interval seconds.
+        interval (optional): Seconds between two writes of the file.
+
+    Returns:
+        Callable: Stops the exporter. The file is written a last time.
+    """
+    stopped = threading.Event()
+    server = serve_http(metrics, port) if port is not None else None
+
+    if path:
+        file_path = path
+
+        def _write_periodically() -> None:
+            while not stopped.wait(interval):
+                write_file(metrics, file_path)
+
+        write_file(metrics, file_path)
+        threading.Thread(target=_write_periodically, daemon=True).start()
+
+    def _stop() -> None:
+        stopped.set()
+        if server:
+            server.shutdown()
+            server.server_close()
+        if path:
+            write_file(metrics, path)
+
+    return _stop
@@ -8,14 +8,17 @@ signature so the pipeline can dynamically execute them one by one.
 created: 23.07.2022
 """
 
+from pipetex import cache
+from pipetex import engine
+from pipetex import events
 from pipetex import exceptions
+from pipetex import texsource
 from pipetex.enums import SeverityLevels, ConfigDictKeys
 
 import datetime
 import os
 import re
 import shutil
-import subprocess
 from typing import Any, Optional, Tuple
 
 
@@ -132,6 +135,113 @@ def remove_draft_option(file_name: str, config_dict: dict[str, Any]) -> Monad:
     return True, None
 
 
+def set_include_only(file_name: str, config_dict: dict[str, Any]) -> Monad:
+    """Restricts the compilation to the selected parts of the document.
+
+    Injects an includeonly command into the preamble of the file, so only the
+    parts listed in the config dict are typeset. The .aux files of all other
+    parts are left untouched. LaTeX reads them instead of the parts, which
+    keeps page numbers and references of the full document valid.
+
+    Args:
+        file_name: The name of the file to be compiled. Does not contain any
+            file extension.
+        config_dict: Dictionary containing further settings to run the engine.
+
+    Returns:
+        Monad: Tuple which contains a boolean to indicate success of the
+            function. If its true, the second value will be None. If its
+            false, the second value will contain an InternalException object
+            containing further information.
+
+    Raises:
+        InternalException: Indicates an internal error and is used to comunicate
+            exceptions and how to handle them back to the calling interface.
+            [Please see class definition]
+        Raised Levels: CRITICAL, LOW
+    """
+
+    if f"{file_name}.tex" not in os.listdir():
+        ex = exceptions.InternalException(
+            f"The file {file_name}.tex is not found in the current "
+            "working directory",
+            SeverityLevels.CRITICAL
+        )
+
+        return False, ex
+
+    selected_parts: list[str] = config_dict.get(
+        ConfigDictKeys.INCLUDE_ONLY.value
+    ) or []
+
+    if not selected_parts:
+        return True, None
+
+    with open(f"{file_name}.tex", "r", encoding="utf-8") as read_file:
+        lines_of_file: list[str] = [line for line in read_file]
+
+    included_parts = texsource.find_included_parts(lines_of_file)
+
+    # Allow the user to name a part without its folder or extension
+    def _normalize(part: str) -> str:
+        return os.path.splitext(part.strip())[0].replace("\\", "/")
+
+    resolved_parts: list[str] = []
+    for part in selected_parts:
+        name = _normalize(part)
+        matches = [p for p in included_parts
+                   if _normalize(p) == name or
+                   _normalize(p).split("/")[-1] == name]
+
+        if not matches:
+            ex = exceptions.InternalException(
+                f"The part {part} is not included in {file_name}.tex. "
+                "Only parts loaded with \\include can be selected.",
+                SeverityLevels.CRITICAL
+            )
+
+            return False, ex
+
+        resolved_parts.extend(m for m in matches if m not in resolved_parts)
+
+    try:
+        begin_index = next(
+            i for i, line in enumerate(lines_of_file)
+            if line.lstrip().startswith("\\begin{document}")
+        )
+    except StopIteration:
+        ex = exceptions.InternalException(
+            f"The file {file_name}.tex does not contain a document "
+            "environment.",
+            SeverityLevels.CRITICAL
+        )
+
+        return False, ex
+
+    lines_of_file.insert(
+        begin_index, "\\includeonly{" + ",".join(resolved_parts) + "}\n"
+    )
+
+    with open(f"{file_name}.tex", "w", encoding="utf-8") as write_file:
+        write_file.writelines(lines_of_file)
+
+    missing_aux = [p for p in included_parts
+                   if p not in resolved_parts and
+                   not os.path.isfile(f"{_normalize(p)}.aux")]
+
+    if missing_aux:
+        ex = exceptions.InternalException(
+            "No .aux file exists for the parts "
+            f"{', '.join(missing_aux)}. References to these parts can not "
+            "be resolved until the full document has been built once.",
+            SeverityLevels.LOW
+        )
+
+        return False, ex
+
+    return True, None
+
+
 # === Compilation / Creation of aux files / Generating LaTeX artifacts ===
 def compile_latex_file(file_name: str, config_dict: dict[str, Any]) -> Monad:
     """Compiles the file with to create a PDF file.
@@ -170,9 +280,8 @@ def compile_latex_file(file_name: str, config_dict: dict[str, Any]) -> Monad:
     if config_dict[ConfigDictKeys.VERBOSE.value]:
         argument_list.pop(argument_list.index("-quiet"))
 
-    subprocess.call(argument_list)
-
-    return True, None
+    return engine.run_engine(argument_list, config_dict, "compile",
+                             log_file_name=f"{file_name}.log")
 
 
 def _is_bibfile_present() -> bool:
@@ -191,13 +300,84 @@ def _is_bibfile_present() -> bool:
     return "bib" in file_types
 
 
+def detect_bib_backends(file_name: str) -> list[str]:
+    """Determines which bibliography tools can process the document.
+
+    A .bcf file is written by biblatex for biber. A bibdata entry in the .aux
+    file is written for bibtex, e.g. by natbib or the bibliography command.
+
+    Args:
+        file_name: The name of the file to be compiled. Does not contain any
+            file extension.
+
+    Returns:
+        list[str]: The names of the compatible tools, the fastest first.
+    """
+    backends: list[str] = []
+    files_in_dir = os.listdir()
+
+    if f"{file_name}.aux" in files_in_dir:
+        with open(f"{file_name}.aux", "r", encoding="utf-8",
+                  errors="replace") as aux_file:
+            if any("\\bibdata{" in line for line in aux_file):
+                backends.append("bibtex")
+
+    if f"{file_name}.bcf" in files_in_dir:
+        backends.append("biber")
+
+    return backends
+
+
+def _select_bib_backend(
+    file_name: str, config_dict: dict[str, Any]
+) -> Tuple[Optional[str], Optional[exceptions.InternalException]]:
+    """Chooses the bibliography tool according to the users preference.
+
+    Returns:
+        Tuple: The name of the tool or an InternalException, if no
+            compatible tool is found. Both are None if the document has no
+            bibliography.
+    """
+    backends = detect_bib_backends(file_name)
+    preference: str = config_dict.get(
+        ConfigDictKeys.BIB_BACKEND.value
+    ) or "auto"
+
+    # A compiled document which cites nothing
+    if not backends and f"{file_name}.aux" in os.listdir():
+        return None, None
+
+    if not backends:
+        ex = exceptions.InternalException(
+            f"Neither the file {file_name}.bcf nor a bibdata entry in "
+            f"{file_name}.aux has been created. "
+            "Bibliography can not be created.",
+            SeverityLevels.HIGH
+        )
+
+        return None, ex
+
+    if preference != "auto" and preference not in backends:
+        ex = exceptions.InternalException(
+            f"The document can not be processed by {preference}. "
+            f"Compatible tools: {', '.join(backends)}.",
+            SeverityLevels.HIGH
+        )
+
+        return None, ex
+
+    return (backends[0] if preference == "auto" else preference), None
+
+
 def create_bibliograpyh(file_name: str, config_dict: dict[str, Any]) -> Any:
     """Creates a bibliography file.
 
     Runs a script to create a bibliography based on the entries in the main tex
-    file. This does not hinder the creation of the PDF file.  There must be a
-    .bfc file present for the script to run properly. The .bfc file is created
-    when a tex file containing bibliography entries is compiled.
+    file. This does not hinder the creation of the PDF file. The script is
+    chosen by the files the first compilation has created. A .bcf file is
+    processed by biber, a bibdata entry in the .aux file by bibtex. If both
+    are present, the faster bibtex is used unless the config dict says else.
+    If neither is present, the document has no bibliography and nothing runs.
 
     Args:
         file_name: The name of the file to be compiled. Does not contain any
@@ -214,17 +394,16 @@ def create_bibliograpyh(file_name: str, config_dict: dict[str, Any]) -> Any:
         InternalException: Indicates an internal error and is used to comunicate
             exceptions and how to handle them back to the calling interface.
             [Please see class definition]
-        Raised Levels: HIGH
+        Raised Levels: CRITICAL, HIGH
     """
-    if f"{file_name}.bcf" not in os.listdir():
-        ex = exceptions.InternalException(
-            f"The file {file_name}.bcf has not been created. "
-            "Bibliography can not be created.",
-            SeverityLevels.HIGH
-        )
+    backend, ex = _select_bib_backend(file_name, config_dict)
 
+    if ex:
         return False, ex
 
+    if not backend:
+        return True, None
+
     if not _is_bibfile_present():
         ex = exceptions.InternalException(
             "There is no bibliography file in the current project. "
@@ -234,14 +413,15 @@ def create_bibliograpyh(file_name: str, config_dict: dict[str, Any]) -> Any:
 
         return False, ex
 
-    argument_list: list[str] = ["biber", "-q", f"{file_name}"]
+    quiet_flag = "-q" if backend == "biber" else "-terse"
+    argument_list: list[str] = [str(backend), quiet_flag, f"{file_name}"]
 
     if config_dict[ConfigDictKeys.VERBOSE.value]:
-        argument_list.pop(argument_list.index("-q"))
-
-    subprocess.call(argument_list)
+        argument_list.pop(argument_list.index(quiet_flag))
 
-    return True, None
+    return engine.run_engine(argument_list, config_dict, "bibliography",
+                             log_file_name=f"{file_name}.blg",
+                             missing_level=SeverityLevels.HIGH)
 
 
 def create_glossary(file_name: str, config_dict: dict[str, Any]) -> Any:
@@ -267,7 +447,7 @@ def create_glossary(file_name: str, config_dict: dict[str, Any]) -> Any:
         InternalException: Indicates an internal error and is used to comunicate
             exceptions and how to handle them back to the calling interface.
             [Please see class definition]
-        Raised Levels: HIGH
+        Raised Levels: CRITICAL, HIGH
     """
     if f"{file_name}.glo" not in os.listdir():
         ex = exceptions.InternalException(
@@ -301,13 +481,19 @@ def create_glossary(file_name: str, config_dict: dict[str, Any]) -> Any:
     if config_dict[ConfigDictKeys.VERBOSE.value]:
         argument_list.pop(argument_list.index("-q"))
 
-    subprocess.call(argument_list)
-
-    return True, None
+    return engine.run_engine(argument_list, config_dict, "glossary",
+                             log_file_name=f"{file_name}.glg",
+                             missing_level=SeverityLevels.HIGH)
 
 
 # === tear down / clean up processes ===
-def _move_pdf_file(file_name, new_file_name: Optional[str] = None) -> Monad:
+# Hex digits of the content hash which prefix the names of reproducible PDFs
+CONTENT_HASH_LENGTH = 16
+
+
+def _move_pdf_file(file_name, new_file_name: Optional[str] = None,
+                   bus: Optional[events.EventBus] = None,
+                   content_hash: bool = False) -> Monad:
     """Moves pdf file to seperate folder.
 
     To avoid that the created pdf file is deleted by the clean up process, this
@@ -316,6 +502,12 @@ def _move_pdf_file(file_name, new_file_name: Optional[str] = None) -> Monad:
     Args:
         file_name: The name of the file to be compiled. Does not contain any
             file extension.
+        new_file_name (optional): Name of the moved file. Defaults to the
+            file name prefixed with the current date.
+        bus (optional): Event bus which is told about the moved file.
+        content_hash (optional): Prefix the default name with a hash of the
+            PDF instead of the date, so identical documents get the same
+            name. Defaults to false.
 
     Returns:
         Monad: Tuple which contains a boolean to indicate success of the
@@ -332,6 +524,11 @@ def _move_pdf_file(file_name, new_file_name: Optional[str] = None) -> Monad:
     _exeption = None
     _successvalue = True
 
+    if not new_file_name and content_hash and os.path.isfile(
+            f"{file_name}.pdf"):
+        digest = cache.file_digest(f"{file_name}.pdf")
+        new_file_name = f"{digest[:CONTENT_HASH_LENGTH]}_{file_name}"
+
     if not new_file_name:
         cur_date = datetime.datetime.now()
         formatted_date = cur_date.strftime("%Y_%m_%d_%H_%M")
@@ -353,6 +550,8 @@ def _move_pdf_file(file_name, new_file_name: Optional[str] = None) -> Monad:
         old_name = os.path.join(".", "DEPLOY", f"{file_name}.pdf")
         new_name = os.path.join(".", "DEPLOY", f"{new_file_name}.pdf")
         os.rename(old_name, new_name)
+        if bus:
+            bus.publish(events.ArtifactProduced("clean", new_name))
     except FileNotFoundError:
         _exeption = exceptions.InternalException(
             "The pdf document could not be found. Perhaps it was not created?",
@@ -386,13 +585,19 @@ def clean_working_dir(file_name: str, config_dict: dict[str, Any],
     _success: bool = True
     _exception: Optional[exceptions.InternalException] = None
 
-    _success, _exception = _move_pdf_file(file_name, new_file_name)
+    _success, _exception = _move_pdf_file(
+        file_name, new_file_name, events.bus_of(config_dict),
+        config_dict.get(ConfigDictKeys.SOURCE_DATE_EPOCH.value) is not None
+    )
 
     if _exception and _exception.severity_level >= 20:
         return False, _exception
 
+    # Only the files of this build copy are removed, other documents in the
+    # same folder may be built at the same time
     for file in os.listdir():
-        if config_dict[ConfigDictKeys.FILE_PREFIX.value] in file:
+        if (config_dict[ConfigDictKeys.FILE_PREFIX.value] in file and
+                file.startswith((f"{file_name}.", f"{file_name}-"))):
             os.remove(file)
 
     return _success, _exception
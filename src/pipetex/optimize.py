@@ -0,0 +1,222 @@
+"""Post-processing of the finished PDF before it is published.
+
+pdflatex writes every object of a PDF on its own, compresses little and
+embeds an image or font once per included PDF which uses it. The operation
+in this module rewrites the finished PDF:
+
+    - Streams are recompressed and small objects are packed into object
+      streams.
+    - Identical images and embedded font files are stored only once.
+    - The file is linearized, so viewers can show the first page before the
+      whole file is downloaded.
+
+The rewrite is done with pikepdf in a worker process. If pikepdf is not
+installed, the qpdf program is used instead, which can not deduplicate
+images and fonts. The result is cached under a hash of the input PDF, so a
+document which did not change is not rewritten again. In reproducible
+builds the ID of the rewritten PDF is derived from its content instead of
+being random.
+
+@author: Max Weise
+created: 19.10.2026
+"""
+
+from pipetex import cache
+from pipetex import engine
+from pipetex import events
+from pipetex import exceptions
+from pipetex import runlog
+from pipetex.enums import SeverityLevels
+
+from typing import Any, Optional, Tuple
+
+import hashlib
+import os
+import shutil
+
+try:
+    import pikepdf
+    _HAS_PIKEPDF = True
+except ImportError:
+    _HAS_PIKEPDF = False
+
+
+# === Type Def ===
+Monad = Tuple[bool, Optional[exceptions.InternalException]]
+
+CACHE_STAGE = "optimized"
+
+# Keys of a font descriptor which reference an embedded font file
+_FONT_FILE_KEYS = ("/FontFile", "/FontFile2", "/FontFile3")
+
+
+def _stream_key(stream: Any) -> str:
+    """Hashes the data and the dictionary of a stream."""
+    entries = sorted((str(key), repr(value)) for key, value in stream.items()
+                     if key != "/Length")
+
+    return hashlib.sha256(
+        stream.read_raw_bytes() + repr(entries).encode("utf-8")
+    ).hexdigest()
+
+
+def _stream_links(obj: Any) -> list[tuple[Any, str]]:
+    """Finds the references of the object to font files and images.
+
+    Returns:
+        list: The dictionary holding each reference and its key.
+    """
+    links: list[tuple[Any, str]] = []
+    if obj.get("/Type") == "/FontDescriptor":
+        links += [(obj, key) for key in _FONT_FILE_KEYS if key in obj]
+
+    xobjects = obj.get("/Resources", {}).get("/XObject", {})
+    links += [(xobjects, name) for name in xobjects.keys()
+              if xobjects[name].get("/Subtype") == "/Image"]
+
+    return [(container, key) for container, key in links
+            if container[key].is_indirect]
+
+
+def deduplicate_streams(pdf: Any) -> int:
+    """Points all references to identical images and fonts to one copy.
+
+    Args:
+        pdf: The opened pikepdf.Pdf, which is changed in place.
+
+    Returns:
+        int: Number of references which were replaced.
+    """
+    canonical: dict[str, Any] = {}
+    replaced = 0
+
+    for obj in pdf.objects:
+        if not isinstance(obj, (pikepdf.Dictionary, pikepdf.Stream)):
+            continue
+
+        for container, key in _stream_links(obj):
+            stream = container[key]
+            first = canonical.setdefault(_stream_key(stream), stream)
+            if first.objgen != stream.objgen:
+                container[key] = first
+                replaced += 1
+
+    return replaced
+
+
+def _optimize_with_pikepdf(source: str, target: str,
+                           deterministic: bool = False) -> None:
+    """Rewrites the PDF with pikepdf. Runs in a worker process."""
+    with pikepdf.open(source) as pdf:
+        deduplicate_streams(pdf)
+        pdf.remove_unreferenced_resources()
+        pdf.save(target,
+                 compress_streams=True,
+                 recompress_flate=True,
+                 object_stream_mode=pikepdf.ObjectStreamMode.generate,
+                 linearize=True,
+                 deterministic_id=deterministic)
+
+
+def _optimize_with_qpdf(source: str, target: str,
+                        config_dict: dict[str, Any]) -> Monad:
+    """Rewrites the PDF with the qpdf program."""
+    deterministic = bool(engine.reproducible_environment(config_dict))
+    success, error = engine.run_engine(
+        ["qpdf", "--linearize", "--object-streams=generate",
+         "--compress-streams=y", "--recompress-flate",
+         "--compression-level=9"] +
+        (["--deterministic-id"] if deterministic else []) +
+        [source, target],
+        config_dict,
+        "optimize",
+        missing_level=SeverityLevels.LOW,
+        # qpdf exits with 3 when it wrote the file despite warnings
+        exit_codes=(0, 3)
+    )
+
+    # The compiled PDF is still usable, so the build must not fail here
+    if error:
+        error = exceptions.InternalException(
+            error.message, SeverityLevels.LOW, error.error_tpye
+        )
+
+    return success, error
+
+
+def optimize_pdf(file_name: str, config_dict: dict[str, Any]) -> Monad:
+    """Compresses, deduplicates and linearizes the compiled PDF.
+
+    Args:
+        file_name: The name of the file to be compiled. Does not contain any
+            file extension.
+        config_dict: Dictionary containing further settings to run the engine.
+
+    Returns:
+        Monad: Tuple which contains a boolean to indicate success of the
+            function. If its true, the second value will be None. If its
+            false, the second value will contain an InternalException object
+            containing further information.
+
+    Raises:
+        InternalException: Indicates an internal error and is used to comunicate
+            exceptions and how to handle them back to the calling interface.
+            [Please see class definition]
+        Raised Levels: LOW
+    """
+
+    if f"{file_name}.pdf" not in os.listdir():
+        ex = exceptions.InternalException(
+            f"The file {file_name}.pdf does not exist and can not be "
+            "optimized.",
+            SeverityLevels.LOW
+        )
+
+        return False, ex
+
+    backend = "pikepdf" if _HAS_PIKEPDF else "qpdf"
+    deterministic = bool(engine.reproducible_environment(config_dict))
+    key = cache.digest(cache.file_digest(f"{file_name}.pdf"), backend,
+                       "deterministic" if deterministic else "")
+    cached = cache.lookup(CACHE_STAGE, key, ".pdf",
+                          events.bus_of(config_dict))
+
+    if cached:
+        shutil.copyfile(cached, f"{file_name}.pdf")
+        return True, None
+
+    target = f"{file_name}-optimized.pdf"
+    error: Optional[exceptions.InternalException] = None
+
+    if _HAS_PIKEPDF:
+        try:
+            with runlog.process_pool(1) as pool:
+                pool.submit(_optimize_with_pikepdf, f"{file_name}.pdf",
+                            target, deterministic).result()
+        except Exception as e:
+            error = exceptions.InternalException(
+                f"The PDF could not be optimized: {e}",
+                SeverityLevels.LOW,
+                e
+            )
+    else:
+        _, error = _optimize_with_qpdf(f"{file_name}.pdf", target,
+                                       config_dict)
+
+    if not error and not os.path.isfile(target):
+        error = exceptions.InternalException(
+            "The PDF could not be optimized, qpdf did not create a file. "
+            "See the log file for its output.",
+            SeverityLevels.LOW
+        )
+
+    if error:
+        if os.path.isfile(target):
+            os.remove(target)
+
+        return False, error
+
+    cache.store(CACHE_STAGE, key, target, ".pdf")
+    os.replace(target, f"{file_name}.pdf")
+
+    return True, None
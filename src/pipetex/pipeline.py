@@ -8,19 +8,36 @@ returned form the operations.
 created: 29.07.2022
 """
 
+from pipetex import buildcontext
+from pipetex import cache
+from pipetex import engine
 from pipetex import enums
+from pipetex import events
 from pipetex import exceptions
-from pipetex import operations
+from pipetex import history
+from pipetex import planner
+from pipetex import registry
 
-from collections.abc import Callable
+from collections.abc import AsyncIterator, Iterator
 from typing import Any, Optional, Tuple
 
 import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
 
 
 # === Type Def ===
 Monad = Tuple[bool, Optional[exceptions.InternalException]]
-OperationStep = Callable[[str, dict[str, Any]], Monad]
+
+# Details of an error, formatted only if the log level is enabled
+_ERROR_DETAILS = """ Operation %s
+
+                             SeverityLevel: %s
+                             Error Message: %s
+                             Error Tpye: %s"""
 
 
 class Pipeline:
@@ -34,22 +51,53 @@ class Pipeline:
         p = Pipeline(file_name, True, False, False, False)
         p.execute(p.file_name)
 
+    The progress of a run can be observed through the event bus or by
+    iterating over the events of a run:
+
+        for event in p.stream(p.file_name):
+            print(event)
+
+    Each pipeline has its own BuildContext, so several pipelines can run in
+    threads of one process, see buildcontext.py.
+
     Attributes:
         file_name: Name of the file which should be processed.
-        config_dict: Contains metadata which should be shared
-             with the operations.
+        context: Contains metadata which should be shared with the
+            operations. Also available as config_dict.
         oder_of_operations: List of operations which will be run on the file.
+        event_bus: Publishes the progress of the pipeline, see events.py.
     """
 
     file_name: str
-    config_dict: dict[str, Any]
-    order_of_operations: list[OperationStep]
+    context: buildcontext.BuildContext
+    order_of_operations: list[registry.Operation]
+    event_bus: events.EventBus
 
     def __init__(self,
                  file_name: str,
                  create_bib: Optional[bool] = False,
                  create_glo: Optional[bool] = False,
                  verbose: Optional[bool] = False,
+                 include_only: Optional[list[str]] = None,
+                 timeouts: Optional[dict[str, float]] = None,
+                 cpu_limit: Optional[int] = None,
+                 memory_limit: Optional[int] = None,
+                 tee_engine_output: Optional[bool] = False,
+                 output_buffer_size: Optional[int] = None,
+                 externalize_figures: Optional[bool] = False,
+                 jobs: Optional[int] = None,
+                 convert_assets: Optional[bool] = False,
+                 asset_settings: Optional[dict[str, Any]] = None,
+                 subset_bib: Optional[bool] = False,
+                 bib_backend: Optional[str] = "auto",
+                 prune_glo: Optional[bool] = False,
+                 stages: Optional[list[str]] = None,
+                 parallel_chapters: Optional[bool] = False,
+                 optimize_pdf: Optional[bool] = False,
+                 variant: Optional[dict[str, Any]] = None,
+                 preflight: Optional[bool] = False,
+                 reproducible: Optional[bool] = False,
+                 work_dir: Optional[str] = None,
                  ) -> None:
         """Initialize a pipeline object.
 
@@ -58,34 +106,128 @@ class Pipeline:
             create_bib: Create a bibliography. Defaults to false.
             create_glo: Create a glossary. Defaults to false.
             verbose: Print console output of latex engines. Defaults to false.
+            include_only: Names of the included parts which should be
+                compiled. All parts are compiled if none are given.
+            timeouts: Wall clock timeouts in seconds per stage. The entry
+                "default" applies to all stages without an own entry.
+            cpu_limit: CPU time limit in seconds for each engine run.
+            memory_limit: Address space limit in bytes for each engine run.
+            tee_engine_output: Write the output of the engines to the log
+                file. Defaults to false.
+            output_buffer_size: Bytes of engine output kept per stage for
+                error messages. Defaults to 64 KB.
+            externalize_figures: Compile TikZ figures separately and cache
+                them. Defaults to false.
+            jobs: Number of parallel jobs used by stages which can split their
+                work. Defaults to the number of CPUs.
+            convert_assets: Convert and downsample the graphics of the
+                document before compiling it. Defaults to false.
+            asset_settings: Overrides assets.DEFAULT_SETTINGS, e.g. the
+                target_dpi of raster graphics.
+            subset_bib: Create the bibliography from a .bib file which only
+                contains the cited entries. Defaults to false.
+            bib_backend: Tool which creates the bibliography, biber or
+                bibtex. Defaults to auto, which picks the fastest tool the
+                document is compatible with.
+            prune_glo: Load only the used entries of the glossary definition
+                files. Defaults to false.
+            stages: Names of further registered operations. Each runs at the
+                end of its phase, see registry.PHASES.
+            parallel_chapters: Compile the included chapters in parallel
+                after the first compilation, see chapters.py. Defaults to
+                false.
+            optimize_pdf: Compress and linearize the PDF before it is
+                published, see optimize.py. Defaults to false.
+            variant: Class options and defines of the variant which is
+                built, see variants.Variant.as_dict.
+            preflight: Check the files, environments and programs of the
+                document before anything else runs, see preflight.py.
+                Defaults to false.
+            reproducible: Build the same PDF from the same sources. The
+                engines write the date of SOURCE_DATE_EPOCH, which must be
+                set, and the PDF is named by a hash of its content. Defaults
+                to false.
+            work_dir: Folder of the file. Defaults to the current working
+                directory.
+
+        Raises:
+            KeyError: If a stage is not registered.
+            ValueError: If a reproducible build is requested and
+                SOURCE_DATE_EPOCH is not a number of seconds.
         """
         # Creating object logger
         self.logger = logging.getLogger("main.pipeline")
 
-        # Create sequence of operations
-        self.order_of_operations = [
-            operations.copy_latex_file,
-            operations.remove_draft_option,
-            operations.compile_latex_file
-        ]
-
-        if create_bib:
-            self.order_of_operations.append(operations.create_bibliograpyh)
+        # Create sequence of operations, optional stages run in this order
+        prepare = ["preflight"] if preflight else []
+        prepare += ["copy", "remove_draft"] + [name for name, enabled in [
+            ("apply_variant", variant),
+            ("include_only", include_only),
+            ("prune_glossary", create_glo and prune_glo),
+            ("convert_assets", convert_assets),
+            ("track_chapters", parallel_chapters),
+            ("externalize_figures", externalize_figures),
+        ] if enabled]
+
+        index = [name for name, enabled in [
+            ("subset_bibliography", create_bib and subset_bib),
+            ("bibliography", create_bib),
+            ("glossary", create_glo),
+        ] if enabled]
+
+        finish = ["optimize_pdf"] if optimize_pdf else []
+
+        extra = [registry.get(name) for name in stages or []]
+        self.order_of_operations = (
+            [registry.get(name) for name in prepare] +
+            [op for op in extra if op.phase == "prepare"] +
+            [registry.get("compile")] +
+            [registry.get(name) for name in index] +
+            [op for op in extra if op.phase == "index"] +
+            [registry.get("compile_chapters" if parallel_chapters
+                          else "compile")] +
+            [op for op in extra if op.phase == "finish"] +
+            [registry.get(name) for name in finish] +
+            [registry.get("clean")]
+        )
+
+        self.event_bus = events.EventBus()
+        self.context = buildcontext.BuildContext(
+            work_dir,
+            verbose=bool(verbose),
+            include_only=include_only or [],
+            timeouts=timeouts or {},
+            cpu_limit=cpu_limit,
+            memory_limit=memory_limit,
+            tee_engine_output=tee_engine_output,
+            output_buffer_size=output_buffer_size,
+            jobs=jobs,
+            asset_settings=asset_settings or {},
+            bib_backend=bib_backend,
+            events=self.event_bus,
+            variant=variant,
+            operations=[op.name for op in self.order_of_operations],
+            source_date_epoch=(engine.source_date_epoch() if reproducible
+                               else None)
+        )
 
-        if create_glo:
-            self.order_of_operations.append(operations.create_glossary)
+        self.file_name = file_name
 
-        self.order_of_operations.append(operations.compile_latex_file)
-        self.order_of_operations.append(operations.clean_working_dir)
+    @property
+    def config_dict(self) -> buildcontext.BuildContext:
+        """The context of the pipeline, used through its dict interface."""
+        return self.context
 
-        # For some reason, the linter doesnt let me assign the dict as
-        # an instance variable of pipeline
-        self.config_dict = {    # type: ignore
-            enums.ConfigDictKeys.VERBOSE.value: verbose,
-            enums.ConfigDictKeys.FILE_PREFIX.value: "[piped]"
-        }
+    @property
+    def stage_results(self) -> list[buildcontext.StageResult]:
+        """Label, duration, success and peak memory of the engines of each
+        operation of the last run. See planner.stage_labels for the labels.
+        """
+        return self.context.timings
 
-        self.file_name = file_name
+    @stage_results.setter
+    def stage_results(self, results: list[buildcontext.StageResult]) -> None:
+        self.context.timings = results
 
     def _set_error(
         self,
@@ -110,7 +252,6 @@ class Pipeline:
 
         return rv
 
-    # TODO: Refactor this method to make it physically smaller.
     def execute(self, file_name) -> Monad:
         """Executes the operations defined by the constructor.
 
@@ -121,39 +262,154 @@ class Pipeline:
             Monad: Tuple which holds a value indicating the success of the
                 pipeline and an error value if success is false.
         """
-        rv_success: bool = True
-        rv_error: Optional[exceptions.InternalException] = None
-        local_file_name = file_name
+        with self.context.entered():
+            inputs = planner.project_inputs(file_name)
+            self.event_bus.reset_passes()
+            started = time.monotonic()
 
-        for operation in self.order_of_operations:
-            self.logger.debug(f"Now executing: {operation}")
-            success, error = operation(local_file_name, self.config_dict)
+            rv_success, rv_error = self._execute_operations(file_name)
 
             try:
-                local_file_name = self.config_dict[
-                    enums.ConfigDictKeys.NEW_NAME.value
-                ]
-            except KeyError:
-                # log this exception
-                # for now, eat it
-                pass
+                planner.record_run(file_name, self.context, inputs,
+                                   self.stage_results)
+                history.record_run(file_name, self.stage_results)
+                cache.flush_lookups()
+            except (OSError, sqlite3.Error) as e:
+                self.logger.debug("The run could not be recorded: %s", e)
+
+        if self.event_bus:
+            self.event_bus.publish(events.PipelineFinished(
+                rv_success, rv_error, time.monotonic() - started
+            ))
+
+        return rv_success, rv_error
+
+    def plan(self) -> list[planner.StagePlan]:
+        """Reports which operations a run would execute, running nothing.
+
+        Returns:
+            list[StagePlan]: Status, reason and estimated duration of each
+                operation, see planner.py.
+        """
+        with self.context.entered():
+            return planner.plan(self.file_name, self.context,
+                                planner.stage_labels(self.order_of_operations))
+
+    def _execute_for_stream(self, file_name: str) -> None:
+        """Runs the pipeline for stream, which always ends with an event."""
+        try:
+            self.execute(file_name)
+        except Exception as e:
+            self.event_bus.publish(events.PipelineFinished(
+                False,
+                exceptions.InternalException(
+                    f"The pipeline stopped unexpectedly: {e}",
+                    enums.SeverityLevels.CRITICAL, e
+                ),
+                0.0
+            ))
+
+    def stream(self, file_name: str) -> Iterator[events.Event]:
+        """Runs the pipeline in the background and yields its events.
+
+        The last event is a PipelineFinished event, which holds the values
+        execute would have returned.
+
+        Args:
+            file_name: The file which is processed by the operations.
+        """
+        received: queue.SimpleQueue[events.Event] = queue.SimpleQueue()
+        unsubscribe = self.event_bus.subscribe(received.put)
+        threading.Thread(target=self._execute_for_stream, args=(file_name,),
+                         daemon=True).start()
+
+        try:
+            while True:
+                event = received.get()
+                yield event
+                if isinstance(event, events.PipelineFinished):
+                    return
+        finally:
+            unsubscribe()
+
+    async def astream(self, file_name: str) -> AsyncIterator[events.Event]:
+        """Async variant of stream, running the pipeline in an executor."""
+        import asyncio      # Only needed by async callers, slow to import
+
+        loop = asyncio.get_running_loop()
+        received: asyncio.Queue[events.Event] = asyncio.Queue()
+
+        def _deliver(event: events.Event) -> None:
+            loop.call_soon_threadsafe(received.put_nowait, event)
+
+        unsubscribe = self.event_bus.subscribe(_deliver)
+        run = loop.run_in_executor(None, self._execute_for_stream, file_name)
+
+        try:
+            while True:
+                event = await received.get()
+                yield event
+                if isinstance(event, events.PipelineFinished):
+                    break
+
+            await run
+        finally:
+            unsubscribe()
+
+    # TODO: Refactor this method to make it physically smaller.
+    def _execute_operations(self, file_name) -> Monad:
+        """Runs the operations and handles their errors, see execute."""
+        rv_success: bool = True
+        rv_error: Optional[exceptions.InternalException] = None
+        local_file_name = file_name
+        total = len(self.order_of_operations)
+        labels = planner.stage_labels(self.order_of_operations)
+        self.context.timings = []
+
+        for index, operation in enumerate(self.order_of_operations):
+            self.logger.debug("Now executing: %s", operation)
+            if self.event_bus:
+                self.event_bus.publish(
+                    events.StageStarted(operation.name, index, total)
+                )
+
+            started = time.monotonic()
+            self.context.peak_rss = None
+
+            success, error = operation(local_file_name, self.context)
+
+            duration = time.monotonic() - started
+            self.context.timings.append((
+                labels[index], duration,
+                not error or error.severity_level < enums.SeverityLevels.HIGH,
+                self.context.peak_rss
+            ))
+
+            if self.event_bus:
+                self.event_bus.publish(events.StageFinished(
+                    operation.name, duration, success, error
+                ))
+
+            local_file_name = self.context.new_name or local_file_name
+            self.context.artifacts[labels[index]] = [
+                self.context.path(f"{local_file_name}{extension}")
+                for extension in operation.outputs
+                if os.path.isfile(f"{local_file_name}{extension}")
+            ]
 
             if error:
                 match error.severity_level:
                     case enums.SeverityLevels.LOW:
                         self.logger.warning(
                             "There has been a minor issue during the "
-                            f"execution of {operation} which did not affect "
+                            "execution of %s which did not affect "
                             "the flow of the pipeline. For more information "
-                            "please see the logfiles."
+                            "please see the logfiles.", operation
                         )
 
                         self.logger.warning(
-                            f""" Operation {operation}
-
-                             SeverityLevel: {error.severity_level}
-                             Error Message: {error.message}
-                             Error Tpye: {error.error_tpye}"""
+                            _ERROR_DETAILS, operation, error.severity_level,
+                            error.message, error.error_tpye
                         )
 
                         rv_error = self._set_error(rv_error, error)
@@ -161,18 +417,15 @@ class Pipeline:
                     case enums.SeverityLevels.HIGH:
                         self.logger.warning(
                             "There has been an issue during the "
-                            f"execution of {operation} which did not affect "
+                            "execution of %s which did not affect "
                             "the flow of the pipeline but my produce an "
                             "incorrect PDF file. For more information "
-                            "please see the logfiles."
+                            "please see the logfiles.", operation
                         )
 
                         self.logger.debug(
-                            f""" Operation {operation}
-
-                             SeverityLevel: {error.severity_level}
-                             Error Message: {error.message}
-                             Error Tpye: {error.error_tpye}"""
+                            _ERROR_DETAILS, operation, error.severity_level,
+                            error.message, error.error_tpye
                         )
 
                         rv_error = self._set_error(rv_error, error)
@@ -181,17 +434,14 @@ class Pipeline:
                     case enums.SeverityLevels.CRITICAL:
                         self.logger.warning(
                             "There has been an issue during the "
-                            f"execution of {operation} which caused the "
+                            "execution of %s which caused the "
                             "pipeline to stop its execution. Please see the "
-                            "logfiles to for more information."
+                            "logfiles to for more information.", operation
                         )
 
                         self.logger.critical(
-                            f""" Operation {operation}
-
-                             SeverityLevel: {error.severity_level}
-                             Error Message: {error.message}
-                             Error Tpye: {error.error_tpye}"""
+                            _ERROR_DETAILS, operation, error.severity_level,
+                            error.message, error.error_tpye
                         )
 
                         # Preemtive exit
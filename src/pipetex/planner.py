@@ -0,0 +1,345 @@
+"""Dry run of a pipeline, reporting which stages would run and why.
+
+Every run of a pipeline records the inputs it has seen and the duration of
+each stage in .pipetex/state. The planner compares the current files of the
+project against this record without running anything and reports for each
+stage of the pipeline
+
+    - run: An input of the stage has changed since its last successful run.
+    - skip: The stage is up to date.
+    - blocked: The stage can not run, e.g. because a program is missing.
+
+A document whose stages are all up to date does not need to be built.
+
+The inputs of a document are the tex file and the project files it loads
+(input, include, local packages, .bib files and graphics). They are compared
+by size and modification time, like make does.
+
+@author: Max Weise
+created: 19.10.2026
+"""
+
+from pipetex.enums import ConfigDictKeys
+
+from collections.abc import Mapping
+from typing import Any, Optional
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+
+
+STATE_FOLDER = os.path.join(".pipetex", "state")
+
+# Number of past durations used for the estimate of a stage
+DURATION_HISTORY = 5
+
+# Input groups of the stages, stages not listed depend on all inputs
+_STAGE_INPUTS = {
+    "bibliography": ("tex", "bib"),
+    "subset_bibliography": ("tex", "bib"),
+    "glossary": ("tex",),
+    "prune_glossary": ("tex",),
+    "externalize_figures": ("tex",),
+    "convert_assets": ("tex", "graphics"),
+}
+
+# Programs needed by the stages, one of them must be installed
+_STAGE_PROGRAMS = {
+    "compile": ("pdflatex",),
+    "compile_chapters": ("pdflatex",),
+    "externalize_figures": ("pdflatex",),
+    "bibliography": ("biber", "bibtex"),
+    "glossary": ("makeglossaries",),
+}
+
+# Stages whose failure stops the pipeline
+_REQUIRED_STAGES = ("copy", "compile", "compile_chapters")
+
+# Config dict entries which do not change the result of a build
+_VOLATILE_KEYS = (ConfigDictKeys.ENGINE_OUTPUT.value,
+                  ConfigDictKeys.EVENTS.value,
+                  ConfigDictKeys.NEW_NAME.value,
+                  ConfigDictKeys.PEAK_RSS.value,
+                  ConfigDictKeys.OPERATIONS.value,
+                  ConfigDictKeys.VERBOSE.value,
+                  ConfigDictKeys.JOBS.value,
+                  ConfigDictKeys.TIMEOUTS.value,
+                  ConfigDictKeys.CPU_LIMIT.value,
+                  ConfigDictKeys.MEMORY_LIMIT.value,
+                  ConfigDictKeys.OUTPUT_BUFFER_SIZE.value,
+                  ConfigDictKeys.TEE_ENGINE_OUTPUT.value)
+
+_DEPENDENCY_PATTERN = re.compile(
+    r"\\(input|include|usepackage|loadglsentries|addbibresource|bibliography"
+    r"|includegraphics|includesvg)\s*(?:\[[^\]]*\])?\s*\{([^}]+)\}"
+)
+
+_GROUPS = {
+    "addbibresource": ("bib", [""]),
+    "bibliography": ("bib", [".bib"]),
+    "includegraphics": ("graphics",
+                        ["", ".pdf", ".png", ".jpg", ".jpeg", ".eps"]),
+    "includesvg": ("graphics", ["", ".svg"]),
+    "usepackage": ("tex", [".sty"]),
+}
+
+
+class StagePlan:
+    """What a pipeline run would do with one stage.
+
+    Attributes:
+        stage: Name of the operation.
+        status: One of run, skip or blocked.
+        reason: Why the stage has this status, e.g. the changed input.
+        estimate: Expected duration in seconds, None if the stage never ran.
+    """
+
+    stage: str
+    status: str
+    reason: str
+    estimate: Optional[float]
+
+    def __init__(self, stage: str, status: str, reason: str,
+                 estimate: Optional[float]) -> None:
+        self.stage = stage
+        self.status = status
+        self.reason = reason
+        self.estimate = estimate
+
+    def __repr__(self) -> str:
+        return f"<StagePlan {self.stage}: {self.status} ({self.reason})>"
+
+
+def _base_name(label: str) -> str:
+    return label.split(" #")[0]
+
+
+def stage_labels(operations: list[Any]) -> list[str]:
+    """Labels the operations, numbering the ones which run repeatedly.
+
+    The second compilation is labeled "compile #2", so the passes are
+    recorded separately.
+    """
+    labels: list[str] = []
+    for operation in operations:
+        count = sum(1 for label in labels
+                    if _base_name(label) == operation.name)
+        labels.append(f"{operation.name} #{count + 1}" if count
+                      else operation.name)
+
+    return labels
+
+
+# === Inputs ===
+def _fingerprint(path: str) -> str:
+    stat = os.stat(path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def _resolve(name: str, extensions: list[str]) -> Optional[str]:
+    for extension in extensions:
+        path = f"{name.strip()}{extension}"
+        if os.path.isfile(path):
+            return path
+
+    return None
+
+
+def project_inputs(file_name: str) -> dict[str, dict[str, str]]:
+    """Finds the inputs of the document and fingerprints them.
+
+    Args:
+        file_name: The name of the file to be compiled. Does not contain any
+            file extension.
+
+    Returns:
+        dict: Fingerprints of the input files, grouped into tex, bib and
+            graphics. Empty if the tex file does not exist.
+    """
+    inputs: dict[str, dict[str, str]] = {"tex": {}, "bib": {}, "graphics": {}}
+    pending = [f"{file_name}.tex"]
+
+    while pending:
+        path = pending.pop()
+        if path in inputs["tex"] or not os.path.isfile(path):
+            continue
+
+        inputs["tex"][path] = _fingerprint(path)
+        with open(path, "r", encoding="utf-8", errors="replace") as tex_file:
+            code = re.sub(r"(?<!\\)%[^\n]*", "", tex_file.read())
+
+        for match in _DEPENDENCY_PATTERN.finditer(code):
+            group, extensions = _GROUPS.get(match.group(1),
+                                            ("tex", ["", ".tex"]))
+            for name in match.group(2).split(","):
+                dependency = _resolve(name, extensions)
+                if dependency and group == "tex":
+                    pending.append(dependency)
+                elif dependency:
+                    inputs[group][dependency] = _fingerprint(dependency)
+
+    return inputs
+
+
+def options_digest(config_dict: Mapping[str, Any]) -> str:
+    """Hashes the settings of the pipeline which affect the result."""
+    options = {key: value for key, value in config_dict.items()
+               if key not in _VOLATILE_KEYS}
+
+    return hashlib.sha256(
+        json.dumps(options, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+
+
+# === State ===
+def _state_path(file_name: str) -> str:
+    return os.path.join(STATE_FOLDER, f"{os.path.basename(file_name)}.json")
+
+
+def load_state(file_name: str) -> dict[str, Any]:
+    """Reads the record of the past runs of the document."""
+    try:
+        with open(_state_path(file_name), "r", encoding="utf-8") as f:
+            state: dict[str, Any] = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {"stages": {}}
+
+    return state
+
+
+def record_run(file_name: str, config_dict: Mapping[str, Any],
+               inputs: dict[str, dict[str, str]],
+               results: list[tuple[str, float, bool, Optional[int]]]
+               ) -> None:
+    """Stores the inputs and durations of a finished run.
+
+    Args:
+        file_name: The name of the file which was compiled.
+        config_dict: Dictionary containing the settings of the run.
+        inputs: The inputs seen at the start of the run, see project_inputs.
+        results: Label, duration, success and peak memory of each stage
+            which ran, see Pipeline.stage_results.
+    """
+    state = load_state(file_name)
+    digest = options_digest(config_dict)
+
+    for stage, duration, success, _ in results:
+        record = state["stages"].setdefault(stage, {"durations": []})
+        record["durations"] = (record["durations"] +
+                               [duration])[-DURATION_HISTORY:]
+        record["succeeded"] = success
+        record["finished"] = time.time()
+        record["options"] = digest
+        record["inputs"] = {
+            group: inputs[group]
+            for group in _STAGE_INPUTS.get(_base_name(stage), tuple(inputs))
+        }
+
+    os.makedirs(STATE_FOLDER, exist_ok=True)
+    tmp_path = f"{_state_path(file_name)}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+
+    os.replace(tmp_path, _state_path(file_name))
+
+
+# === Planning ===
+def _changed_input(recorded: dict[str, dict[str, str]],
+                   current: dict[str, dict[str, str]]) -> Optional[str]:
+    """Names the first input which differs from the recorded run."""
+    for group, files in recorded.items():
+        for path in sorted(set(files) | set(current[group])):
+            if path not in current[group]:
+                return f"{path} was removed"
+
+            if path not in files:
+                return f"{path} is new"
+
+            if files[path] != current[group][path]:
+                return f"{path} changed"
+
+    return None
+
+
+def missing_programs(stages: list[str]) -> list[str]:
+    """The programs needed by the stages which are not installed.
+
+    Returns:
+        list[str]: The missing programs, alternatives joined by "or".
+    """
+    missing: list[str] = []
+    for stage in stages:
+        programs = _STAGE_PROGRAMS.get(_base_name(stage), ())
+        description = " or ".join(programs)
+        if (programs and description not in missing and
+                not any(shutil.which(p) for p in programs)):
+            missing.append(description)
+
+    return missing
+
+
+def _stage_status(stage: str, record: Optional[dict[str, Any]],
+                  inputs: dict[str, dict[str, str]],
+                  digest: str) -> tuple[str, str]:
+    missing = missing_programs([stage])
+    if missing:
+        return "blocked", f"{missing[0]} is not installed"
+
+    if not record:
+        return "run", "the stage never ran"
+
+    if not record["succeeded"]:
+        return "run", "the last run failed"
+
+    if record["options"] != digest:
+        return "run", "the options changed"
+
+    changed = _changed_input(record["inputs"], inputs)
+    if changed:
+        return "run", changed
+
+    return "skip", "up to date"
+
+
+def plan(file_name: str, config_dict: Mapping[str, Any],
+         stages: list[str]) -> list[StagePlan]:
+    """Evaluates the stages against the current files, running nothing.
+
+    Args:
+        file_name: The name of the file to be compiled. Does not contain any
+            file extension.
+        config_dict: Dictionary containing the settings of the pipeline.
+        stages: Names of the operations of the pipeline, in order.
+
+    Returns:
+        list[StagePlan]: The plan of each stage, in order.
+    """
+    inputs = project_inputs(file_name)
+    recorded = load_state(file_name)["stages"]
+    digest = options_digest(config_dict)
+
+    plans: list[StagePlan] = []
+    blocker: Optional[str] = None
+    if not inputs["tex"]:
+        blocker = f"{file_name}.tex does not exist"
+
+    for stage in stages:
+        record = recorded.get(stage)
+        durations = record["durations"] if record else []
+        estimate = sum(durations) / len(durations) if durations else None
+
+        if blocker:
+            plans.append(StagePlan(stage, "blocked", blocker, estimate))
+            continue
+
+        status, reason = _stage_status(stage, record, inputs, digest)
+        plans.append(StagePlan(stage, status, reason, estimate))
+
+        if status == "blocked" and _base_name(stage) in _REQUIRED_STAGES:
+            blocker = f"{stage} is blocked"
+
+    return plans
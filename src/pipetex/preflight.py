@@ -0,0 +1,306 @@
+"""Checks which fail a build before any engine is started.
+
+Many mistakes in a document are only reported by pdflatex or biber, minutes
+into a build. The preflight stage finds the most common of them in a single
+pass over the document and the files it inputs, in the order TeX reads
+them:
+
+    - Files loaded with \\input, \\include, \\includegraphics,
+      \\usepackage, \\addbibresource, \\bibliography or \\loadglsentries
+      which can neither be found in the project nor by kpsewhich. Packages
+      are not reported with MiKTeX, which installs them when they are first
+      used. Without kpsewhich, files which are not in the project are not
+      checked at all and the stage only fails with a LOW warning.
+    - \\begin and \\end commands of the document body which do not match.
+    - Programs needed by the stages of the pipeline which are not installed.
+
+Every finding is reported at once with the file and line it was found at.
+The contents of verbatim environments and lines defining commands or
+environments are not checked. Neither are file names built from macros or
+macro parameters, as only TeX can expand them, nor remote resources given
+by a URL.
+
+@author: Max Weise
+created: 19.10.2026
+"""
+
+from pipetex import exceptions
+from pipetex import planner
+from pipetex import texsource
+from pipetex.enums import SeverityLevels, ConfigDictKeys
+
+from collections.abc import Iterator
+from typing import Any, Optional, Tuple
+
+import os
+import re
+import shutil
+import subprocess
+
+
+# === Type Def ===
+Monad = Tuple[bool, Optional[exceptions.InternalException]]
+# File and line of a command
+Location = Tuple[str, int]
+
+# Number of findings listed in the error message
+MAX_FINDINGS = 10
+
+_TOKEN_PATTERN = re.compile(
+    r"\\(begin|end|input|include|includegraphics|includesvg|usepackage"
+    r"|RequirePackage|addbibresource|bibliography|loadglsentries)\*?"
+    r"\s*(?:\[[^\]]*\])?\s*\{([^}]*)\}"
+)
+
+# Lines which define macros may contain unbalanced environments and names
+# of files which are only known when the macro is used
+_DEFINITION_PATTERN = re.compile(
+    r"\\(?:(?:re)?newcommand|(?:re)?newenvironment|(?:New|Renew)Document"
+    r"(?:Command|Environment)|[egx]?def|let)\b"
+)
+
+# Environments whose content is not read as commands
+_VERBATIM_ENVIRONMENTS = ("verbatim", "verbatim*", "Verbatim", "lstlisting",
+                          "minted", "comment", "filecontents",
+                          "filecontents*")
+
+# Extensions tried for each command, in order
+_EXTENSIONS = {
+    "input": ["", ".tex"],
+    "include": [".tex"],
+    "usepackage": [".sty"],
+    "RequirePackage": [".sty"],
+    "addbibresource": [""],
+    "bibliography": [".bib"],
+    "loadglsentries": ["", ".tex"],
+}
+
+
+class _Scanner:
+    """State of the single pass over the document."""
+
+    def __init__(self) -> None:
+        self.environments: list[tuple[str, Location]] = []
+        self.unresolved: list[tuple[str, Location]] = []
+        self.findings: list[str] = []
+        self.graphics_folders = [""]
+        self.in_body = False
+        self.finished = False
+        self.verbatim: Optional[str] = None
+        self.reading: list[str] = []
+
+    def scan(self, path: str) -> None:
+        """Reads the file, following its inputs where TeX reads them."""
+        if path in self.reading:
+            self.findings.append(f"{path} inputs itself")
+            return
+
+        self.reading.append(path)
+        for number, code in _code_lines(path):
+            if self.finished:
+                break
+
+            if self.verbatim:
+                if f"\\end{{{self.verbatim}}}" in code:
+                    self.verbatim = None
+                continue
+
+            self.graphics_folders.extend(texsource.graphicspath_folders(code))
+
+            if _DEFINITION_PATTERN.search(code):
+                continue
+
+            for match in _TOKEN_PATTERN.finditer(code):
+                self._token(match.group(1), match.group(2).strip(),
+                            (path, number))
+
+        self.reading.pop()
+
+    def _token(self, command: str, argument: str,
+               location: Location) -> None:
+        if command in ("begin", "end"):
+            self._environment(command, argument, location)
+            return
+
+        if "#" in argument or "\\" in argument or "://" in argument:
+            return
+
+        if command in ("includegraphics", "includesvg"):
+            if not texsource.resolve_graphic(argument, self.graphics_folders):
+                self.unresolved.append((argument, location))
+            return
+
+        extensions = _EXTENSIONS[command]
+        for name in (n.strip() for n in argument.split(",") if n.strip()):
+            path = _resolve(name, extensions)
+            if path and command in ("input", "include"):
+                self.scan(path)
+            elif not path:
+                self.unresolved.append((
+                    name if name.endswith(extensions[-1])
+                    else name + extensions[-1], location
+                ))
+
+    def _environment(self, command: str, name: str,
+                     location: Location) -> None:
+        if name == "document":
+            self.in_body = command == "begin"
+            self.finished = command == "end"
+            return
+
+        if not self.in_body:
+            return
+
+        if command == "begin" and name in _VERBATIM_ENVIRONMENTS:
+            self.verbatim = name
+            return
+
+        if command == "begin":
+            self.environments.append((name, location))
+            return
+
+        if not self.environments:
+            self.findings.append(f"\\end{{{name}}} at {_format(location)} "
+                                 "has no matching \\begin")
+            return
+
+        opened, opened_at = self.environments.pop()
+        if opened != name:
+            self.findings.append(
+                f"\\end{{{name}}} at {_format(location)} closes "
+                f"\\begin{{{opened}}} from {_format(opened_at)}"
+            )
+
+
+def _format(location: Location) -> str:
+    return f"{location[0]}:{location[1]}"
+
+
+def _code_lines(path: str) -> Iterator[tuple[int, str]]:
+    """Yields the lines of the file without their comments."""
+    with open(path, "r", encoding="utf-8", errors="replace") as tex_file:
+        for number, line in enumerate(tex_file, start=1):
+            yield number, re.split(r"(?<!\\)%", line, maxsplit=1)[0]
+
+
+def _resolve(name: str, extensions: list[str]) -> Optional[str]:
+    for extension in extensions:
+        if os.path.isfile(f"{name}{extension}"):
+            return f"{name}{extension}"
+
+    return None
+
+
+def _found_by_kpsewhich(names: list[str]) -> Optional[set[str]]:
+    """The names which the TeX distribution provides, None if unknown."""
+    if not shutil.which("kpsewhich"):
+        return None
+
+    if not names:
+        return set()
+
+    try:
+        output = subprocess.run(
+            ["kpsewhich"] + sorted(set(names)), stdin=subprocess.DEVNULL,
+            capture_output=True, text=True, timeout=30
+        ).stdout
+    except (OSError, subprocess.SubprocessError):
+        return set(names)   # The files are left for the engines to report
+
+    found = {os.path.basename(line.strip()) for line in output.splitlines()}
+    installed = {name for name in names if os.path.basename(name) in found}
+
+    # MiKTeX installs missing packages when they are first used
+    if shutil.which("initexmf"):
+        installed.update(name for name in names if name.endswith(".sty"))
+
+    return installed
+
+
+def check_document(file_name: str, stages: list[str]) -> list[str]:
+    """Finds the problems of the document which would fail its build.
+
+    Args:
+        file_name: The name of the file to be compiled. Does not contain any
+            file extension.
+        stages: Names of the operations which will run on the document.
+
+    Returns:
+        list[str]: Description of each problem, empty if none was found.
+    """
+    scanner = _Scanner()
+    scanner.scan(f"{file_name}.tex")
+
+    names = [name for name, _ in scanner.unresolved]
+    # Without kpsewhich, the files are left for the engines to report
+    installed = _found_by_kpsewhich(names)
+    if installed is None:
+        installed = set(names)
+
+    findings = [f"{name} at {_format(location)} does not exist"
+                for name, location in scanner.unresolved
+                if name not in installed]
+
+    findings += scanner.findings
+    findings += [f"\\begin{{{name}}} at {_format(location)} is never closed"
+                 for name, location in scanner.environments]
+    findings += [f"{programs} is not installed"
+                 for programs in planner.missing_programs(stages)]
+
+    return findings
+
+
+def preflight(file_name: str, config_dict: dict[str, Any]) -> Monad:
+    """Checks the document before any engine runs, see the module docs.
+
+    Args:
+        file_name: The name of the file to be compiled. Does not contain any
+            file extension.
+        config_dict: Dictionary containing further settings to run the engine.
+
+    Returns:
+        Monad: Tuple which contains a boolean to indicate success of the
+            function. If its true, the second value will be None. If its
+            false, the second value will contain an InternalException object
+            containing further information.
+
+    Raises:
+        InternalException: Indicates an internal error and is used to comunicate
+            exceptions and how to handle them back to the calling interface.
+            [Please see class definition]
+        Raised Levels: CRITICAL, LOW
+    """
+
+    if f"{file_name}.tex" not in os.listdir():
+        ex = exceptions.InternalException(
+            f"The file {file_name}.tex is not found in the current "
+            "working directory",
+            SeverityLevels.CRITICAL
+        )
+
+        return False, ex
+
+    findings = check_document(
+        file_name, config_dict.get(ConfigDictKeys.OPERATIONS.value) or []
+    )
+    if not findings and not shutil.which("kpsewhich"):
+        ex = exceptions.InternalException(
+            "kpsewhich is not installed, so packages and other files which "
+            "are not part of the project were not checked.",
+            SeverityLevels.LOW
+        )
+
+        return False, ex
+
+    if not findings:
+        return True, None
+
+    more = len(findings) - MAX_FINDINGS
+    ex = exceptions.InternalException(
+        "The document can not be built:\n  - " +
+        "\n  - ".join(findings[:MAX_FINDINGS]) +
+        (f"\n  and {more} more" if more > 0 else ""),
+        SeverityLevels.CRITICAL
+    )
+
+    return False, ex
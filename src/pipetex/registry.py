@@ -0,0 +1,249 @@
+"""Registry of the operations a pipeline can be composed of.
+
+Every operation is registered under a name together with the place of its
+implementation ("module:function") and some metadata. The module of an
+operation is only imported when the operation runs for the first time, so
+stages with heavy dependencies cost nothing unless a pipeline uses them.
+
+Operations of other packages are registered through the entry point group
+"pipetex.operations". The name of the entry point is the name of the
+operation, its value is the place of the implementation:
+
+    [options.entry_points]
+    pipetex.operations =
+        spellcheck = my_package.stages:spellcheck
+
+To declare its phase and the other metadata, the entry point can instead
+refer to an Operation or to a dict with the arguments of register:
+
+    SPELLCHECK = {"target": "my_package.stages:spellcheck",
+                  "phase": "finish", "inputs": [".tex"], "cost": "low"}
+
+An entry point is only loaded when its operation is looked up, so plugins
+do not slow down pipelines which do not use them.
+
+Each operation belongs to a phase, which tells the pipeline where to run it.
+
+    - prepare: Before the first compilation, changes the build copy.
+    - index: Between the two compilations, e.g. bibliography and glossary.
+    - finish: After the last compilation, before the working dir is cleaned.
+
+@author: Max Weise
+created: 19.10.2026
+"""
+
+from pipetex import exceptions
+
+from collections.abc import MutableMapping
+from importlib import import_module
+from typing import TYPE_CHECKING, Any, Optional, Tuple
+
+if TYPE_CHECKING:
+    from importlib import metadata
+
+
+# === Type Def ===
+Monad = Tuple[bool, Optional[exceptions.InternalException]]
+
+ENTRY_POINT_GROUP = "pipetex.operations"
+
+PHASES = ("prepare", "index", "finish")
+
+
+class Operation:
+    """An operation which is imported when it is called for the first time.
+
+    Instances are called like the function they refer to, so they can be
+    used wherever an operation is expected.
+
+    Attributes:
+        name: Name the operation is registered under.
+        target: Place of the implementation as "module:function".
+        phase: Place of the operation in the pipeline, see PHASES.
+        inputs: Files read by the operation, as extensions of the build copy.
+        outputs: Files written by the operation.
+        cost: Rough hint of the runtime, e.g. low, medium or high.
+        description: One line describing the operation.
+    """
+
+    name: str
+    target: str
+    phase: str
+    inputs: list[str]
+    outputs: list[str]
+    cost: str
+    description: str
+
+    def __init__(self, name: str, target: str, phase: str = "prepare",
+                 inputs: Optional[list[str]] = None,
+                 outputs: Optional[list[str]] = None,
+                 cost: str = "unknown", description: str = "") -> None:
+        """Creates an operation, without importing its implementation."""
+        if phase not in PHASES:
+            raise ValueError(f"unknown phase {phase} of operation {name}")
+
+        self.name = name
+        self.target = target
+        self.phase = phase
+        self.inputs = inputs or []
+        self.outputs = outputs or []
+        self.cost = cost
+        self.description = description
+
+    def load(self) -> Any:
+        """Imports the implementation of the operation."""
+        module_name, _, function_name = self.target.partition(":")
+        return getattr(import_module(module_name), function_name)
+
+    def __call__(self, file_name: str,
+                 config_dict: MutableMapping[str, Any]) -> Monad:
+        """Runs the operation on the file."""
+        rv: Monad = self.load()(file_name, config_dict)
+        return rv
+
+    def __repr__(self) -> str:
+        return f"<operation {self.name} ({self.target})>"
+
+
+REGISTRY: dict[str, Operation] = {}
+
+_entry_points_loaded = False
+
+# Entry points of plugins which were not looked up yet
+_PLUGINS: dict[str, "metadata.EntryPoint"] = {}
+
+
+def register(name: str, target: str, **metadata_kwargs: Any) -> Operation:
+    """Adds an operation to the registry, replacing one of the same name.
+
+    Args:
+        name: Name of the operation.
+        target: Place of the implementation as "module:function".
+        metadata_kwargs: Further attributes of the operation, see Operation.
+
+    Returns:
+        Operation: The registered operation.
+    """
+    operation = Operation(name, target, **metadata_kwargs)
+    REGISTRY[name] = operation
+    return operation
+
+
+def load_entry_points() -> None:
+    """Finds the operations provided by installed packages.
+
+    The entry points are loaded when their operation is looked up.
+    Operations of this package are not replaced, so an installed plugin can
+    not change the built-in stages.
+    """
+    global _entry_points_loaded
+    if _entry_points_loaded:
+        return
+
+    # Only imported when a plugin may be needed, it is slow to import
+    from importlib import metadata
+
+    _entry_points_loaded = True
+    for entry_point in metadata.entry_points(group=ENTRY_POINT_GROUP):
+        if entry_point.name not in REGISTRY:
+            _PLUGINS[entry_point.name] = entry_point
+
+
+def _load_plugin(name: str) -> Operation:
+    """Registers the operation of a plugin from its entry point.
+
+    Raises:
+        ValueError: If the metadata of the operation do not name its target.
+    """
+    entry_point = _PLUGINS.pop(name)
+    loaded = entry_point.load()
+
+    if isinstance(loaded, Operation):
+        REGISTRY[name] = loaded
+        return loaded
+
+    if isinstance(loaded, dict):
+        if "target" not in loaded:
+            raise ValueError(f"the entry point of operation {name} does not "
+                             "name its target")
+        return register(name, **loaded)
+
+    return register(name, entry_point.value)
+
+
+def get(name: str) -> Operation:
+    """Looks up a registered operation.
+
+    Raises:
+        KeyError: If no operation of that name is registered.
+    """
+    if name not in REGISTRY:
+        load_entry_points()
+
+    if name in _PLUGINS:
+        return _load_plugin(name)
+
+    if name not in REGISTRY:
+        raise KeyError(f"unknown operation {name}")
+
+    return REGISTRY[name]
+
+
+def available() -> list[Operation]:
+    """All registered operations, including the ones of installed plugins."""
+    load_entry_points()
+    for name in list(_PLUGINS):
+        _load_plugin(name)
+
+    return list(REGISTRY.values())
+
+
+# === Built-in operations ===
+register("preflight", "pipetex.preflight:preflight",
+         inputs=[".tex"], cost="low",
+         description="Check files, environments and programs up front.")
+register("copy", "pipetex.operations:copy_latex_file",
+         inputs=[".tex"], outputs=[".tex"], cost="low",
+         description="Copy the tex file to the build copy.")
+register("remove_draft", "pipetex.operations:remove_draft_option",
+         inputs=[".tex"], outputs=[".tex"], cost="low",
+         description="Remove the draft option of the document class.")
+register("apply_variant", "pipetex.variants:apply_variant",
+         inputs=[".tex"], outputs=[".tex"], cost="low",
+         description="Apply the class options and defines of a variant.")
+register("include_only", "pipetex.operations:set_include_only",
+         inputs=[".tex"], outputs=[".tex"], cost="low",
+         description="Compile only the selected parts of the document.")
+register("prune_glossary", "pipetex.glossary:prune_glossary",
+         inputs=[".tex"], outputs=[".tex"], cost="low",
+         description="Load only the used glossary entries.")
+register("convert_assets", "pipetex.assets:convert_assets",
+         inputs=[".tex"], outputs=[".tex"], cost="high",
+         description="Convert and downsample the graphics.")
+register("externalize_figures", "pipetex.figures:externalize_figures",
+         inputs=[".tex"], outputs=[".tex"], cost="high",
+         description="Compile TikZ figures separately and cache them.")
+register("track_chapters", "pipetex.chapters:track_chapters",
+         inputs=[".tex"], outputs=[".tex"], cost="low",
+         description="Record the pages of each included chapter.")
+register("compile", "pipetex.operations:compile_latex_file",
+         inputs=[".tex"], outputs=[".pdf", ".aux", ".log"], cost="high",
+         description="Compile the build copy with pdflatex.")
+register("subset_bibliography", "pipetex.bibliography:subset_bibliography",
+         phase="index", inputs=[".aux", ".bcf"], outputs=["-subset.bib"],
+         cost="low", description="Reduce the .bib files to the cited entries.")
+register("bibliography", "pipetex.operations:create_bibliograpyh",
+         phase="index", inputs=[".aux", ".bcf"], outputs=[".bbl"],
+         cost="medium", description="Create the bibliography.")
+register("glossary", "pipetex.operations:create_glossary",
+         phase="index", inputs=[".glo", ".acn"], outputs=[".gls", ".acr"],
+         cost="medium", description="Create the glossary.")
+register("compile_chapters", "pipetex.chapters:compile_chapters",
+         phase="finish", inputs=[".tex", ".aux", ".pages"], outputs=[".pdf"],
+         cost="high", description="Compile the chapters in parallel.")
+register("optimize_pdf", "pipetex.optimize:optimize_pdf",
+         phase="finish", inputs=[".pdf"], outputs=[".pdf"], cost="medium",
+         description="Compress, deduplicate and linearize the PDF.")
+register("clean", "pipetex.operations:clean_working_dir",
+         phase="finish", inputs=[".pdf"], cost="low",
+         description="Move the PDF and remove the build files.")
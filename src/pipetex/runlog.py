@@ -0,0 +1,210 @@
+"""Log files of the pipeline runs.
+
+Every run writes its own log file into .pipetex/logs, starting with a header
+which describes the run. Only the most recent files are kept, limited by
+their number and their total size.
+
+The handlers never run on the thread of the build. Log calls only put the
+record on a queue, a background listener formats it and writes it to the
+console and the log file. Records are formatted by the listener, so the
+arguments of a log call must not be changed after the call.
+
+Worker processes can not put records on the queue of the listener, which
+only exists in this process. Pools created by process_pool therefore send
+the records of their workers over a multiprocessing queue. A second listener
+hands them to the loggers of this process, as if they were logged here. The
+workers are started by a fork server, never forked from this process, whose
+threads could hold locks the workers would inherit.
+
+@author: Max Weise
+created: 19.10.2026
+"""
+
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+from typing import TYPE_CHECKING, Optional
+
+import atexit
+import logging
+import os
+import platform
+import queue
+import sys
+import threading
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import queues
+
+
+LOG_FOLDER = os.path.join(".pipetex", "logs")
+
+# Retention of the log files, the oldest files are removed first
+MAX_LOG_FILES = 10
+MAX_LOG_FOLDER_BYTES = 10 * 1024 * 1024
+
+_LOG_SUFFIX = ".log"
+
+# Records of the worker processes of all pools
+_worker_queue: Optional["queues.Queue[Optional[logging.LogRecord]]"] = None
+_worker_listener: Optional[QueueListener] = None
+_worker_lock = threading.Lock()
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """Puts the records on the queue without formatting them first."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class _ForwardingHandler(logging.Handler):
+    """Hands the records of worker processes to the logger they were for."""
+
+    def emit(self, record: logging.LogRecord) -> None:
+        logger = logging.getLogger(record.name)
+        if logger.isEnabledFor(record.levelno):
+            logger.handle(record)
+
+
+def _version() -> str:
+    from importlib import metadata      # Slow to import, only used here
+
+    try:
+        return metadata.version("pipetex")
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def header() -> str:
+    """Metadata about the run, written at the start of each log file."""
+    return (
+        f"# pipetex {_version()}\n"
+        f"# started:  {datetime.now().isoformat(timespec='seconds')}\n"
+        f"# command:  {' '.join(sys.argv)}\n"
+        f"# cwd:      {os.getcwd()}\n"
+        f"# pid:      {os.getpid()}\n"
+        f"# python:   {platform.python_version()} ({platform.platform()})\n"
+    )
+
+
+def apply_retention(log_folder: str = LOG_FOLDER,
+                    max_files: int = MAX_LOG_FILES,
+                    max_bytes: int = MAX_LOG_FOLDER_BYTES) -> list[str]:
+    """Removes the oldest log files beyond the limits.
+
+    Args:
+        log_folder: Folder containing the log files.
+        max_files: Number of log files which are kept.
+        max_bytes: Total size of the kept log files.
+
+    Returns:
+        list[str]: Paths of the removed log files.
+    """
+    if not os.path.isdir(log_folder):
+        return []
+
+    log_files = sorted(
+        (entry for entry in os.scandir(log_folder)
+         if entry.is_file() and entry.name.endswith(_LOG_SUFFIX)),
+        key=lambda entry: entry.stat().st_mtime, reverse=True
+    )
+
+    removed: list[str] = []
+    total_bytes = 0
+    for count, entry in enumerate(log_files, start=1):
+        total_bytes += entry.stat().st_size
+        if count > max_files or total_bytes > max_bytes:
+            os.remove(entry.path)
+            removed.append(entry.path)
+
+    return removed
+
+
+def new_log_file(log_folder: str = LOG_FOLDER) -> str:
+    """Creates the log file of this run and writes its header.
+
+    Returns:
+        str: Path of the new log file.
+    """
+    os.makedirs(log_folder, exist_ok=True)
+    # The existing files are pruned first, so the limits include this run
+    apply_retention(log_folder, MAX_LOG_FILES - 1)
+
+    name = f"{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}{_LOG_SUFFIX}"
+    path = os.path.join(log_folder, name)
+    with open(path, "w", encoding="utf-8") as log_file:
+        log_file.write(header())
+
+    return path
+
+
+def start_listener(logger: logging.Logger,
+                   *handlers: logging.Handler) -> QueueListener:
+    """Routes the records of the logger to the handlers on a background thread.
+
+    The listener is stopped when the interpreter exits, which writes all
+    records still on the queue.
+
+    Args:
+        logger: Logger whose records are written.
+        handlers: Handlers which write the records. Their levels and filters
+            are respected.
+
+    Returns:
+        QueueListener: The running listener.
+    """
+    record_queue: queue.SimpleQueue[Optional[logging.LogRecord]] = (
+        queue.SimpleQueue()
+    )
+    logger.addHandler(_DeferredQueueHandler(record_queue))
+
+    listener = QueueListener(record_queue, *handlers,
+                             respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    return listener
+
+
+def _init_worker(
+    record_queue: "queues.Queue[Optional[logging.LogRecord]]"
+) -> None:
+    """Sends all records of a worker process to its parent."""
+    root = logging.getLogger()
+    root.addHandler(QueueHandler(record_queue))
+    # The parent filters the records by the levels of its loggers
+    root.setLevel(logging.DEBUG)
+
+
+def process_pool(max_workers: Optional[int] = None) -> "ProcessPoolExecutor":
+    """Creates a process pool whose workers log through this process.
+
+    Args:
+        max_workers (optional): Number of worker processes. Defaults to the
+            number of CPUs.
+
+    Returns:
+        ProcessPoolExecutor: The new pool.
+    """
+    global _worker_queue, _worker_listener
+
+    from concurrent.futures import ProcessPoolExecutor
+    import multiprocessing
+
+    context = multiprocessing.get_context(
+        "forkserver" if "forkserver" in multiprocessing.get_all_start_methods()
+        else "spawn"
+    )
+
+    with _worker_lock:
+        if not _worker_queue:
+            _worker_queue = context.Queue()
+            _worker_listener = QueueListener(_worker_queue,
+                                             _ForwardingHandler())
+            _worker_listener.start()
+            atexit.register(_worker_listener.stop)
+
+    return ProcessPoolExecutor(max_workers, mp_context=context,
+                               initializer=_init_worker,
+                               initargs=(_worker_queue,))
@@ -0,0 +1,75 @@
+"""Reading of tex sources, shared by the operations which inspect them.
+
+The helpers only look at the text of a file, they do not run any engine. They
+follow what LaTeX does as far as the text tells, e.g. which part of a line is
+commented out or where graphicx searches for a graphic.
+
+@author: Max Weise
+created: 19.10.2026
+"""
+
+from typing import Optional
+
+import os
+import re
+
+
+# Extensions tried by graphicx for a graphic given without one, in order
+GRAPHIC_EXTENSIONS = [".pdf", ".png", ".jpg", ".jpeg", ".eps", ".svg"]
+
+GRAPHICSPATH_PATTERN = re.compile(r"\\graphicspath\s*\{((?:\{[^}]*\})+)\}")
+
+
+def is_commented(text: str, index: int) -> bool:
+    """Checks if the position in the text is part of a tex comment."""
+    line_start = text.rfind("\n", 0, index) + 1
+    return re.search(r"(?<!\\)%", text[line_start:index]) is not None
+
+
+def find_included_parts(lines_of_file: list[str]) -> list[str]:
+    """Collects the names of all parts loaded by an include command.
+
+    Commented out parts of a line are ignored, so a part which is disabled
+    by a % sign is not reported.
+
+    Args:
+        lines_of_file: The lines of the tex file which is searched.
+
+    Returns:
+        list[str]: The part names as they are written in the tex file.
+    """
+    included_parts: list[str] = []
+    for line in lines_of_file:
+        code = re.split(r"(?<!\\)%", line, maxsplit=1)[0]
+        included_parts.extend(re.findall(r"\\include\{(.+?)\}", code))
+
+    return included_parts
+
+
+def graphicspath_folders(text: str) -> list[str]:
+    """The folders added to the search path of graphics by graphicspath."""
+    return [folder for match in GRAPHICSPATH_PATTERN.finditer(text)
+            for folder in re.findall(r"\{([^}]*)\}", match.group(1))]
+
+
+def resolve_graphic(name: str, folders: list[str]) -> Optional[str]:
+    """Finds the file of a graphic the way graphicx does.
+
+    Args:
+        name: The name of the graphic as written in the tex file.
+        folders: The folders which are searched, in order. An empty string
+            stands for the working directory.
+
+    Returns:
+        Optional[str]: The path of the graphic, None if it does not exist.
+    """
+    has_extension = os.path.splitext(name)[1].lower() in GRAPHIC_EXTENSIONS
+    extensions = [""] if has_extension else GRAPHIC_EXTENSIONS
+
+    for folder in folders:
+        for extension in extensions:
+            path = os.path.join(folder, f"{name}{extension}")
+            if os.path.isfile(path):
+                return path
+
+    return None
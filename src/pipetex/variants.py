@@ -0,0 +1,297 @@
+"""Builds of several variants of a document which share their indexes.
+
+Documents are often published in variants, e.g. a draft, a final and a print
+version, which differ in the options of the document class and in switches
+defined with \\def. Building each variant with its own pipeline creates the
+bibliography and the glossary once per variant, although they are the same
+for all of them.
+
+build_variants runs the pipeline once up to the index stages in the folder
+of the project. The outputs of the index stages (e.g. the .bbl and .gls
+files, see registry.Operation.outputs) are then copied into a separate
+build folder per variant, where the variants are compiled concurrently in
+worker processes. The cache of externalized figures and converted assets is
+shared by all builds.
+
+The PDF of each variant is published as DEPLOY/<file name>-<variant>.pdf.
+
+@author: Max Weise
+created: 19.10.2026
+"""
+
+from pipetex import batch
+from pipetex import buildcontext
+from pipetex import cache
+from pipetex import exceptions
+from pipetex import history
+from pipetex import pipeline
+from pipetex import planner
+from pipetex import runlog
+from pipetex import texsource
+from pipetex.enums import SeverityLevels, ConfigDictKeys
+
+from concurrent.futures import Executor
+from collections.abc import Callable
+from typing import Any, Optional, Tuple
+
+import glob
+import os
+import re
+import shutil
+
+
+# === Type Def ===
+Monad = Tuple[bool, Optional[exceptions.InternalException]]
+
+VARIANT_FOLDER = os.path.join(".pipetex", "variants")
+
+# Options which create the indexes, they only apply to the shared run
+_INDEX_OPTIONS = ("create_bib", "create_glo", "subset_bib", "prune_glo")
+
+_CLASS_PATTERN = re.compile(r"\\documentclass\s*(?:\[([^\]]*)\])?")
+
+
+class Variant:
+    """A variant of a document.
+
+    Attributes:
+        name: Name of the variant, used for its build folder and PDF.
+        class_options: Options added to the document class.
+        defines: Macros defined in front of the document class, e.g.
+            {"isprint": "1"} defines \\isprint as 1.
+    """
+
+    name: str
+    class_options: list[str]
+    defines: dict[str, str]
+
+    def __init__(self, name: str, class_options: Optional[list[str]] = None,
+                 defines: Optional[dict[str, str]] = None) -> None:
+        self.name = name
+        self.class_options = class_options or []
+        self.defines = defines or {}
+
+    def __repr__(self) -> str:
+        return f"<Variant {self.name}>"
+
+    @classmethod
+    def parse(cls, spec: str) -> "Variant":
+        """Reads a variant given as NAME[:OPTION,...][:MACRO=VALUE,...].
+
+        Raises:
+            ValueError: If the name is missing or a define has no value.
+        """
+        name, _, rest = spec.partition(":")
+        options, _, defines = rest.partition(":")
+
+        if not name or not re.fullmatch(r"[\w.-]+", name):
+            raise ValueError(f"invalid variant name in {spec}")
+
+        pairs = [define.split("=", 1) for define in defines.split(",")
+                 if define]
+        if any(len(pair) != 2 for pair in pairs):
+            raise ValueError(f"defines must be given as MACRO=VALUE: {spec}")
+
+        return cls(name, [o for o in options.split(",") if o],
+                   {macro: value for macro, value in pairs})
+
+    def as_dict(self) -> dict[str, Any]:
+        """The variant as it is stored in the config dict."""
+        return {"name": self.name, "class_options": self.class_options,
+                "defines": self.defines}
+
+
+def apply_variant(file_name: str, config_dict: dict[str, Any]) -> Monad:
+    """Adds the class options and defines of the variant to the file.
+
+    Args:
+        file_name: The name of the file to be compiled. Does not contain any
+            file extension.
+        config_dict: Dictionary containing further settings to run the engine.
+
+    Returns:
+        Monad: Tuple which contains a boolean to indicate success of the
+            function. If its true, the second value will be None. If its
+            false, the second value will contain an InternalException object
+            containing further information.
+
+    Raises:
+        InternalException: Indicates an internal error and is used to comunicate
+            exceptions and how to handle them back to the calling interface.
+            [Please see class definition]
+        Raised Levels: CRITICAL
+    """
+
+    if f"{file_name}.tex" not in os.listdir():
+        ex = exceptions.InternalException(
+            f"The file {file_name}.tex is not found in the current "
+            "working directory",
+            SeverityLevels.CRITICAL
+        )
+
+        return False, ex
+
+    variant = config_dict.get(ConfigDictKeys.VARIANT.value) or {}
+
+    with open(f"{file_name}.tex", "r", encoding="utf-8") as read_file:
+        content = read_file.read()
+
+    match = _CLASS_PATTERN.search(content)
+    if not match:
+        ex = exceptions.InternalException(
+            f"The file {file_name}.tex does not contain a document class.",
+            SeverityLevels.CRITICAL
+        )
+
+        return False, ex
+
+    options = [o.strip() for o in (match.group(1) or "").split(",")
+               if o.strip()]
+    options += [o for o in variant.get("class_options", [])
+                if o not in options]
+    defines = "".join(f"\\def\\{macro}{{{value}}}\n"
+                      for macro, value in variant.get("defines", {}).items())
+
+    content = (content[:match.start()] + defines +
+               f"\\documentclass[{','.join(options)}]" +
+               content[match.end():])
+
+    with open(f"{file_name}.tex", "w", encoding="utf-8") as write_file:
+        write_file.write(content)
+
+    return True, None
+
+
+def _build_variant(project_dir: str, file_name: str,
+                   options: dict[str, Any], variant: dict[str, Any],
+                   shared_files: list[str]) -> batch.WorkerResult:
+    """Builds one variant in its own folder, in a worker process.
+
+    The folder of the project is added to the TEXINPUTS of the engines, so
+    all files of the project are still found. The folders of the included
+    parts are created, as TeX writes their .aux files relative to the build
+    folder.
+    """
+    build_dir = os.path.join(project_dir, VARIANT_FOLDER, variant["name"])
+    texinputs = os.environ.get("TEXINPUTS", "")
+    if not texinputs.startswith(project_dir + os.pathsep):
+        os.environ["TEXINPUTS"] = project_dir + os.pathsep + texinputs
+
+    os.environ["PIPETEX_CACHE_DIR"] = os.path.join(project_dir,
+                                                   cache.cache_root())
+    os.environ["PIPETEX_HISTORY_DB"] = os.path.join(project_dir,
+                                                    history.history_path())
+
+    shutil.rmtree(build_dir, ignore_errors=True)
+    os.makedirs(build_dir)
+
+    with buildcontext.WORKING_DIRECTORY.enter(build_dir):
+        shutil.copy(os.path.join(project_dir, f"{file_name}.tex"), ".")
+        for path in shared_files:
+            shutil.copy(path, ".")
+
+        with open(f"{file_name}.tex", "r", encoding="utf-8") as read_file:
+            parts = texsource.find_included_parts(read_file.readlines())
+        for part in parts:
+            os.makedirs(os.path.dirname(part) or ".", exist_ok=True)
+
+        p = pipeline.Pipeline(file_name, variant=variant, **options)
+        success, error = p.execute(file_name)
+
+        deploy_dir = os.path.join(project_dir, "DEPLOY")
+        os.makedirs(deploy_dir, exist_ok=True)
+        for pdf_path in glob.glob(os.path.join("DEPLOY", "*.pdf")):
+            os.replace(pdf_path, os.path.join(
+                deploy_dir, f"{file_name}-{variant['name']}.pdf"
+            ))
+
+    if not error or error.severity_level < SeverityLevels.HIGH:
+        shutil.rmtree(build_dir, ignore_errors=True)
+
+    return (success, error.severity_level if error else None,
+            error.message if error else None)
+
+
+def _build_indexes(file_name: str, options: dict[str, Any]
+                   ) -> Tuple[Monad, str, list[str]]:
+    """Runs the pipeline up to its index stages in the project folder.
+
+    Returns:
+        Tuple: The result of the run, the name of the build copy and the
+            paths of the files created by the index stages.
+    """
+    p = pipeline.Pipeline(file_name, **options)
+    operations = p.order_of_operations
+    last_index = max(i for i, op in enumerate(operations)
+                     if op.phase == "index")
+    p.order_of_operations = operations[:last_index + 1]
+
+    result = p.execute(file_name)
+
+    new_name = p.context.new_name or file_name
+    labels = planner.stage_labels(p.order_of_operations)
+    shared_files = [path
+                    for label, op in zip(labels, p.order_of_operations)
+                    if op.phase == "index"
+                    for path in p.context.artifacts.get(label, [])]
+
+    return result, new_name, shared_files
+
+
+def _remove_build_files(new_name: str) -> None:
+    """Removes the files of the build copy from the project folder."""
+    for file in os.listdir():
+        if file.startswith((f"{new_name}.", f"{new_name}-")):
+            os.remove(file)
+
+
+def build_variants(file_name: str,
+                   variants: list[Variant],
+                   options: dict[str, Any],
+                   max_builds: Optional[int] = None,
+                   executor_factory: Callable[[int], Executor] = (
+                       runlog.process_pool)
+                   ) -> dict[str, Monad]:
+    """Builds the variants of the document, sharing their indexes.
+
+    Args:
+        file_name: The name of the file to be compiled. Does not contain any
+            file extension.
+        variants: The variants to build.
+        options: Keyword options the pipelines are created with.
+        max_builds (optional): Number of variants built at the same time.
+            Defaults to the number of variants.
+        executor_factory (optional): Creates the pool running the builds
+            from the number of workers.
+
+    Returns:
+        dict[str, Monad]: The result of each variant, keyed by its name.
+    """
+    new_name: Optional[str] = None
+    shared_files: list[str] = []
+    variant_options = {key: value for key, value in options.items()
+                       if key not in _INDEX_OPTIONS}
+
+    if any(options.get(key) for key in _INDEX_OPTIONS):
+        (_, error), new_name, shared_files = _build_indexes(
+            file_name, options
+        )
+        if error and error.severity_level >= SeverityLevels.CRITICAL:
+            _remove_build_files(new_name)
+            return {variant.name: (False, error) for variant in variants}
+
+    project_dir = os.getcwd()
+    try:
+        with executor_factory(max_builds or len(variants)) as pool:
+            futures = {
+                variant.name: pool.submit(_build_variant, project_dir,
+                                          file_name, variant_options,
+                                          variant.as_dict(), shared_files)
+                for variant in variants
+            }
+
+            return {name: batch.result_to_monad(future)
+                    for name, future in futures.items()}
+    finally:
+        if new_name:
+            _remove_build_files(new_name)
@@ -0,0 +1,547 @@
+"""Build workers which pull document builds from a shared job queue.
+
+One build host is not enough when many documents are released at once. Any
+number of worker processes, on any number of machines, can take build jobs
+from a broker and push their results back to it:
+
+    pipetex --submit sqlite:/srv/pipetex-queue thesis   # on the client
+    pipetex --worker sqlite:/srv/pipetex-queue          # on each build host
+
+A job references a snapshot of the project folder together with the options
+of the pipeline. The worker unpacks the snapshot into an empty temporary
+folder, runs the pipeline there and pushes the PDF files and a report of the
+run back to the broker. Jobs never share a working directory.
+
+Brokers are pluggable, see Broker. SQLiteBroker keeps the queue in a SQLite
+database and the snapshots and PDF files in the folder next to it. It needs
+nothing but a folder which all workers can reach, e.g. to run everything on
+a single host. Further brokers are added to BROKERS or provided by installed
+packages through the entry point group pipetex.brokers.
+
+A claimed job is leased to its worker, which renews the lease while it
+builds. If a worker dies, the lease runs out and another worker takes the
+job, at most MAX_ATTEMPTS times.
+
+@author: Max Weise
+created: 19.10.2026
+"""
+
+from pipetex import buildcontext
+from pipetex import exceptions
+from pipetex import metrics
+from pipetex import pipeline
+from pipetex.enums import SeverityLevels
+
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from importlib import metadata
+from typing import Any, Optional, Tuple
+
+import abc
+import glob
+import json
+import logging
+import os
+import shutil
+import socket
+import sqlite3
+import tarfile
+import tempfile
+import threading
+import time
+import uuid
+
+
+# === Type Def ===
+Monad = Tuple[bool, Optional[exceptions.InternalException]]
+Report = dict[str, Any]
+
+ENTRY_POINT_GROUP = "pipetex.brokers"
+
+# Seconds a claimed job stays with its worker without a renewal
+LEASE_SECONDS = 300.0
+
+# How often a job is claimed before it is given up
+MAX_ATTEMPTS = 3
+
+# Seconds an idle worker waits before it asks for a new job
+POLL_INTERVAL = 2.0
+
+# Top level folders of a project which are not part of its snapshot
+_SNAPSHOT_EXCLUDES = (".git", ".pipetex", "DEPLOY")
+
+
+class Job:
+    """A document build in the queue.
+
+    Attributes:
+        job_id: Identifier assigned by the broker.
+        file_name: Path of the tex file relative to the project folder,
+            without extension.
+        options: Keyword options the pipeline is created with.
+        attempt: How often the job was claimed, including the current time.
+    """
+
+    job_id: str
+    file_name: str
+    options: dict[str, Any]
+    attempt: int
+
+    def __init__(self, job_id: str, file_name: str, options: dict[str, Any],
+                 attempt: int = 0) -> None:
+        self.job_id = job_id
+        self.file_name = file_name
+        self.options = options
+        self.attempt = attempt
+
+    def __repr__(self) -> str:
+        return f"<Job {self.job_id} {self.file_name} #{self.attempt}>"
+
+
+class Broker(abc.ABC):
+    """Job queue shared by the clients and the workers.
+
+    A broker stores the queued jobs, the snapshots they reference and the
+    results of the finished jobs. Subclasses must implement all methods.
+    """
+
+    @abc.abstractmethod
+    def submit(self, project_dir: str, file_name: str,
+               options: dict[str, Any]) -> str:
+        """Queues a build of a snapshot of the project folder.
+
+        Returns:
+            str: Identifier of the job.
+        """
+
+    @abc.abstractmethod
+    def claim(self, worker_id: str) -> Optional[Job]:
+        """Leases the oldest waiting job to the worker, if there is one."""
+
+    @abc.abstractmethod
+    def renew(self, job: Job) -> None:
+        """Extends the lease of a claimed job."""
+
+    @abc.abstractmethod
+    def fetch_snapshot(self, job: Job, work_dir: str) -> None:
+        """Unpacks the project snapshot of the job into the folder."""
+
+    @abc.abstractmethod
+    def complete(self, job: Job, report: Report,
+                 artifacts: list[str]) -> None:
+        """Stores the report and the produced files of a claimed job.
+
+        Nothing is stored if the lease of the job was lost to another
+        worker.
+        """
+
+    @abc.abstractmethod
+    def report(self, job_id: str) -> Optional[Report]:
+        """The report of the job, None while it is not finished.
+
+        Raises:
+            KeyError: If the job does not exist.
+        """
+
+    @abc.abstractmethod
+    def fetch_artifacts(self, job_id: str, folder: str) -> list[str]:
+        """Copies the produced files of a finished job into the folder.
+
+        Returns:
+            list[str]: Paths of the copied files.
+        """
+
+
+# === Snapshots ===
+def _snapshot_filter(info: tarfile.TarInfo) -> Optional[tarfile.TarInfo]:
+    parts = os.path.normpath(info.name).split(os.sep)
+    if parts[0] in _SNAPSHOT_EXCLUDES or "[piped]" in parts[-1]:
+        return None
+
+    return info
+
+
+def _check_members(archive: tarfile.TarFile) -> None:
+    """Rejects members which would be written outside of the folder.
+
+    Replaces the data filter of tarfile on Python versions without it.
+
+    Raises:
+        tarfile.TarError: If a member is no file, folder or link, or if it
+            or the target of a link leaves the folder.
+    """
+    for member in archive.getmembers():
+        paths = [member.name]
+        if member.issym():
+            paths.append(os.path.join(os.path.dirname(member.name),
+                                      member.linkname))
+        elif member.islnk():
+            paths.append(member.linkname)
+        elif not (member.isfile() or member.isdir()):
+            raise tarfile.TarError(f"{member.name} is a special file")
+
+        for path in paths:
+            if (os.path.isabs(path) or
+                    os.path.normpath(path).split(os.sep)[0] == os.pardir):
+                raise tarfile.TarError(f"{member.name} leaves the folder")
+
+
+def snapshot_project(project_dir: str, archive_path: str) -> None:
+    """Packs the project folder without build products into an archive."""
+    with tarfile.open(archive_path, "w:gz") as archive:
+        for entry in sorted(os.listdir(project_dir)):
+            archive.add(os.path.join(project_dir, entry), arcname=entry,
+                        filter=_snapshot_filter)
+
+
+class SQLiteBroker(Broker):
+    """Broker which keeps the queue in a SQLite database.
+
+    The folder of the broker contains the database queue.sqlite, the
+    snapshots of the queued projects and the files of the finished jobs.
+
+    Attributes:
+        folder: Absolute path of the folder of the broker.
+        lease: Seconds a claimed job stays with its worker.
+    """
+
+    folder: str
+    lease: float
+
+    _SCHEMA = """
+    CREATE TABLE IF NOT EXISTS jobs (
+        job_id TEXT PRIMARY KEY,
+        file_name TEXT NOT NULL,
+        options TEXT NOT NULL,
+        status TEXT NOT NULL,
+        submitted REAL NOT NULL,
+        attempt INTEGER NOT NULL DEFAULT 0,
+        worker TEXT,
+        lease_until REAL,
+        report TEXT
+    );
+    CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, submitted);
+    """
+
+    def __init__(self, folder: str, lease: float = LEASE_SECONDS) -> None:
+        self.folder = os.path.abspath(folder)
+        self.lease = lease
+
+        os.makedirs(os.path.join(self.folder, "snapshots"), exist_ok=True)
+        os.makedirs(os.path.join(self.folder, "artifacts"), exist_ok=True)
+        connection = self._connect()
+        connection.executescript(self._SCHEMA)
+        connection.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(os.path.join(self.folder, "queue.sqlite"),
+                               timeout=30, isolation_level=None)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Runs the statements in one transaction which locks the queue."""
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            yield connection
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        finally:
+            connection.close()
+
+    def _snapshot_path(self, job_id: str) -> str:
+        return os.path.join(self.folder, "snapshots", f"{job_id}.tar.gz")
+
+    def submit(self, project_dir: str, file_name: str,
+               options: dict[str, Any]) -> str:
+        job_id = uuid.uuid4().hex
+        snapshot_project(project_dir, self._snapshot_path(job_id))
+
+        with self._transaction() as connection:
+            connection.execute(
+                "INSERT INTO jobs (job_id, file_name, options, status, "
+                "submitted) VALUES (?, ?, ?, 'queued', ?)",
+                (job_id, file_name, json.dumps(options), time.time())
+            )
+
+        return job_id
+
+    def claim(self, worker_id: str) -> Optional[Job]:
+        now = time.time()
+        with self._transaction() as connection:
+            # Jobs of lost workers are given up after the last attempt
+            connection.execute(
+                "UPDATE jobs SET status = 'finished', report = ? "
+                "WHERE status = 'running' AND lease_until < ? "
+                "AND attempt >= ?",
+                (json.dumps(_lost_report(MAX_ATTEMPTS)), now, MAX_ATTEMPTS)
+            )
+
+            row = connection.execute(
+                "SELECT job_id, file_name, options, attempt FROM jobs "
+                "WHERE status = 'queued' OR "
+                "(status = 'running' AND lease_until < ?) "
+                "ORDER BY submitted LIMIT 1", (now,)
+            ).fetchone()
+            if not row:
+                return None
+
+            job = Job(row[0], row[1], json.loads(row[2]), row[3] + 1)
+            connection.execute(
+                "UPDATE jobs SET status = 'running', attempt = ?, "
+                "worker = ?, lease_until = ? WHERE job_id = ?",
+                (job.attempt, worker_id, now + self.lease, job.job_id)
+            )
+
+        return job
+
+    def renew(self, job: Job) -> None:
+        with self._transaction() as connection:
+            connection.execute(
+                "UPDATE jobs SET lease_until = ? "
+                "WHERE job_id = ? AND attempt = ? AND status = 'running'",
+                (time.time() + self.lease, job.job_id, job.attempt)
+            )
+
+    def fetch_snapshot(self, job: Job, work_dir: str) -> None:
+        with tarfile.open(self._snapshot_path(job.job_id)) as archive:
+            # The data filter keeps members from escaping the folder, older
+            # versions of Python check the members beforehand instead
+            options: dict[str, Any] = {}
+            if hasattr(tarfile, "data_filter"):
+                options["filter"] = "data"
+            else:
+                _check_members(archive)
+
+            archive.extractall(work_dir, **options)
+
+    def complete(self, job: Job, report: Report,
+                 artifacts: list[str]) -> None:
+        folder = os.path.join(self.folder, "artifacts", job.job_id)
+        staging = f"{folder}.{job.attempt}.tmp"
+        os.makedirs(staging, exist_ok=True)
+        for artifact in artifacts:
+            shutil.copy(artifact, staging)
+
+        try:
+            with self._transaction() as connection:
+                # A worker whose lease ran out has lost the job to another one
+                finished = connection.execute(
+                    "UPDATE jobs SET status = 'finished', report = ?, "
+                    "lease_until = NULL "
+                    "WHERE job_id = ? AND attempt = ? AND status = 'running'",
+                    (json.dumps(report), job.job_id, job.attempt)
+                ).rowcount
+
+                # Published before the commit, so a finished job has its files
+                if finished:
+                    os.replace(staging, folder)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    def report(self, job_id: str) -> Optional[Report]:
+        with self._transaction() as connection:
+            row = connection.execute(
+                "SELECT status, report FROM jobs WHERE job_id = ?",
+                (job_id,)
+            ).fetchone()
+
+        if not row:
+            raise KeyError(f"unknown job {job_id}")
+
+        if row[0] != "finished":
+            return None
+
+        report: Report = json.loads(row[1])
+        return report
+
+    def fetch_artifacts(self, job_id: str, folder: str) -> list[str]:
+        os.makedirs(folder, exist_ok=True)
+        return [shutil.copy(path, folder) for path in sorted(glob.glob(
+            os.path.join(self.folder, "artifacts", job_id, "*")
+        ))]
+
+
+BROKERS: dict[str, Callable[[str], Broker]] = {"sqlite": SQLiteBroker}
+
+
+def open_broker(url: str) -> Broker:
+    """Connects to the broker at the url.
+
+    The url has the form SCHEME:LOCATION, e.g. sqlite:/srv/pipetex-queue.
+    A url without scheme is the folder of a SQLiteBroker.
+
+    Raises:
+        ValueError: If no broker is registered for the scheme.
+    """
+    scheme, _, location = url.partition(":")
+    if not location:
+        scheme, location = "sqlite", url
+
+    if scheme not in BROKERS:
+        for entry_point in metadata.entry_points(group=ENTRY_POINT_GROUP):
+            if entry_point.name == scheme:
+                BROKERS[scheme] = entry_point.load()
+
+    if scheme not in BROKERS:
+        raise ValueError(f"unknown broker {scheme}")
+
+    return BROKERS[scheme](location)
+
+
+# === Worker ===
+def _lost_report(attempts: int) -> Report:
+    return {
+        "worker": None,
+        "success": False,
+        "severity_level": SeverityLevels.CRITICAL.value,
+        "message": f"The job was given up after {attempts} workers were "
+                   f"lost while building it.",
+        "duration": None,
+        "stages": [],
+        "artifacts": []
+    }
+
+
+def _keep_lease(broker: Broker, job: Job,
+                stop: threading.Event, interval: float) -> None:
+    while not stop.wait(interval):
+        broker.renew(job)
+
+
+def execute_job(broker: Broker, job: Job, worker_id: str,
+                lease: float = LEASE_SECONDS) -> Report:
+    """Builds the job in a temporary folder and pushes back its result.
+
+    Args:
+        broker: The broker the job was claimed from.
+        job: The claimed job.
+        worker_id: Name of the worker, stored in the report.
+        lease (optional): Lease of the broker in seconds. The lease is
+            renewed three times per period while the job runs.
+
+    Returns:
+        Report: The report pushed to the broker.
+    """
+    logger = logging.getLogger("main.workers")
+    logger.info("Building %s (job %s, attempt %d)", job.file_name,
+                job.job_id, job.attempt)
+
+    stop = threading.Event()
+    keeper = threading.Thread(target=_keep_lease,
+                              args=(broker, job, stop, lease / 3),
+                              daemon=True)
+    keeper.start()
+
+    started = time.monotonic()
+    stage_results: list[tuple[str, float, bool, Optional[int]]] = []
+    success = False
+    error: Optional[exceptions.InternalException] = None
+
+    with tempfile.TemporaryDirectory(prefix="pipetex-job-") as work_dir:
+        project_dir, file_name = os.path.split(job.file_name)
+        try:
+            broker.fetch_snapshot(job, work_dir)
+            with buildcontext.WORKING_DIRECTORY.enter(
+                    os.path.join(work_dir, project_dir)):
+                p = pipeline.Pipeline(file_name, **job.options)
+                stop_recording = metrics.REGISTRY.observe(p.event_bus)
+                try:
+                    success, error = p.execute(file_name)
+                finally:
+                    stop_recording()
+            stage_results = p.stage_results
+        except Exception as e:  # A failing build must not kill the worker
+            error = exceptions.InternalException(
+                f"The job could not be executed: {e}",
+                SeverityLevels.CRITICAL,
+                e
+            )
+        finally:
+            stop.set()
+            keeper.join()
+
+        artifacts = sorted(glob.glob(
+            os.path.join(work_dir, project_dir, "DEPLOY", "*.pdf")
+        ))
+        report: Report = {
+            "worker": worker_id,
+            "success": success,
+            "severity_level": error.severity_level if error else None,
+            "message": error.message if error else None,
+            "duration": time.monotonic() - started,
+            "stages": [
+                {"stage": stage, "duration": duration, "success": ok,
+                 "peak_rss": peak_rss}
+                for stage, duration, ok, peak_rss in stage_results
+            ],
+            "artifacts": [os.path.basename(path) for path in artifacts]
+        }
+        broker.complete(job, report, artifacts)
+
+    return report
+
+
+def run_worker(broker: Broker,
+               worker_id: Optional[str] = None,
+               max_jobs: Optional[int] = None,
+               idle_timeout: Optional[float] = None,
+               poll_interval: float = POLL_INTERVAL) -> int:
+    """Builds jobs of the broker until it is stopped.
+
+    Args:
+        broker: The queue the jobs are taken from.
+        worker_id (optional): Name of the worker. Defaults to the host name
+            and the process id.
+        max_jobs (optional): Stop after building this many jobs.
+        idle_timeout (optional): Stop after waiting this many seconds for a
+            job. Waits forever if not given.
+        poll_interval (optional): Seconds between two requests for a job.
+
+    Returns:
+        int: Number of jobs built.
+    """
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    lease = getattr(broker, "lease", LEASE_SECONDS)
+    built = 0
+    idle_since = time.monotonic()
+
+    while max_jobs is None or built < max_jobs:
+        job = broker.claim(worker_id)
+        if not job:
+            if (idle_timeout is not None and
+                    time.monotonic() - idle_since >= idle_timeout):
+                break
+
+            time.sleep(poll_interval)
+            continue
+
+        execute_job(broker, job, worker_id, lease)
+        built += 1
+        idle_since = time.monotonic()
+
+    return built
+
+
+# === Client ===
+def wait_for(broker: Broker, job_id: str,
+             poll_interval: float = POLL_INTERVAL) -> Report:
+    """Waits until the job is finished and returns its report."""
+    while True:
+        report = broker.report(job_id)
+        if report is not None:
+            return report
+
+        time.sleep(poll_interval)
+
+
+def report_to_monad(report: Report) -> Monad:
+    """Turns the report of a job back into the result of a pipeline."""
+    if report["severity_level"] is None:
+        return report["success"], None
+
+    return report["success"], exceptions.InternalException(
+        report["message"] or "", SeverityLevels(report["severity_level"])
+    )
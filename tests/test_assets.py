@@ -0,0 +1,160 @@
+""" Test the conversion of the graphics of a document.
+
+The converters are replaced by local stand-ins, so the tests do not need any
+conversion tools.
+
+@author Max Weise
+created 19.10.2026
+"""
+
+from src.pipetex import assets
+from tests import util_functions
+
+import os
+import pytest
+import shutil
+
+
+# === Converter stand-ins ===
+def copy_converter(source, target, settings):
+    """Converts by prefixing the content with the target dpi."""
+    with open(source, "r") as s, open(target, "w") as t:
+        t.write(f"{settings['target_dpi']}:{s.read()}")
+    return True
+
+
+def keep_converter(source, target, settings):
+    """Decides that the source can be used as it is."""
+    return False
+
+
+def failing_converter(source, target, settings):
+    raise RuntimeError("Converter failed")
+
+
+# === Fixtures ===
+@pytest.fixture
+def testfile_with_graphics():
+    """Generates a tex file using graphics from a graphics folder."""
+    file_name = "test_file"
+    os.makedirs("graphics_folder")
+    for graphic in ["logo.svg", "plot.eps", "photo.png"]:
+        with open(f"graphics_folder/{graphic}", "w", encoding="utf-8") as f:
+            f.write(graphic)
+
+    with open(f"{file_name}.tex", "w+", encoding="utf-8") as f:
+        f.write(
+            "\\documentclass[a4paper, 12pt]{article}\n"
+            "\\usepackage{graphicx}\n"
+            "\\graphicspath{{graphics_folder/}}\n"
+            "\\begin{document}\n"
+            "\\includegraphics[width=3cm]{logo.svg}\n"
+            "\\includegraphics{plot}\n"
+            "\\includesvg{logo}\n"
+            "% \\includegraphics{plot}\n"
+            "\\includegraphics{photo.png}\n"
+            "\\end{document}\n"
+        )
+
+    saved_converters = dict(assets.CONVERTERS)
+    assets.register_converter(".svg", copy_converter, ".pdf")
+    assets.register_converter(".eps", copy_converter, ".pdf")
+    assets.register_converter(".png", keep_converter, ".png")
+
+    yield file_name
+
+    assets.CONVERTERS.clear()
+    assets.CONVERTERS.update(saved_converters)
+    util_functions.remove_files(file_name)
+    shutil.rmtree("graphics_folder")
+
+    if ".pipetex" in os.listdir():
+        shutil.rmtree(".pipetex")
+
+
+@pytest.fixture
+def config_dict():
+    return {"file_prefix": "[piped]", "jobs": 2,
+            "asset_settings": {"target_dpi": 150}}
+
+
+def _graphics(file_name):
+    with open(f"{file_name}.tex", "r") as f:
+        return [line for line in f.read().splitlines()
+                if "\\include" in line]
+
+
+# === Test Functions ===
+def test_convert_assets(testfile_with_graphics, config_dict):
+    """Tests that converted graphics are used by the build copy."""
+    file_name = testfile_with_graphics
+
+    success, error = assets.convert_assets(file_name, config_dict)
+    graphics = _graphics(file_name)
+
+    assert success
+    assert not error
+    assert graphics[0].startswith("\\includegraphics[width=3cm]{.pipetex/")
+    assert graphics[1].startswith("\\includegraphics{.pipetex/")
+    assert graphics[2] == graphics[0].replace("[width=3cm]", "")
+    assert graphics[3] == "% \\includegraphics{plot}"
+    assert graphics[4] == "\\includegraphics{photo.png}"
+
+    with open(graphics[1][len("\\includegraphics{"):-1], "r") as f:
+        assert f.read() == "150:plot.eps"
+
+
+def test_convert_assets_cached(testfile_with_graphics, config_dict, mocker):
+    """Tests that cached conversions do not start the worker processes."""
+    file_name = testfile_with_graphics
+    shutil.copy(f"{file_name}.tex", f"{file_name}_original.tex")
+    assets.convert_assets(file_name, config_dict)
+    first_run = _graphics(file_name)
+
+    shutil.copy(f"{file_name}_original.tex", f"{file_name}.tex")
+    pool = mocker.patch.object(assets.runlog, "process_pool")
+    success, error = assets.convert_assets(file_name, config_dict)
+
+    assert success
+    assert not error
+    assert pool.call_count == 0
+    assert _graphics(file_name) == first_run
+
+
+def test_convert_assets_converterFails(testfile_with_graphics, config_dict):
+    """Tests that graphics which fail to convert are used as they are."""
+    file_name = testfile_with_graphics
+    assets.register_converter(".eps", failing_converter, ".pdf")
+
+    success, error = assets.convert_assets(file_name, config_dict)
+    graphics = _graphics(file_name)
+
+    assert not success
+    assert error.severity_level <= 10
+    assert "plot" in error.message
+    assert graphics[1] == "\\includegraphics{plot}"
+    assert graphics[0].startswith("\\includegraphics[width=3cm]{.pipetex/")
+
+
+def test_convert_assets_fileNotFound(config_dict):
+    """Tests that a missing file is critical."""
+    success, error = assets.convert_assets("not_a_file", config_dict)
+
+    assert not success
+    assert 20 < error.severity_level <= 30
+
+
+def test_conversion_key(testfile_with_graphics, mocker):
+    """Tests that kept graphics are converted again once Pillow is found."""
+    source = "graphics_folder/photo.png"
+    settings = dict(assets.DEFAULT_SETTINGS)
+
+    mocker.patch.object(assets, "_HAS_PILLOW", False)
+    without_pillow = assets._conversion_key(
+        source, assets.downsample_raster, settings, ".png"
+    )
+    mocker.patch.object(assets, "_HAS_PILLOW", True)
+
+    assert assets._conversion_key(
+        source, assets.downsample_raster, settings, ".png"
+    ) != without_pillow
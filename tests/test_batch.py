@@ -0,0 +1,128 @@
+""" Test the scheduling of batch builds.
+
+@author Max Weise
+created 19.10.2026
+"""
+
+from src.pipetex import batch
+from src.pipetex import history
+
+from concurrent.futures import ThreadPoolExecutor
+
+import atexit
+import logging
+import os
+import pytest
+import threading
+import time
+
+
+# === Fixtures ===
+@pytest.fixture
+def predictions(mocker):
+    """Predicted duration in seconds and memory in MB of each document."""
+    known = {"a": (1, 600), "b": (8, 600), "c": (2, 100), "d": (8, 100),
+             "e": (3, 100), "f": (5, 100)}
+
+    def _predict(file_names, path=None):
+        return {name: history.Prediction(known[os.path.basename(name)][0],
+                                         known[os.path.basename(name)][1] *
+                                         1024 * 1024, True)
+                for name in file_names}
+
+    mocker.patch.object(batch.history, "predict", side_effect=_predict)
+    return known
+
+
+def _makespan(order, durations, workers):
+    """Simulates a list schedule and returns the time the last job ends."""
+    finish_times = [0.0] * workers
+    for document in order:
+        earliest = finish_times.index(min(finish_times))
+        finish_times[earliest] += durations[document]
+
+    return max(finish_times)
+
+
+# === Test Functions ===
+def test_schedule_order(predictions):
+    """Tests that the longest documents are started first."""
+    documents = list(predictions)
+    predicted = batch.history.predict(documents)
+
+    order = batch.schedule_order(documents, predicted)
+    durations = {d: predictions[d][0] for d in documents}
+
+    assert order[:2] == ["b", "d"]
+    assert _makespan(order, durations, 2) < _makespan(documents, durations, 2)
+
+
+def test_run_batch_memoryBudget(predictions, mocker):
+    """Tests that the predicted memory of running builds stays in budget."""
+    lock = threading.Lock()
+    running = []
+    peak = []
+
+    def _build(work_dir, file_name, options, history_path):
+        with lock:
+            running.append(predictions[file_name][1])
+            peak.append(sum(running))
+        time.sleep(0.01 * predictions[file_name][0])
+        with lock:
+            running.remove(predictions[file_name][1])
+        return True, None, None
+
+    mocker.patch.object(batch, "_build_document", side_effect=_build)
+
+    results = batch.run_batch(list(predictions), {}, max_builds=3,
+                              memory_budget=800 * 1024 * 1024,
+                              executor_factory=ThreadPoolExecutor)
+
+    assert set(results) == set(predictions)
+    assert all(success for success, _ in results.values())
+    assert max(peak) <= 800
+
+
+def test_run_batch_error(predictions, mocker):
+    """Tests that errors of the workers are reported per document."""
+    mocker.patch.object(batch, "_build_document",
+                        return_value=(False, 20, "Bibliography failed"))
+
+    results = batch.run_batch(["c"], {}, executor_factory=ThreadPoolExecutor)
+
+    success, error = results["c"]
+    assert not success
+    assert error.severity_level == 20
+    assert error.message == "Bibliography failed"
+
+
+def test_run_batch_workerLogs(tmp_path, monkeypatch):
+    """Tests that the records of the worker processes reach the log file."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("PIPETEX_HISTORY_DB", str(tmp_path / "history.db"))
+    (tmp_path / "test_file.tex").write_text("\\documentclass{article}\n")
+
+    logger = logging.getLogger("main")
+    monkeypatch.setattr(logger, "handlers", [])
+    monkeypatch.setattr(logger, "level", logging.DEBUG)
+    monkeypatch.setattr(batch.runlog, "_worker_queue", None)
+    monkeypatch.setattr(batch.runlog, "_worker_listener", None)
+
+    handler = logging.FileHandler(tmp_path / "batch.log", encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(process)d %(name)s "
+                                           "%(message)s"))
+    listener = batch.runlog.start_listener(logger, handler)
+
+    batch.run_batch(["test_file"], {}, max_builds=1)
+
+    # The records of the workers pass through both listeners
+    for running in (batch.runlog._worker_listener, listener):
+        running.stop()
+        atexit.unregister(running.stop)
+    handler.close()
+
+    worker_lines = [line for line in
+                    (tmp_path / "batch.log").read_text().splitlines()
+                    if not line.startswith(f"{os.getpid()} ")]
+    assert any("main.pipeline Now executing:" in line
+               for line in worker_lines)
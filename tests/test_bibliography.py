@@ -0,0 +1,163 @@
+""" Test the reduction of bibliography databases to the cited entries.
+
+@author Max Weise
+created 19.10.2026
+"""
+
+from src.pipetex import bibliography
+from tests import util_functions
+
+import os
+import pytest
+import shutil
+
+
+# === Fixtures ===
+@pytest.fixture
+def bibliography_testfile():
+    """Generates the files of a document after its first compilation."""
+    file_name = "test_file"
+    with open(f"{file_name}.bib", "w+", encoding="utf-8") as f:
+        f.write(
+            '@string{bsi = "Bundesamt f{\\"u}r Sicherheit"}\n'
+            '@comment{This is not an entry}\n'
+            '@misc{cited,\n'
+            '  author = {BSI},\n'
+            '  title  = {Spielregeln {f\\"u}r digitale Sicherheit},\n'
+            '  crossref = {parent}\n'
+            '}\n'
+            '@book{parent,\n  publisher = bsi,\n  xdata = {data1, data2}\n}\n'
+            '@xdata{data1, year = {2022}}\n'
+            '@xdata(data2, location = {Bonn})\n'
+            '@misc{uncited,\n  title = {Not in the subset}\n}\n'
+        )
+
+    with open(f"{file_name}.bcf", "w+", encoding="utf-8") as f:
+        f.write(
+            '<bcf:controlfile>\n'
+            '<bcf:bibdata section="0">\n'
+            '<bcf:datasource type="file" datatype="bibtex" glob="false">'
+            f'{file_name}.bib</bcf:datasource>\n'
+            '</bcf:bibdata>\n'
+            '<bcf:section number="0">\n'
+            '<bcf:citekey order="1" intorder="1">cited</bcf:citekey>\n'
+            '</bcf:section>\n'
+            '</bcf:controlfile>\n'
+        )
+
+    yield file_name
+
+    util_functions.remove_files(file_name)
+
+    if ".pipetex" in os.listdir():
+        shutil.rmtree(".pipetex")
+
+
+@pytest.fixture
+def config_dict():
+    return {"file_prefix": "[piped]", "verbose": False}
+
+
+# === Test Functions ===
+def test_subset_bibliography(bibliography_testfile, config_dict):
+    """Tests that only cited and linked entries are written."""
+    file_name = bibliography_testfile
+
+    success, error = bibliography.subset_bibliography(file_name, config_dict)
+
+    with open(f"{file_name}-subset.bib", "r", encoding="utf-8") as f:
+        subset = f.read()
+
+    with open(f"{file_name}.bcf", "r", encoding="utf-8") as f:
+        bcf = f.read()
+
+    assert success
+    assert not error
+    for key in ["@string{bsi", "@misc{cited", "@book{parent", "@xdata{data1",
+                "@xdata(data2"]:
+        assert key in subset
+    assert "uncited" not in subset
+    assert "@comment" not in subset
+    assert f">{file_name}-subset.bib</bcf:datasource>" in bcf
+
+
+def test_subset_bibliography_bibtex(bibliography_testfile, config_dict):
+    """Tests that the .aux file of bibtex documents is pointed at the subset."""
+    file_name = bibliography_testfile
+    os.remove(f"{file_name}.bcf")
+    with open(f"{file_name}.aux", "w+", encoding="utf-8") as f:
+        f.write("\\citation{parent}\n\\bibdata{test_file}\n")
+
+    success, error = bibliography.subset_bibliography(file_name, config_dict)
+
+    with open(f"{file_name}-subset.bib", "r", encoding="utf-8") as f:
+        subset = f.read()
+
+    with open(f"{file_name}.aux", "r", encoding="utf-8") as f:
+        aux = f.read()
+
+    assert success
+    assert not error
+    assert "@book{parent" in subset
+    assert "@misc{cited" not in subset
+    assert f"\\bibdata{{{file_name}-subset}}" in aux
+
+
+def test_subset_bibliography_includedChapter(bibliography_testfile,
+                                             config_dict):
+    """Tests that citations in the .aux files of included files are found."""
+    file_name = bibliography_testfile
+    os.remove(f"{file_name}.bcf")
+    with open(f"{file_name}.aux", "w+", encoding="utf-8") as f:
+        f.write("\\@input{chapter.aux}\n\\bibdata{test_file}\n")
+    with open("chapter.aux", "w+", encoding="utf-8") as f:
+        f.write("\\citation{cited}\n")
+
+    try:
+        success, _ = bibliography.subset_bibliography(file_name, config_dict)
+
+        with open(f"{file_name}-subset.bib", "r", encoding="utf-8") as f:
+            subset = f.read()
+    finally:
+        os.remove("chapter.aux")
+
+    assert success
+    assert "@misc{cited" in subset
+
+
+def test_subset_bibliography_nociteAll(bibliography_testfile, config_dict):
+    """Tests that nothing is done when the whole database is cited."""
+    file_name = bibliography_testfile
+    with open(f"{file_name}.aux", "w+", encoding="utf-8") as f:
+        f.write("\\citation{*}\n")
+
+    success, error = bibliography.subset_bibliography(file_name, config_dict)
+
+    assert success
+    assert not error
+    assert f"{file_name}-subset.bib" not in os.listdir()
+
+
+def test_subset_bibliography_databaseMissing(bibliography_testfile,
+                                             config_dict):
+    """Tests that a database outside of the project is reported."""
+    file_name = bibliography_testfile
+    os.remove(f"{file_name}.bib")
+
+    success, error = bibliography.subset_bibliography(file_name, config_dict)
+
+    assert not success
+    assert error.severity_level <= 10
+
+
+def test_load_index_cached(bibliography_testfile, mocker):
+    """Tests that the index of an unchanged database is read from cache."""
+    file_name = bibliography_testfile
+    first = bibliography.load_index(f"{file_name}.bib")
+
+    build_index = mocker.spy(bibliography, "build_index")
+    second = bibliography.load_index(f"{file_name}.bib")
+
+    assert build_index.call_count == 0
+    assert first == second
+    assert set(first[0]) == {"cited", "parent", "data1", "data2", "uncited"}
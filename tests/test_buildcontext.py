@@ -0,0 +1,117 @@
+""" Test the context of a run and the sharing of the working directory.
+
+@author Max Weise
+created 19.10.2026
+"""
+
+from src.pipetex import buildcontext
+from src.pipetex import pipeline
+from src.pipetex import registry
+
+from concurrent.futures import ThreadPoolExecutor
+
+import os
+import pytest
+import threading
+import time
+
+
+# === Fixtures ===
+@pytest.fixture
+def projects(tmp_path, monkeypatch):
+    """Two project folders, each with a tex file."""
+    monkeypatch.chdir(tmp_path)
+    folders = []
+    for name in ["first", "second"]:
+        (tmp_path / name).mkdir()
+        (tmp_path / name / "test_file.tex").write_text("\\documentclass{x}")
+        folders.append(str(tmp_path / name))
+
+    return folders
+
+
+def _record_directory(file_name, config_dict):
+    """Operation which waits like an engine and records the directories."""
+    before = os.getcwd()
+    with pipeline.buildcontext.WORKING_DIRECTORY.lend():
+        time.sleep(0.05)
+
+    with open(f"{file_name}.rec", "w", encoding="utf-8") as record:
+        record.write(f"{before}\n{os.getcwd()}\n{config_dict.work_dir}")
+
+    return True, None
+
+
+# === Test Functions ===
+def test_mapping():
+    """Tests that the context can be used like the config dict."""
+    context = buildcontext.BuildContext("/tmp", verbose=True, custom=1)
+
+    assert not hasattr(context, "__dict__")
+    assert context.work_dir == "/tmp"
+    assert context["verbose"] is True
+    assert context["custom"] == 1
+    assert context.get("new_name", "fallback") == "fallback"
+    assert "new_name" not in context
+
+    with pytest.raises(KeyError):
+        context["new_name"]
+
+    context["new_name"] = "[piped]_test_file"
+    context.setdefault("engine_output", {})["compile"] = "output"
+
+    assert context.new_name == "[piped]_test_file"
+    assert context.engine_output == {"compile": "output"}
+    assert set(context) >= {"new_name", "verbose", "file_prefix", "custom"}
+
+    del context["new_name"]
+    assert context.new_name is None
+
+
+def test_lend_working_directory(tmp_path, monkeypatch):
+    """Tests that a lent directory is restored for its owner."""
+    monkeypatch.chdir(tmp_path)
+    directory = buildcontext.WorkingDirectory()
+    (tmp_path / "owner").mkdir()
+    (tmp_path / "guest").mkdir()
+    seen = []
+
+    def guest():
+        with directory.enter(str(tmp_path / "guest")):
+            seen.append(os.getcwd())
+
+    with directory.enter(str(tmp_path / "owner")):
+        with directory.lend():
+            thread = threading.Thread(target=guest)
+            thread.start()
+            thread.join(5)
+
+        seen.append(os.getcwd())
+
+    assert seen == [str(tmp_path / "guest"), str(tmp_path / "owner")]
+    assert os.getcwd() == str(tmp_path)
+
+
+def test_pipelines_in_threads(projects, mocker):
+    """Tests that pipelines in threads each work in their own folder."""
+    operation = registry.Operation(
+        "record", "tests.test_buildcontext:_record_directory",
+        outputs=[".rec"]
+    )
+
+    def build(folder):
+        p = pipeline.Pipeline("test_file", work_dir=folder)
+        p.order_of_operations = [operation]
+        return p.execute(p.file_name), p.context.artifacts
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        results = list(pool.map(build, projects))
+
+    for folder, (result, artifacts) in zip(projects, results):
+        with open(os.path.join(folder, "test_file.rec"),
+                  encoding="utf-8") as record:
+            assert record.read().splitlines() == [folder] * 3
+
+        assert result == (True, None)
+        assert artifacts == {"record": [os.path.join(folder,
+                                                     "test_file.rec")]}
@@ -0,0 +1,123 @@
+""" Test the per document build lock and the coalescing of builds.
+
+@author Max Weise
+created 19.10.2026
+"""
+
+from src.pipetex import buildlock
+from src.pipetex import enums, exceptions
+from tests import util_functions
+
+import os
+import pytest
+import shutil
+import threading
+import time
+
+
+# === Fixtures ===
+@pytest.fixture
+def simple_testfile():
+    """A test file which is built by the tests."""
+    file_name = "test_file"
+    util_functions.write_empty_file(file_name, "tex")
+
+    yield file_name
+
+    util_functions.remove_files(file_name)
+
+    if ".pipetex" in os.listdir():
+        shutil.rmtree(".pipetex")
+
+
+# === Test Functions ===
+def test_run_coalesced(simple_testfile, mocker):
+    """Tests that the build runs and its result is stored."""
+    build = mocker.Mock(return_value=(True, None))
+
+    success, error = buildlock.run_coalesced(simple_testfile, {}, build)
+
+    assert success
+    assert not error
+    assert build.call_count == 1
+    assert f"{simple_testfile}.result" in os.listdir(buildlock.LOCK_FOLDER)
+
+
+def test_run_coalesced_concurrentBuild(simple_testfile, mocker):
+    """Tests that a waiting build receives the result of the running one."""
+    release = threading.Event()
+    error = exceptions.InternalException("Glossary failed",
+                                         enums.SeverityLevels.HIGH)
+
+    def _first_build():
+        release.wait(5)
+        return False, error
+
+    results = []
+    first = threading.Thread(target=lambda: results.append(
+        buildlock.run_coalesced(simple_testfile, {}, _first_build)
+    ))
+    first.start()
+    time.sleep(0.2)
+
+    second_build = mocker.Mock(return_value=(True, None))
+    second = threading.Thread(target=lambda: results.append(
+        buildlock.run_coalesced(simple_testfile, {}, second_build)
+    ))
+    second.start()
+    time.sleep(0.2)
+
+    release.set()
+    first.join(5)
+    second.join(5)
+
+    assert second_build.call_count == 0
+    assert len(results) == 2
+    assert not results[1][0]
+    assert results[1][1].message == "Glossary failed"
+    assert 10 < results[1][1].severity_level <= 20
+
+
+def test_run_coalesced_differentOptions(simple_testfile, mocker):
+    """Tests that builds with other options do not reuse the result."""
+    release = threading.Event()
+
+    def _first_build():
+        release.wait(5)
+        return True, None
+
+    first = threading.Thread(target=buildlock.run_coalesced,
+                             args=(simple_testfile, {}, _first_build))
+    first.start()
+    time.sleep(0.2)
+
+    second_build = mocker.Mock(return_value=(True, None))
+    second = threading.Thread(
+        target=buildlock.run_coalesced,
+        args=(simple_testfile, {"create_bib": True}, second_build)
+    )
+    second.start()
+    time.sleep(0.2)
+
+    release.set()
+    first.join(5)
+    second.join(5)
+
+    assert second_build.call_count == 1
+
+
+def test_input_digest(simple_testfile):
+    """Tests that the digest changes with the files the document loads."""
+    with open(f"{simple_testfile}.tex", "w", encoding="utf-8") as tex_file:
+        tex_file.write("\\input{test_file_part}\n")
+    with open("test_file_part.tex", "w", encoding="utf-8") as part_file:
+        part_file.write("first version\n")
+
+    try:
+        first_digest = buildlock.input_digest(simple_testfile, {})
+        with open("test_file_part.tex", "w", encoding="utf-8") as part_file:
+            part_file.write("second version\n")
+
+        assert buildlock.input_digest(simple_testfile, {}) != first_digest
+    finally:
+        os.remove("test_file_part.tex")
@@ -0,0 +1,97 @@
+""" Test the maintenance of the artifact cache.
+
+@author Max Weise
+created 19.10.2026
+"""
+
+from src.pipetex import cache
+
+import os
+import pytest
+import time
+
+
+# === Fixtures ===
+@pytest.fixture
+def filled_cache(tmp_path, monkeypatch):
+    """A cache with three entries of different size and age."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("PIPETEX_CACHE_DIR", raising=False)
+    now = time.time()
+
+    for stage, key, size, age in [("figures", "old", 300, 90 * 86400),
+                                  ("figures", "new", 200, 3600),
+                                  ("assets", "mid", 100, 7 * 86400)]:
+        with open("artifact", "wb") as artifact:
+            artifact.write(b"x" * size)
+
+        path = cache.store(stage, key, "artifact", ".pdf")
+        os.utime(path, (now - age, now - age))
+
+    return tmp_path
+
+
+# === Test Functions ===
+def test_stats(filled_cache):
+    """Tests that sizes and the counted lookups are reported per stage."""
+    cache.lookup("figures", "new", ".pdf")
+    cache.lookup("figures", "missing", ".pdf")
+    cache.lookup("assets", "missing", ".pdf")
+
+    stats = cache.stats()
+
+    assert stats["figures"] == {"entries": 2, "size": 500, "hits": 1,
+                                "misses": 1}
+    assert stats["assets"] == {"entries": 1, "size": 100, "hits": 0,
+                               "misses": 1}
+
+
+def test_lookup_evicted(filled_cache, mocker):
+    """Tests that an entry removed during the lookup counts as a miss."""
+    mocker.patch("os.utime", side_effect=FileNotFoundError)
+
+    assert cache.lookup("figures", "new", ".pdf") is None
+    assert cache.stats()["figures"]["misses"] == 1
+
+
+def test_gc(filled_cache):
+    """Tests that entries are evicted by age, then least recently used."""
+    partial = cache.entry_path("figures", "crashed", ".pdf.1.2.tmp")
+    with open(partial, "wb") as partial_file:
+        partial_file.write(b"x")
+    os.utime(partial, (0, 0))
+
+    assert [e.name for e in cache.gc(max_age=30 * 86400, dry_run=True)] == [
+        "crashed.pdf.1.2.tmp", "old.pdf"
+    ]
+    assert len(cache.scan(include_partial=True)) == 4
+
+    evicted = cache.gc(max_size=250)
+
+    assert [e.name for e in evicted] == ["crashed.pdf.1.2.tmp", "old.pdf",
+                                         "mid.pdf"]
+    assert [e.name for e in cache.scan(include_partial=True)] == ["new.pdf"]
+
+
+def test_gc_grace_period(filled_cache):
+    """Tests that recently used entries are kept."""
+    cache.lookup("figures", "old", ".pdf")
+
+    assert [e.name for e in cache.gc(max_size=0)] == ["mid.pdf", "new.pdf"]
+
+
+def test_verify(filled_cache):
+    """Tests that changed and unrecorded entries are found."""
+    with open(cache.entry_path("figures", "new", ".pdf"), "ab") as entry:
+        entry.write(b"corrupted")
+
+    os.makedirs(os.path.join(cache.cache_root(), "glossary"))
+    with open(cache.entry_path("glossary", "foreign", ".gls"), "w") as entry:
+        entry.write("not stored by the cache")
+
+    states = {e.name: state for e, state in cache.verify(remove=True)}
+
+    assert states == {"old.pdf": "ok", "new.pdf": "corrupt",
+                      "mid.pdf": "ok", "foreign.gls": "unknown"}
+    assert not os.path.exists(cache.entry_path("figures", "new", ".pdf"))
+    assert os.path.exists(cache.entry_path("glossary", "foreign", ".gls"))
@@ -0,0 +1,181 @@
+""" Test the parallel compilation of chapters.
+
+@author Max Weise
+created 19.10.2026
+"""
+
+from src.pipetex import chapters
+from src.pipetex import pipeline
+
+import os
+import pytest
+import re
+
+
+# Pages of the front matter, the two chapters and the back matter
+LAYOUT = (2, 3, 4, 1)
+
+
+# === Fixtures ===
+@pytest.fixture
+def chapter_document(tmp_path, monkeypatch):
+    """A build copy with two chapters which was compiled once."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "chapters").mkdir()
+    with open("[piped]_test_file.tex", "w", encoding="utf-8") as tex_file:
+        tex_file.write("\\documentclass{book}\n\\begin{document}\n"
+                       "\\tableofcontents\n\\include{chapters/one}\n"
+                       "% \\include{chapters/draft}\n"
+                       "\\include{chapters/two}\n\\end{document}\n")
+
+    with open("[piped]_test_file.pages", "w", encoding="utf-8") as pages:
+        pages.write("start 2\nend 5\nstart 5\nend 9\n")
+
+    return "[piped]_test_file"
+
+
+def _fake_engine(chapter_pages):
+    """Creates an engine which records the pages of a chapter job."""
+    def _run_engine(argument_list, config_dict, stage, log_file_name=None,
+                    missing_level=None, cwd=None, env=None):
+        file_name = argument_list[-1][:-4]
+        with open(os.path.join(cwd, argument_list[-1]), "r") as tex_file:
+            part = re.search(r"\\includeonly\{(.+?)\}", tex_file.read())[1]
+
+        position = LAYOUT[0]
+        lines = []
+        for index, name in enumerate(["chapters/one", "chapters/two"]):
+            if name == part:
+                chapter = (name, position, position + chapter_pages[index])
+                lines += [f"start {position}",
+                          f"end {position + chapter_pages[index]}"]
+                position += chapter_pages[index]
+            else:
+                lines.append(f"skip {position}")
+
+        with open(os.path.join(cwd, f"{file_name}.pages"), "w") as pages:
+            pages.write("\n".join(lines))
+
+        _write_pdf(os.path.join(cwd, f"{file_name}.pdf"),
+                   position + LAYOUT[-1], chapter)
+        return True, None
+
+    return _run_engine
+
+
+def _write_pdf(path, page_count, chapter):
+    """Writes a PDF with an outline entry and links in the chapter."""
+    if hasattr(chapters, "pypdf"):
+        from pypdf.annotations import Link
+
+        title, start, end = chapter
+        writer = chapters.pypdf.PdfWriter()
+        for _ in range(page_count):
+            writer.add_blank_page(72, 72)
+        writer.add_outline_item(title, start)
+        writer.add_annotation(start, Link(rect=(0, 0, 10, 10),
+                                          target_page_index=end - 1))
+        writer.add_annotation(start, Link(rect=(0, 0, 10, 10),
+                                          url=f"https://example.org/{title}"))
+        writer.write(path)
+    else:
+        with open(path, "w") as pdf_file:
+            pdf_file.write("%PDF")
+
+
+# === Test Functions ===
+def test_track_chapters(chapter_document):
+    """Tests that the hooks are added to the preamble."""
+    success, error = chapters.track_chapters(chapter_document, {})
+
+    with open(f"{chapter_document}.tex", "r", encoding="utf-8") as f:
+        content = f.read()
+
+    assert success
+    assert not error
+    assert content.index("include/before") < content.index("\\begin{doc")
+
+
+def test_read_page_ranges(tmp_path):
+    """Tests that excluded chapters have an empty range."""
+    (tmp_path / "test.pages").write_text("skip 2\nstart 2\nend 6\nskip 6\n")
+
+    assert chapters.read_page_ranges(str(tmp_path / "test.pages")) == [
+        (2, 2), (2, 6), (6, 6)
+    ]
+    assert chapters.read_page_ranges(str(tmp_path / "missing.pages")) == []
+
+
+def test_compile_chapters(chapter_document, mocker, monkeypatch):
+    """Tests that the pages, outlines and links of the jobs are stitched."""
+    pypdf = pytest.importorskip("pypdf")
+    monkeypatch.setenv("TEXINPUTS", "user_folder" + os.pathsep)
+    run_engine = mocker.patch.object(chapters.engine, "run_engine",
+                                     side_effect=_fake_engine(LAYOUT[1:3]))
+    sequential = mocker.patch.object(chapters.operations,
+                                     "compile_latex_file")
+
+    success, error = chapters.compile_chapters(chapter_document,
+                                               {"jobs": 2})
+    reader = pypdf.PdfReader(f"{chapter_document}.pdf")
+    links = {}
+    for number, page in enumerate(reader.pages):
+        for annotation in page.get("/Annots", []):
+            annotation = annotation.get_object()
+            links.setdefault(number, []).append(
+                annotation["/A"]["/URI"] if "/A" in annotation
+                else reader.get_page_number(annotation["/Dest"][0])
+            )
+
+    assert success
+    assert not error
+    assert sequential.call_count == 0
+    assert len(reader.pages) == 10
+    assert [(item.title, reader.get_destination_page_number(item))
+            for item in reader.outline] == [("chapters/one", 2),
+                                            ("chapters/two", 5)]
+    assert links == {2: [4, "https://example.org/chapters/one"],
+                     5: [8, "https://example.org/chapters/two"]}
+    assert run_engine.call_args.kwargs["env"]["TEXINPUTS"] == (
+        os.getcwd() + os.pathsep + "user_folder" + os.pathsep
+    )
+
+
+def test_compile_chapters_pageCountChanged(chapter_document, mocker):
+    """Tests that the document is compiled as a whole if pages move."""
+    mocker.patch.object(chapters, "_HAS_PYPDF", True)
+    mocker.patch.object(chapters.engine, "run_engine",
+                        side_effect=_fake_engine((3, 5)))
+    sequential = mocker.patch.object(chapters.operations,
+                                     "compile_latex_file",
+                                     return_value=(True, None))
+
+    success, error = chapters.compile_chapters(chapter_document, {})
+
+    assert not success
+    assert error.severity_level == 10
+    assert "chapters/two has 5 instead of 4 pages" in error.message
+    assert sequential.call_count == 1
+
+
+def test_compile_chapters_noPypdf(chapter_document, mocker):
+    """Tests that the chapters are not split without pypdf."""
+    mocker.patch.object(chapters, "_HAS_PYPDF", False)
+    run_engine = mocker.patch.object(chapters.engine, "run_engine")
+    mocker.patch.object(chapters.operations, "compile_latex_file",
+                        return_value=(True, None))
+
+    success, error = chapters.compile_chapters(chapter_document, {})
+
+    assert not success
+    assert "pypdf" in error.message
+    assert run_engine.call_count == 0
+
+
+def test_pipeline_init_parallelChapters():
+    """Tests that the last compilation is split into chapters."""
+    underTest = pipeline.Pipeline("test_file", parallel_chapters=True)
+    names = [operation.name for operation in underTest.order_of_operations]
+
+    assert names == ["copy", "remove_draft", "track_chapters", "compile",
+                     "compile_chapters", "clean"]
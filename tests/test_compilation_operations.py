@@ -64,6 +64,21 @@ def bibliography_testfile_bibInDir():
     shutil.rmtree(f"{bib_folder}")
 
 
+@pytest.fixture
+def bibtex_testfile():
+    """A test file for documents using bibtex instead of biber."""
+    file_name = "test_file"
+    ex = ["tex", "bib"]
+    util_functions.write_empty_file(file_name, ex)
+
+    with open(f"{file_name}.aux", "w+", encoding="utf-8") as f:
+        f.write("\\citation{test}\n\\bibdata{test_file}\n")
+
+    yield file_name
+
+    util_functions.remove_files(file_name)
+
+
 @pytest.fixture
 def glossary_testfile():
     """A test file to test the creation of a glossary in latex."""
@@ -95,7 +110,7 @@ def test_compile_latex_file(simple_testfile, config_dict, mocker):
     file_name = simple_testfile
 
     # run test function
-    mocker.patch("subprocess.call", return_value=None)
+    mocker.patch("pipetex.engine.run_engine", return_value=(True, None))
     succsess, error = operations.compile_latex_file(file_name, config_dict)
 
     # assert statements
@@ -110,7 +125,7 @@ def test_compile_latex_file_notVerbose(simple_testfile, config_dict, mocker):
     config_dict["verbose"] = True
 
     # run test function
-    mocker.patch("subprocess.call", return_value=None)
+    mocker.patch("pipetex.engine.run_engine", return_value=(True, None))
     succsess, error = operations.compile_latex_file(file_name, config_dict)
 
     # assert statements
@@ -133,7 +148,7 @@ def test_create_bibliography(bibliography_testfile, config_dict, mocker):
     """ Tests the creation of a bibliography. """
     file_name = bibliography_testfile
 
-    mocker.patch("subprocess.call", return_value=None)
+    mocker.patch("pipetex.engine.run_engine", return_value=(True, None))
     succsess, error = operations.create_bibliograpyh(file_name, config_dict)
 
     assert succsess
@@ -145,7 +160,7 @@ def test_create_bibliography_bibFileInFolder(bibliography_testfile_bibInDir,
     """ Tests the creation of a bibliography. """
     file_name = bibliography_testfile_bibInDir
 
-    mocker.patch("subprocess.call", return_value=None)
+    mocker.patch("pipetex.engine.run_engine", return_value=(True, None))
     succsess, error = operations.create_bibliograpyh(file_name, config_dict)
 
     assert succsess
@@ -157,7 +172,7 @@ def test_create_bibliography_notVerbose(bibliography_testfile, config_dict, mock
     file_name = bibliography_testfile
     config_dict["verbose"] = True
 
-    mocker.patch("subprocess.call", return_value=None)
+    mocker.patch("pipetex.engine.run_engine", return_value=(True, None))
     succsess, error = operations.create_bibliograpyh(file_name, config_dict)
 
     assert succsess
@@ -169,7 +184,7 @@ def test_create_bibliography_BcfFileNotFound(config_dict, mocker):
     # Setting up test env
     file_name = "not_a_testfile"
 
-    mocker.patch("subprocess.call", return_value=None)
+    mocker.patch("pipetex.engine.run_engine", return_value=(True, None))
     succsess, error = operations.create_bibliograpyh(file_name, config_dict)
 
     assert not succsess
@@ -178,6 +193,18 @@ def test_create_bibliography_BcfFileNotFound(config_dict, mocker):
     assert type(error.severity_level) == int
 
 
+def test_create_bibliography_noCitations(glossary_testfile, config_dict,
+                                         mocker):
+    """Tests that a document without a bibliography is not an error."""
+    run = mocker.patch("pipetex.engine.run_engine", return_value=(True, None))
+    succsess, error = operations.create_bibliograpyh(glossary_testfile,
+                                                     config_dict)
+
+    assert succsess
+    assert not error
+    assert run.call_count == 0
+
+
 def test_create_bibliography_BibFileNotFound(bibliography_testfile,
                                              config_dict, mocker):
     """Test the correct behaviour when no bib file was found."""
@@ -192,11 +219,52 @@ def test_create_bibliography_BibFileNotFound(bibliography_testfile,
     assert type(error.severity_level) == int
 
 
+def test_create_bibliography_bibtex(bibtex_testfile, config_dict, mocker):
+    """ Tests that bibtex is used for documents which need it. """
+    file_name = bibtex_testfile
+
+    run = mocker.patch("pipetex.engine.run_engine", return_value=(True, None))
+    succsess, error = operations.create_bibliograpyh(file_name, config_dict)
+
+    assert succsess
+    assert not error
+    assert run.call_args.args[0] == ["bibtex", "-terse", file_name]
+
+
+def test_create_bibliography_preferBibtex(bibtex_testfile, config_dict,
+                                          mocker):
+    """ Tests that bibtex is preferred when both tools are compatible. """
+    file_name = bibtex_testfile
+    util_functions.write_empty_file(file_name, "bcf")
+
+    run = mocker.patch("pipetex.engine.run_engine", return_value=(True, None))
+    operations.create_bibliograpyh(file_name, config_dict)
+    config_dict["bib_backend"] = "biber"
+    operations.create_bibliograpyh(file_name, config_dict)
+
+    assert run.call_args_list[0].args[0][0] == "bibtex"
+    assert run.call_args_list[1].args[0][0] == "biber"
+
+
+def test_create_bibliography_incompatibleBackend(bibtex_testfile,
+                                                 config_dict, mocker):
+    """ Tests that a tool the document can not use is reported. """
+    file_name = bibtex_testfile
+    config_dict["bib_backend"] = "biber"
+
+    run = mocker.patch("pipetex.engine.run_engine", return_value=(True, None))
+    succsess, error = operations.create_bibliograpyh(file_name, config_dict)
+
+    assert not succsess
+    assert 10 < error.severity_level <= 20
+    assert run.call_count == 0
+
+
 def test_create_glossaries(glossary_testfile, config_dict, mocker):
     """Tests the creation of glossaries. """
     file_name = glossary_testfile
 
-    mocker.patch("subprocess.call", return_value=None)
+    mocker.patch("pipetex.engine.run_engine", return_value=(True, None))
     succsess, error = operations.create_glossary(file_name, config_dict)
 
     assert succsess
@@ -208,7 +276,7 @@ def test_create_glossaries_notVerbose(glossary_testfile, config_dict, mocker):
     file_name = glossary_testfile
     config_dict["verbose"] = True
 
-    mocker.patch("subprocess.call", return_value=None)
+    mocker.patch("pipetex.engine.run_engine", return_value=(True, None))
     succsess, error = operations.create_glossary(file_name, config_dict)
 
     assert succsess
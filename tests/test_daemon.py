@@ -0,0 +1,123 @@
+""" Test the build queue and the socket interface of the pipeline daemon.
+
+@author Max Weise
+created 19.10.2026
+"""
+
+from src.pipetex import daemon
+
+import os
+import pytest
+import shutil
+import socket
+import tempfile
+import threading
+
+
+# === Fixtures ===
+@pytest.fixture
+def running_daemon():
+    """Starts a daemon on a temporary socket and yields the socket path."""
+    socket_dir = tempfile.mkdtemp()
+    socket_path = os.path.join(socket_dir, "test.sock")
+    server = daemon.PipelineDaemon(socket_path)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield socket_path
+
+    server.shutdown()
+    server.server_close()
+    os.rmdir(socket_dir)
+
+    if ".pipetex" in os.listdir():
+        shutil.rmtree(".pipetex")
+
+
+@pytest.fixture
+def build_request():
+    return {
+        "command": "build",
+        "work_dir": os.getcwd(),
+        "file_name": "test_file",
+        "options": {"create_bib": True}
+    }
+
+
+# === Test Functions ===
+def test_build_request(running_daemon, build_request, mocker):
+    """Tests that a build is executed and its result is streamed back."""
+    execute = mocker.patch.object(daemon.pipeline.Pipeline, "execute",
+                                  return_value=(True, None))
+
+    messages = list(daemon.send_request(build_request, running_daemon))
+
+    assert execute.call_count == 1
+    assert messages[0]["event"] == "queued"
+    assert messages[-1] == {
+        "event": "result",
+        "success": True,
+        "severity_level": None,
+        "message": None
+    }
+
+
+def test_build_request_criticalError(running_daemon, build_request):
+    """Tests that a failing build is reported without stopping the daemon."""
+    build_request["file_name"] = "not_a_testfile"
+
+    messages = list(daemon.send_request(build_request, running_daemon))
+    pong = list(daemon.send_request({"command": "ping"}, running_daemon))
+
+    assert not messages[-1]["success"]
+    assert 20 < messages[-1]["severity_level"] <= 30
+    assert pong == [{"event": "pong", "queue_depth": 0}]
+
+
+def test_daemon_alreadyRunning(running_daemon):
+    """Tests that a second daemon does not take over the socket."""
+    with pytest.raises(OSError, match="already running"):
+        daemon.PipelineDaemon(running_daemon)
+
+    assert list(daemon.send_request({"command": "ping"}, running_daemon))
+
+
+def test_daemon_staleSocket(tmp_path):
+    """Tests that the socket of a daemon which crashed is replaced."""
+    socket_path = str(tmp_path / "test.sock")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as stale:
+        stale.bind(socket_path)
+
+    server = daemon.PipelineDaemon(socket_path)
+    server.server_close()
+
+
+def test_coalesce_queued_requests(build_request, mocker):
+    """Tests that equal requests waiting in the queue share one build."""
+    started = threading.Event()
+    release = threading.Event()
+
+    def _blocking_execute(*args):
+        started.set()
+        release.wait(5)
+        return True, None
+
+    execute = mocker.patch.object(daemon.pipeline.Pipeline, "execute",
+                                  side_effect=_blocking_execute)
+    queue = daemon.BuildQueue()
+
+    other_request = dict(build_request, file_name="other_file")
+    running = queue.submit(other_request)
+    started.wait(5)
+
+    first = queue.submit(build_request)
+    second = queue.submit(dict(build_request))
+    release.set()
+
+    results = [list(job.stream())[-1] for job in (running, first, second)]
+    queue.stop()
+
+    assert first is second
+    assert queue.depth == 0
+    assert execute.call_count == 2
+    assert all(r["success"] for r in results)
@@ -0,0 +1,266 @@
+""" Test the execution of external programs through the engine module.
+
+@author Max Weise
+created 19.10.2026
+"""
+
+from src.pipetex import engine
+from tests import util_functions
+
+import os
+import pytest
+import sys
+import time
+
+
+# === Fixtures ===
+@pytest.fixture
+def config_dict():
+    return {
+        "file_prefix": "[piped]",
+        "verbose": False,
+        "timeouts": {"default": 30},
+        "cpu_limit": None,
+        "memory_limit": None
+    }
+
+
+@pytest.fixture
+def engine_log():
+    """A log file as it is written by a latex engine."""
+    file_name = "test_file"
+    with open(f"{file_name}.log", "w+", encoding="utf-8") as f:
+        f.writelines(f"line {i}\n" for i in range(50))
+
+    yield f"{file_name}.log"
+
+    util_functions.remove_files(file_name)
+
+
+# === Test Functions ===
+def test_run_engine(config_dict):
+    """Tests that a program which exits normally is successful."""
+    success, error = engine.run_engine(
+        [sys.executable, "-c", "pass"], config_dict, "compile"
+    )
+
+    assert success
+    assert not error
+
+
+def test_run_engine_timeout(config_dict, engine_log):
+    """Tests that a hanging engine is killed and reported as critical."""
+    config_dict["timeouts"]["compile"] = 0.5
+    start = time.monotonic()
+
+    success, error = engine.run_engine(
+        [sys.executable, "-c", "import time; time.sleep(30)"],
+        config_dict,
+        "compile",
+        log_file_name=engine_log
+    )
+
+    assert time.monotonic() - start < 10
+    assert not success
+    assert 20 < error.severity_level <= 30
+    assert "line 49" in error.message
+    assert "line 29" not in error.message
+
+
+def test_run_engine_noStdin(config_dict):
+    """Tests that an engine waiting for terminal input does not hang."""
+    success, error = engine.run_engine(
+        [sys.executable, "-c", "input()"], config_dict, "compile"
+    )
+
+    assert success
+    assert not error
+
+
+@pytest.mark.skipif(not hasattr(os, "killpg"), reason="Unix only")
+def test_run_engine_cpuLimit(config_dict):
+    """Tests that an engine exceeding its cpu time is reported as critical."""
+    config_dict["cpu_limit"] = 1
+
+    success, error = engine.run_engine(
+        [sys.executable, "-c", "while True: pass"], config_dict, "compile"
+    )
+
+    assert not success
+    assert 20 < error.severity_level <= 30
+    assert "SIGXCPU" in error.message or "SIGKILL" in error.message
+
+
+@pytest.mark.skipif(not hasattr(os, "killpg"), reason="Unix only")
+@pytest.mark.parametrize("prlimit", [True, False])
+def test_run_engine_limitsWithoutPreexec(config_dict, monkeypatch, prlimit):
+    """Tests that the limits are set after the start or by the wrapper."""
+    resource = pytest.importorskip("resource")
+    if not prlimit:
+        monkeypatch.delattr(resource, "prlimit", raising=False)
+    elif not hasattr(resource, "prlimit"):
+        pytest.skip("needs resource.prlimit")
+
+    calls = []
+    original = engine.subprocess.Popen
+
+    def _popen(*args, **kwargs):
+        calls.append(kwargs)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(engine.subprocess, "Popen", _popen)
+    config_dict["cpu_limit"] = 60
+
+    success, error = engine.run_engine(
+        [sys.executable, "-c",
+         "import resource, time; time.sleep(0.5); "
+         "print(resource.getrlimit(resource.RLIMIT_CPU)[0])"],
+        config_dict,
+        "compile"
+    )
+
+    assert success
+    assert config_dict["engine_output"]["compile"].split() == ["60"]
+    assert "preexec_fn" not in calls[0]
+
+
+def test_run_engine_programNotFound(config_dict):
+    """Tests that a missing program is reported with the given level."""
+    success, error = engine.run_engine(
+        ["not_an_engine"], config_dict, "bibliography",
+        missing_level=engine.SeverityLevels.HIGH
+    )
+
+    assert not success
+    assert 10 < error.severity_level <= 20
+
+
+def test_stage_timeout(config_dict):
+    """Tests that stage timeouts take precedence over the default."""
+    config_dict["timeouts"]["glossary"] = 5
+
+    assert engine.stage_timeout(config_dict, "glossary") == 5
+    assert engine.stage_timeout(config_dict, "compile") == 30
+    assert engine.stage_timeout({}, "compile") is None
+
+
+def test_run_engine_capturesOutput(config_dict):
+    """Tests that the output of the engine is stored per stage."""
+    success, error = engine.run_engine(
+        [sys.executable, "-c", "print('first'); print('second')"],
+        config_dict,
+        "compile"
+    )
+
+    assert success
+    assert not error
+    assert config_dict["engine_output"]["compile"].split() == [
+        "first", "second"
+    ]
+
+
+def test_run_engine_chattyEngine(config_dict):
+    """Tests that a lot of output neither blocks nor grows the buffer."""
+    config_dict["output_buffer_size"] = 1024
+
+    success, error = engine.run_engine(
+        [sys.executable, "-c",
+         "import sys; sys.stdout.write('x' * 4_000_000 + 'end')"],
+        config_dict,
+        "compile"
+    )
+
+    output = config_dict["engine_output"]["compile"]
+    assert success
+    assert not error
+    assert len(output) == 1024
+    assert output.endswith("xend")
+
+
+def test_run_engine_teeToLogger(config_dict, caplog):
+    """Tests that the output is written to the engine logger if requested."""
+    config_dict["tee_engine_output"] = True
+
+    with caplog.at_level("DEBUG", logger="main.engine"):
+        engine.run_engine(
+            [sys.executable, "-c", "print('to the log')"],
+            config_dict,
+            "bibliography"
+        )
+
+    record = ("main.engine.bibliography", 10, "to the log")
+    assert record in caplog.record_tuples
+
+
+def test_output_buffer():
+    """Tests that the buffer only keeps the most recent bytes."""
+    buffer = engine.OutputBuffer(capacity=10)
+
+    buffer.write(b"0123456")
+    buffer.write(b"789abc")
+    buffer.write(b"def\nghi")
+
+    assert buffer.getvalue() == b"abcdef\nghi"
+    assert len(buffer) == 10
+    assert buffer.total_bytes == 20
+    assert buffer.tail(1) == "ghi"
+
+
+def test_run_engine_cwdAndEnv(config_dict, tmp_path):
+    """Tests that the engine runs in the given folder and environment."""
+    success, error = engine.run_engine(
+        [sys.executable, "-c",
+         "import os; print(os.getcwd(), os.environ['TEXINPUTS'])"],
+        config_dict,
+        "figures",
+        cwd=str(tmp_path),
+        env={"TEXINPUTS": "project:"}
+    )
+
+    assert success
+    assert config_dict["engine_output"]["figures"].split() == [
+        str(tmp_path), "project:"
+    ]
+
+
+@pytest.mark.skipif(not hasattr(os, "wait4"), reason="needs os.wait4")
+def test_run_engine_peakRss(config_dict):
+    """Tests that the peak memory of the engine is measured."""
+    program = "data = bytearray(64 * 1024 * 1024); data[::4096] = b'x' * 16384"
+
+    success, _ = engine.run_engine([sys.executable, "-c", program],
+                                   config_dict, "compile")
+
+    assert success
+    assert config_dict["peak_rss"] > 64 * 1024 * 1024
+
+
+def test_run_engine_reproducible(config_dict, monkeypatch):
+    """Tests that reproducible builds fix the dates written by the engine."""
+    monkeypatch.setenv("SOURCE_DATE_EPOCH", "1700000000")
+    config_dict["source_date_epoch"] = engine.source_date_epoch()
+
+    success, error = engine.run_engine(
+        [sys.executable, "-c",
+         "import os; print(os.environ['SOURCE_DATE_EPOCH'], "
+         "os.environ['FORCE_SOURCE_DATE'])"],
+        config_dict,
+        "compile"
+    )
+
+    assert success
+    assert config_dict["engine_output"]["compile"].split() == [
+        "1700000000", "1"
+    ]
+
+    monkeypatch.setenv("SOURCE_DATE_EPOCH", "yesterday")
+    with pytest.raises(ValueError):
+        engine.source_date_epoch()
+
+
+def test_source_date_epoch_E_notSet(monkeypatch):
+    """Tests that reproducible builds need SOURCE_DATE_EPOCH."""
+    monkeypatch.delenv("SOURCE_DATE_EPOCH", raising=False)
+
+    with pytest.raises(ValueError):
+        engine.source_date_epoch()
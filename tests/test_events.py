@@ -0,0 +1,131 @@
+""" Test the events published by the pipeline.
+
+@author Max Weise
+created 19.10.2026
+"""
+
+from src.pipetex import cache
+from src.pipetex import engine
+from src.pipetex import events
+from src.pipetex import pipeline
+
+import asyncio
+import os
+import pytest
+import shutil
+
+
+# === Fixtures ===
+@pytest.fixture
+def test_pipeline():
+    """A pipeline whose operations do not need a tex file."""
+    underTest = pipeline.Pipeline("test_file")
+    underTest.order_of_operations = [
+        pipeline.registry.Operation("first", "tests.test_events:_stage"),
+        pipeline.registry.Operation("second", "tests.test_events:_stage"),
+    ]
+
+    return underTest
+
+
+def _stage(file_name, config_dict):
+    return True, None
+
+
+# === Test Functions ===
+def test_event_bus_subscribe():
+    """Tests that subscribers receive events until they unsubscribe."""
+    bus = events.EventBus()
+    received = []
+
+    assert not bus
+
+    unsubscribe = bus.subscribe(received.append)
+    bus.publish(events.ArtifactProduced("clean", "test_file.pdf"))
+    unsubscribe()
+    bus.publish(events.ArtifactProduced("clean", "test_file.pdf"))
+
+    assert not bus
+    assert len(received) == 1
+    assert received[0].path == "test_file.pdf"
+
+
+def test_execute_noSubscriber(test_pipeline, mocker):
+    """Tests that no events are created when nobody subscribes."""
+    started = mocker.spy(pipeline.events.StageStarted, "__init__")
+
+    success, error = test_pipeline.execute("test_file")
+
+    assert success
+    assert not error
+    assert started.call_count == 0
+
+
+def test_stream(test_pipeline):
+    """Tests that the events of a run are yielded in order."""
+    received = list(test_pipeline.stream("test_file"))
+
+    assert [type(event).__name__ for event in received] == [
+        "StageStarted", "StageFinished", "StageStarted", "StageFinished",
+        "PipelineFinished"
+    ]
+    assert received[2].stage == "second"
+    assert received[2].total == 2
+    assert received[-1].success
+    assert not test_pipeline.event_bus
+
+
+def test_stream_unexpectedError(test_pipeline, mocker):
+    """Tests that the stream ends if the pipeline raises an exception."""
+    mocker.patch.object(test_pipeline, "_execute_operations",
+                        side_effect=RuntimeError("broken"))
+
+    received = list(test_pipeline.stream("test_file"))
+
+    assert len(received) == 1
+    assert not received[0].success
+    assert received[0].error.severity_level > 20
+
+
+def test_astream(test_pipeline):
+    """Tests that the async variant yields the same events."""
+    async def _collect():
+        return [event async for event in test_pipeline.astream("test_file")]
+
+    received = asyncio.run(_collect())
+
+    assert len(received) == 5
+    assert isinstance(received[-1], pipeline.events.PipelineFinished)
+
+
+def test_engine_pass():
+    """Tests that every run of an external program is published."""
+    bus = events.EventBus()
+    received = []
+    bus.subscribe(received.append)
+    config_dict = {"verbose": False, "events": bus}
+
+    engine.run_engine(["true"], config_dict, "compile")
+    engine.run_engine(["true"], config_dict, "compile")
+
+    assert [event.number for event in received] == [1, 2]
+    assert received[0].program == "true"
+    assert received[0].returncode == 0
+
+
+def test_cache_lookup():
+    """Tests that cache lookups are published as hit or miss."""
+    bus = events.EventBus()
+    received = []
+    bus.subscribe(received.append)
+    with open("test_file.txt", "w", encoding="utf-8") as f:
+        f.write("artifact")
+
+    cache.lookup("test", "key", ".txt", bus)
+    cache.store("test", "key", "test_file.txt", ".txt")
+    cache.lookup("test", "key", ".txt", bus)
+
+    os.remove("test_file.txt")
+    shutil.rmtree(".pipetex")
+
+    assert [event.hit for event in received] == [False, True]
@@ -0,0 +1,133 @@
+""" Test the externalization of TikZ figures.
+
+@author Max Weise
+created 19.10.2026
+"""
+
+from src.pipetex import figures
+from tests import util_functions
+
+import os
+import pytest
+import shutil
+
+
+# === Fixtures ===
+@pytest.fixture
+def testfile_with_figures():
+    """Generates a tex file containing two figures and a commented one."""
+    file_name = "test_file"
+    with open(f"{file_name}.tex", "w+", encoding="utf-8") as f:
+        f.write(
+            "\\documentclass[a4paper, 12pt]{article}\n"
+            "\\usepackage{tikz}\n"
+            "\\begin{document}\n"
+            "\\begin{tikzpicture}\n"
+            "\\draw (0,0) -- (1,1);\n"
+            "\\end{tikzpicture}\n"
+            "Some text\n"
+            "\\begin{tikzpicture}\\draw (0,0) circle (1);\\end{tikzpicture}\n"
+            "% \\begin{tikzpicture}\n"
+            "% \\end{tikzpicture}\n"
+            "\\end{document}\n"
+        )
+
+    yield file_name
+
+    util_functions.remove_files(file_name)
+
+    if ".pipetex" in os.listdir():
+        shutil.rmtree(".pipetex")
+
+
+@pytest.fixture
+def config_dict():
+    return {"file_prefix": "[piped]", "verbose": False, "jobs": 2}
+
+
+def _fake_compile(key, source, config_dict):
+    """Stands in for pdflatex and writes the figure source as 'PDF'."""
+    path = f"test_file_{key}.pdf"
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(source)
+
+    figures.cache.store(figures.CACHE_STAGE, key, path, ".pdf")
+    os.remove(path)
+    return True, None
+
+
+# === Test Functions ===
+def test_externalize_figures(testfile_with_figures, config_dict, mocker):
+    """Tests that figures are replaced by their cached PDF files."""
+    file_name = testfile_with_figures
+    compile_figure = mocker.patch.object(figures, "_compile_figure",
+                                         side_effect=_fake_compile)
+
+    success, error = figures.externalize_figures(file_name, config_dict)
+
+    with open(f"{file_name}.tex", "r") as f:
+        content = f.read()
+
+    graphics = [line for line in content.splitlines()
+                if line.startswith("\\includegraphics")]
+
+    assert success
+    assert not error
+    assert compile_figure.call_count == 2
+    assert len(graphics) == 2
+    assert content.count("\\begin{tikzpicture}") == 1
+    assert "\\usepackage{graphicx}" in content
+    for line in graphics:
+        assert os.path.isfile(line[len("\\includegraphics{"):-1])
+
+    with open(graphics[0][len("\\includegraphics{"):-1], "r") as f:
+        cached_source = f.read()
+
+    assert cached_source.startswith("\\documentclass[tikz]{standalone}")
+
+
+def test_externalize_figures_cached(testfile_with_figures, config_dict,
+                                    mocker):
+    """Tests that unchanged figures are not compiled again."""
+    file_name = testfile_with_figures
+    shutil.copy(f"{file_name}.tex", f"{file_name}_original.tex")
+    compile_figure = mocker.patch.object(figures, "_compile_figure",
+                                         side_effect=_fake_compile)
+
+    figures.externalize_figures(file_name, config_dict)
+    shutil.copy(f"{file_name}_original.tex", f"{file_name}.tex")
+    success, error = figures.externalize_figures(file_name, config_dict)
+
+    assert success
+    assert not error
+    assert compile_figure.call_count == 2
+
+
+def test_externalize_figures_compileFails(testfile_with_figures,
+                                          config_dict, mocker):
+    """Tests that figures which fail to compile stay inline."""
+    file_name = testfile_with_figures
+    mocker.patch.object(
+        figures, "_compile_figure",
+        return_value=(False, figures.exceptions.InternalException(
+            "Failed", figures.SeverityLevels.LOW
+        ))
+    )
+
+    success, error = figures.externalize_figures(file_name, config_dict)
+
+    with open(f"{file_name}.tex", "r") as f:
+        content = f.read()
+
+    assert not success
+    assert error.severity_level <= 10
+    assert content.count("\\begin{tikzpicture}") == 3
+    assert "\\includegraphics" not in content
+
+
+def test_externalize_figures_fileNotFound(config_dict):
+    """Tests that a missing file is critical."""
+    success, error = figures.externalize_figures("not_a_file", config_dict)
+
+    assert not success
+    assert 20 < error.severity_level <= 30
@@ -0,0 +1,132 @@
+""" Test the reduction of glossary definition files to the used entries.
+
+@author Max Weise
+created 19.10.2026
+"""
+
+from src.pipetex import glossary
+from tests import util_functions
+
+import os
+import pytest
+import shutil
+
+
+# === Fixtures ===
+@pytest.fixture
+def glossary_testfile():
+    """Generates a tex file which loads a central glossary file."""
+    file_name = "test_file"
+    os.mkdir("glossary_folder")
+    with open(os.path.join("glossary_folder", "glossary.sty"), "w+",
+              encoding="utf-8") as f:
+        f.write(
+            "% Central glossary\n"
+            "\\newcommand{\\project}{pipetex}\n"
+            "\\newglossaryentry{used}\n"
+            "{\n"
+            "    name={Used},\n"
+            "    description={Refers to \\gls{described}},\n"
+            "    see=[see also]{related}\n"
+            "}\n"
+            "\\newglossaryentry{described}{name={Described},"
+            " description={Only used in a description}}\n"
+            "\\newglossaryentry{related}{name={Related}, description={See}}\n"
+            "\\newglossaryentry{child}{name={Child}, parent=used,"
+            " description={Only the parent is used}}\n"
+            "\\newacronym{acr}{ACR}{An Acronym}\n"
+            "\\newacronym[description={Not used}]{unused}{UN}{Unused}\n"
+        )
+
+    with open(f"{file_name}.tex", "w+", encoding="utf-8") as f:
+        f.write(
+            "\\documentclass{scrreprt}\n"
+            "\\usepackage{glossaries}\n"
+            "\\usepackage{glossary_folder/glossary}\n"
+            "\\makeglossaries\n"
+            "\\begin{document}\n"
+            "Uses \\Gls{used} and \\acrshort{acr}.\n"
+            "% Not used \\gls{child}\n"
+            "\\printglossary\n"
+            "\\end{document}\n"
+        )
+
+    yield file_name
+
+    util_functions.remove_files(file_name)
+    shutil.rmtree("glossary_folder")
+
+    if ".pipetex" in os.listdir():
+        shutil.rmtree(".pipetex")
+
+
+@pytest.fixture
+def config_dict():
+    return {"file_prefix": "[piped]", "verbose": False}
+
+
+# === Test Functions ===
+def test_prune_glossary(glossary_testfile, config_dict):
+    """Tests that only used and linked entries are loaded."""
+    file_name = glossary_testfile
+
+    success, error = glossary.prune_glossary(file_name, config_dict)
+
+    with open(f"{file_name}.tex", "r", encoding="utf-8") as f:
+        content = f.read()
+
+    trimmed_name = content.split("\\usepackage{")[2].split("}")[0]
+    with open(f"{trimmed_name}.sty", "r", encoding="utf-8") as f:
+        trimmed = f.read()
+
+    assert success
+    assert not error
+    assert trimmed_name.startswith(".pipetex/cache/glossary/")
+    assert "\\newcommand{\\project}{pipetex}" in trimmed
+    for key in ["{used}", "{described}", "{related}", "{acr}"]:
+        assert key in trimmed
+    assert "{child}" not in trimmed
+    assert "{unused}" not in trimmed
+
+
+def test_prune_glossary_cached(glossary_testfile, config_dict):
+    """Tests that the trimmed file is reused for the same used entries."""
+    file_name = glossary_testfile
+    shutil.copyfile(f"{file_name}.tex", "original.tex")
+
+    glossary.prune_glossary(file_name, config_dict)
+    shutil.copyfile("original.tex", f"{file_name}.tex")
+    os.remove("original.tex")
+
+    with open(f"{file_name}.tex", "r", encoding="utf-8") as f:
+        content = f.read()
+    with open(f"{file_name}.tex", "w", encoding="utf-8") as f:
+        f.write(content.replace("\\printglossary", "\\gls{used}"))
+
+    glossary.prune_glossary(file_name, config_dict)
+
+    assert len(os.listdir(os.path.join(".pipetex", "cache", "glossary"))) == 1
+
+
+def test_prune_glossary_addAll(glossary_testfile, config_dict):
+    """Tests that a document using all entries is left as it is."""
+    file_name = glossary_testfile
+    with open(f"{file_name}.tex", "a", encoding="utf-8") as f:
+        f.write("\\glsaddall\n")
+
+    success, error = glossary.prune_glossary(file_name, config_dict)
+
+    with open(f"{file_name}.tex", "r", encoding="utf-8") as f:
+        content = f.read()
+
+    assert success
+    assert not error
+    assert "\\usepackage{glossary_folder/glossary}" in content
+
+
+def test_prune_glossary_fileNotFound(config_dict):
+    """Tests that a missing tex file is reported."""
+    success, error = glossary.prune_glossary("not_a_file", config_dict)
+
+    assert not success
+    assert error.severity_level > 20
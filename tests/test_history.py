@@ -0,0 +1,60 @@
+""" Test the database of past builds.
+
+@author Max Weise
+created 19.10.2026
+"""
+
+from src.pipetex import history
+
+import pytest
+
+
+# === Fixtures ===
+@pytest.fixture
+def history_db(tmp_path):
+    """Path of an empty history database."""
+    return str(tmp_path / "history.sqlite")
+
+
+# === Test Functions ===
+def test_predict(history_db):
+    """Tests that the last runs of a document are averaged."""
+    history.record_run("long_file", [("compile", 10.0, True, 100),
+                                     ("compile #2", 10.0, True, 300)],
+                       history_db)
+    history.record_run("long_file", [("compile", 20.0, True, 200),
+                                     ("compile #2", 20.0, True, 200)],
+                       history_db)
+
+    prediction = history.predict(["long_file"], history_db)["long_file"]
+
+    assert prediction.known
+    assert prediction.duration == 30.0
+    assert prediction.peak_rss == 300
+
+
+def test_predict_lastRunsOnly(history_db, mocker):
+    """Tests that only the most recent runs are used."""
+    mocker.patch.object(history, "PREDICTION_RUNS", 1)
+    for duration in [100.0, 1.0]:
+        history.record_run("test_file", [("compile", duration, True, None)],
+                           history_db)
+
+    prediction = history.predict(["test_file"], history_db)["test_file"]
+
+    assert prediction.duration == 1.0
+    assert prediction.peak_rss == 0
+
+
+def test_predict_unknownDocument(history_db):
+    """Tests that unknown documents are guessed from the known ones."""
+    history.record_run("small_file", [("compile", 2.0, True, 100)],
+                       history_db)
+    history.record_run("large_file", [("compile", 4.0, True, 500)],
+                       history_db)
+
+    prediction = history.predict(["new_file"], history_db)["new_file"]
+
+    assert not prediction.known
+    assert prediction.duration == 3.0
+    assert prediction.peak_rss == 500
@@ -0,0 +1,144 @@
+""" Test the project manifest and the incremental build of its targets.
+
+@author Max Weise
+created 19.10.2026
+"""
+
+from src.pipetex import manifest
+
+from concurrent.futures import ThreadPoolExecutor
+
+import os
+import pytest
+
+
+# === Fixtures ===
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    """A project with two documents declared in its pyproject.toml."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("PIPETEX_HISTORY_DB",
+                       str(tmp_path / ".pipetex" / "history.sqlite"))
+    os.makedirs("docs")
+
+    for name in ["report", "slides"]:
+        with open(os.path.join("docs", f"{name}.tex"), "w",
+                  encoding="utf-8") as tex_file:
+            tex_file.write("\\documentclass{article}\n"
+                           "\\begin{document}\nTarget\n\\end{document}\n")
+
+    with open("pyproject.toml", "w", encoding="utf-8") as toml_file:
+        toml_file.write(
+            "[tool.pipetex.options]\nverbose = true\n\n"
+            "[tool.pipetex.targets.report]\n"
+            "file = \"docs/report.tex\"\ncreate_glo = true\n"
+            "needs = [\"slides\"]\n\n"
+            "[tool.pipetex.targets.slides]\nfile = \"docs/slides\"\n"
+        )
+
+    return tmp_path
+
+
+def _write_manifest(content: str) -> str:
+    """Writes a pipetex.toml into the working directory."""
+    with open("pipetex.toml", "w", encoding="utf-8") as toml_file:
+        toml_file.write(content)
+
+    return "pipetex.toml"
+
+
+# === Test Functions ===
+def test_load_manifest(project):
+    """Tests that the targets are read from the tool.pipetex table."""
+    path = manifest.find_manifest()
+    targets = {t.name: t for t in manifest.load_manifest(path)}
+
+    assert path == os.path.join(".", "pyproject.toml")
+    assert targets["report"].file_name == str(project / "docs" / "report")
+    assert targets["report"].options == {"verbose": True, "create_glo": True}
+    assert targets["report"].needs == ["slides"]
+    assert targets["slides"].file_name == str(project / "docs" / "slides")
+    assert [[t.name for t in stage]
+            for stage in manifest.build_order(list(targets.values()))] == [
+        ["slides"], ["report"]
+    ]
+
+
+def test_load_manifest_E_invalid(project):
+    """Tests that unknown options, targets and cycles are rejected."""
+    with pytest.raises(ValueError, match="no_such_option"):
+        manifest.load_manifest(_write_manifest(
+            "[targets.a]\nfile = \"docs/report.tex\"\nno_such_option = 1\n"
+        ))
+
+    with pytest.raises(ValueError, match="unknown targets"):
+        manifest.load_manifest(_write_manifest(
+            "[targets.a]\nfile = \"docs/report.tex\"\nneeds = [\"b\"]\n"
+        ))
+
+    with pytest.raises(ValueError, match="need each other"):
+        manifest.load_manifest(_write_manifest(
+            "[targets.a]\nfile = \"docs/report.tex\"\nneeds = [\"b\"]\n"
+            "[targets.b]\nfile = \"docs/slides.tex\"\nneeds = [\"a\"]\n"
+        ))
+
+    with pytest.raises(ValueError, match="does not exist"):
+        manifest.load_manifest(_write_manifest(
+            "[targets.a]\nfile = \"docs/missing.tex\"\n"
+        ))
+
+
+def test_select_targets(project):
+    """Tests that a selected target brings the targets it needs."""
+    targets = manifest.load_manifest("pyproject.toml")
+
+    assert [t.name for t in manifest.select_targets(targets, ["slides"])] == [
+        "slides"
+    ]
+    assert len(manifest.select_targets(targets, ["report"])) == 2
+
+    with pytest.raises(ValueError):
+        manifest.select_targets(targets, ["poster"])
+
+
+def test_build(project, mocker):
+    """Tests that only stale targets and their dependents are rebuilt."""
+    targets = manifest.load_manifest("pyproject.toml")
+    batches = []
+
+    def run_batch(documents, options, **kwargs):
+        batches.append(kwargs["document_options"])
+        return {document: (True, None) for document in documents}
+
+    stale = {"slides": None, "report": "compile: the stage never ran"}
+    mocker.patch.object(manifest, "stale_reason",
+                        side_effect=lambda target: stale[target.name])
+    mocker.patch.object(manifest.batch, "run_batch", side_effect=run_batch)
+
+    results = manifest.build(targets, executor_factory=ThreadPoolExecutor)
+
+    assert results == {"slides": None, "report": (True, None)}
+    assert batches == [{str(project / "docs" / "report"): {
+        "verbose": True, "create_glo": True
+    }}]
+
+    stale["report"] = None
+    batches.clear()
+    mocker.patch.object(manifest.batch, "run_batch", side_effect=lambda
+                        documents, options, **kwargs: {
+                            document: (False, None) for document in documents
+                        })
+
+    results = manifest.build(targets, force=True)
+
+    assert not results["slides"][0]
+    assert not results["report"][0]
+    assert "slides" in results["report"][1].message
+
+
+def test_stale_reason(project):
+    """Tests that a target which never ran has to be built."""
+    target = manifest.Target("slides", str(project / "docs" / "slides"), {})
+
+    assert manifest.stale_reason(target)
+    assert os.getcwd() == str(project)
@@ -0,0 +1,142 @@
+""" Test the recording and the exposition of the metrics.
+
+@author Max Weise
+created 19.10.2026
+"""
+
+from src.pipetex import metrics
+from src.pipetex.enums import SeverityLevels
+from src.pipetex.exceptions import InternalException
+
+import os
+import stat
+import urllib.request
+
+
+# === Helper ===
+def _publish_run(bus, error=None):
+    """Publishes the events of a run with one compilation."""
+    events = metrics.events
+    bus.publish(events.StageStarted("copy", 0, 2))
+    bus.publish(events.StageFinished("copy", 0.05, True, None))
+    bus.publish(events.StageStarted("compile", 1, 2))
+    bus.publish(events.EnginePass("compile", "pdflatex", 1, 2.0, 0))
+    bus.publish(events.CacheLookup("figures", "key", True))
+    bus.publish(events.CacheLookup("figures", "key", False))
+    bus.publish(events.CacheLookup("figures", "key", True))
+    bus.publish(events.StageFinished("compile", 2.0, not error, error))
+    bus.publish(events.PipelineFinished(not error, error, 2.05))
+
+
+# === Test Functions ===
+def test_observe():
+    """Tests that the events of a run are recorded."""
+    registry = metrics.Metrics()
+    bus = metrics.events.EventBus()
+    in_flight = []
+    bus.subscribe(lambda event: in_flight.append(registry.in_flight))
+    stop = registry.observe(bus)
+
+    _publish_run(bus)
+    _publish_run(bus, InternalException("failed", SeverityLevels.CRITICAL))
+    stop()
+    _publish_run(bus)
+
+    assert max(in_flight) == 1
+    assert registry.in_flight == 0
+    assert registry.builds == {
+        (("outcome", "success"), ("severity", "none")): 1,
+        (("outcome", "failure"), ("severity", "critical")): 1,
+    }
+    assert registry.stage_durations["compile"].counts[4] == 2
+    assert registry.engine_passes == {
+        (("stage", "compile"), ("program", "pdflatex")): 2
+    }
+    assert registry.cache_lookups == {"figures": [4, 2]}
+
+
+def test_observe_runAborted():
+    """Tests that a run which raised is no longer counted as in flight."""
+    registry = metrics.Metrics()
+    bus = metrics.events.EventBus()
+    stop = registry.observe(bus)
+
+    bus.publish(metrics.events.StageStarted("copy", 0, 2))
+    assert registry.in_flight == 1
+
+    stop()
+
+    assert registry.in_flight == 0
+    assert registry.builds == {}
+
+
+def test_render():
+    """Tests the Prometheus text and the OpenMetrics format."""
+    registry = metrics.Metrics(buckets=(1.0, 5.0))
+    bus = metrics.events.EventBus()
+    registry.observe(bus)
+    _publish_run(bus)
+    registry.set_queue_depth(3)
+
+    text = registry.render().splitlines()
+    openmetrics = registry.render(openmetrics=True).splitlines()
+
+    assert "# TYPE pipetex_builds_total counter" in text
+    assert ('pipetex_builds_total{outcome="success",severity="none"} 1.0'
+            in text)
+    assert ('pipetex_stage_duration_seconds_bucket{stage="compile",le="5.0"}'
+            ' 1.0') in text
+    assert ('pipetex_stage_duration_seconds_bucket{stage="compile",le="+Inf"}'
+            ' 1.0') in text
+    assert 'pipetex_stage_duration_seconds_sum{stage="copy"} 0.05' in text
+    assert 'pipetex_cache_hit_ratio{stage="figures"} 0.6666666666666666' in (
+        text
+    )
+    assert "pipetex_queue_depth 3.0" in text
+    assert text[-1] != "# EOF"
+
+    assert "# TYPE pipetex_builds counter" in openmetrics
+    assert openmetrics[-1] == "# EOF"
+
+
+def test_exporter(tmp_path):
+    """Tests that the metrics are served over HTTP and written to a file."""
+    registry = metrics.Metrics()
+    registry.build_started()
+    path = tmp_path / "textfile" / "pipetex.prom"
+
+    stop = metrics.start_exporter(registry, path=str(path))
+    assert "pipetex_builds_in_flight 1.0" in path.read_text()
+
+    registry.build_finished(True, None)
+    stop()
+    assert "pipetex_builds_in_flight 0.0" in path.read_text()
+    assert [p.name for p in path.parent.iterdir()] == ["pipetex.prom"]
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o644
+
+    http_server = metrics.serve_http(registry, 0, "127.0.0.1")
+    try:
+        url = f"http://127.0.0.1:{http_server.server_address[1]}/metrics"
+        request = urllib.request.Request(
+            url, headers={"Accept": "application/openmetrics-text"}
+        )
+        with urllib.request.urlopen(request, timeout=5) as response:
+            body = response.read().decode("utf-8")
+            content_type = response.headers["Content-Type"]
+    finally:
+        http_server.shutdown()
+        http_server.server_close()
+
+    assert content_type == metrics.OPENMETRICS_TYPE
+    assert 'pipetex_builds_total{outcome="success",severity="none"}' in body
+    assert body.endswith("# EOF\n")
+
+
+def test_serve_http_localOnly():
+    """Tests that the endpoint only listens on the loopback interface."""
+    http_server = metrics.serve_http(metrics.Metrics(), 0)
+    try:
+        assert http_server.server_address[0] == "127.0.0.1"
+    finally:
+        http_server.shutdown()
+        http_server.server_close()
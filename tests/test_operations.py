@@ -58,6 +58,25 @@ def simple_testfile_no_draft():
     util_functions.remove_files(file_name)
 
 
+@pytest.fixture
+def testfile_with_parts():
+    """Generates a tex file which includes two parts of a document."""
+    file_name = "test_file"
+    with open(f"{file_name}.tex", "w+", encoding="utf-8") as f:
+        f.write(
+            "\\documentclass[a4paper, 12pt]{article}\n"
+            "\\begin{document}\n"
+            "\\include{test_file_intro}\n"
+            "\\include{test_file_chapter}\n"
+            "% \\include{test_file_disabled}\n"
+            "\\end{document}\n"
+        )
+
+    yield file_name
+
+    util_functions.remove_files(file_name)
+
+
 @pytest.fixture
 def dirty_working_dir():
     """Create some auxiliary files to 'pollute' the working dir."""
@@ -250,3 +269,83 @@ def test_clean_working_dir_PdfFileNotFound(dirty_working_dir, config_dict):
     assert type(error.severity_level) == int
     assert 20 < error.severity_level <= 30
 
+
+def test_set_include_only(testfile_with_parts, config_dict):
+    """Tests that the includeonly command is injected into the preamble."""
+    file_name = testfile_with_parts
+    util_functions.write_empty_file(f"{file_name}_intro", "aux")
+    config_dict["include_only"] = ["test_file_chapter"]
+
+    success, error = operations.set_include_only(file_name, config_dict)
+
+    with open(f"{file_name}.tex", "r") as f:
+        lines_in_testfile: list[str] = [line.rstrip() for line in f]
+
+    assert success
+    assert not error
+    assert lines_in_testfile[1] == "\\includeonly{test_file_chapter}"
+    assert lines_in_testfile[2] == "\\begin{document}"
+
+
+def test_set_include_only_missingAux(testfile_with_parts, config_dict):
+    """Tests that missing .aux files of skipped parts are reported."""
+    file_name = testfile_with_parts
+    config_dict["include_only"] = ["test_file_chapter.tex"]
+
+    success, error = operations.set_include_only(file_name, config_dict)
+
+    with open(f"{file_name}.tex", "r") as f:
+        content = f.read()
+
+    assert not success
+    assert error
+    assert error.severity_level <= 10
+    assert "\\includeonly{test_file_chapter}" in content
+
+
+def test_set_include_only_partNotIncluded(testfile_with_parts, config_dict):
+    """Tests that selecting a part which is not included is critical."""
+    file_name = testfile_with_parts
+    config_dict["include_only"] = ["test_file_disabled"]
+
+    success, error = operations.set_include_only(file_name, config_dict)
+
+    with open(f"{file_name}.tex", "r") as f:
+        content = f.read()
+
+    assert not success
+    assert error
+    assert 20 < error.severity_level <= 30
+    assert "\\includeonly" not in content
+
+
+def test_set_include_only_noPartsSelected(testfile_with_parts, config_dict):
+    """Tests that the file is left untouched if no part is selected."""
+    file_name = testfile_with_parts
+
+    success, error = operations.set_include_only(file_name, config_dict)
+
+    with open(f"{file_name}.tex", "r") as f:
+        content = f.read()
+
+    assert success
+    assert not error
+    assert "\\includeonly" not in content
+
+
+def test_clean_working_dir_contentHash(dirty_working_dir, config_dict):
+    """Tests that reproducible PDFs are named by the hash of their content."""
+    with open(f"{dirty_working_dir}.pdf", "w", encoding="utf-8") as f:
+        f.write("%PDF-1.5")
+
+    config_dict["source_date_epoch"] = 0
+    success, error = operations.clean_working_dir(
+        dirty_working_dir,
+        config_dict
+    )
+
+    assert success
+    assert not error
+    assert os.listdir("./DEPLOY") == [
+        f"f6c21611a855ce11_{dirty_working_dir}.pdf"
+    ]
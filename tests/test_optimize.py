@@ -0,0 +1,122 @@
+""" Test the post-processing of the compiled PDF.
+
+@author Max Weise
+created 19.10.2026
+"""
+
+from src.pipetex import optimize
+
+import os
+import pytest
+import sys
+
+
+# === Fixtures ===
+@pytest.fixture
+def compiled_pdf(tmp_path, monkeypatch):
+    """A compiled build copy in an empty folder."""
+    monkeypatch.chdir(tmp_path)
+    with open("[piped]_test_file.pdf", "w", encoding="utf-8") as pdf_file:
+        pdf_file.write("%PDF-1.5 compiled")
+
+    return "[piped]_test_file"
+
+
+def _fake_qpdf(argument_list, config_dict, stage, **kwargs):
+    with open(argument_list[-1], "w", encoding="utf-8") as target:
+        target.write("%PDF-1.5 optimized")
+
+    return True, None
+
+
+# === Test Functions ===
+def test_optimize_pdf_qpdf(compiled_pdf, mocker):
+    """Tests that qpdf is used without pikepdf and its result is cached."""
+    mocker.patch.object(optimize, "_HAS_PIKEPDF", False)
+    run_engine = mocker.patch.object(optimize.engine, "run_engine",
+                                     side_effect=_fake_qpdf)
+
+    first_result = optimize.optimize_pdf(compiled_pdf, {})
+    with open(f"{compiled_pdf}.pdf", "w", encoding="utf-8") as pdf_file:
+        pdf_file.write("%PDF-1.5 compiled")
+    second_result = optimize.optimize_pdf(compiled_pdf, {})
+
+    assert first_result == (True, None)
+    assert second_result == (True, None)
+    assert run_engine.call_count == 1
+    assert run_engine.call_args.args[0][0] == "qpdf"
+    assert open(f"{compiled_pdf}.pdf").read() == "%PDF-1.5 optimized"
+    assert sorted(os.listdir()) == [".pipetex", f"{compiled_pdf}.pdf"]
+
+
+def test_optimize_pdf_E_noTool(compiled_pdf, mocker):
+    """Tests that the PDF is kept if no tool is installed."""
+    mocker.patch.object(optimize, "_HAS_PIKEPDF", False)
+    mocker.patch.object(
+        optimize.engine, "run_engine",
+        return_value=(False, optimize.exceptions.InternalException(
+            "The program qpdf is not installed", optimize.SeverityLevels.LOW
+        ))
+    )
+
+    success, error = optimize.optimize_pdf(compiled_pdf, {})
+
+    assert not success
+    assert error.severity_level == 10
+    assert open(f"{compiled_pdf}.pdf").read() == "%PDF-1.5 compiled"
+
+
+@pytest.mark.parametrize("exit_code, optimized", [(3, True), (2, False)])
+def test_optimize_pdf_qpdfExitCode(compiled_pdf, mocker, exit_code, optimized):
+    """Tests that qpdf warnings are accepted and its errors are minor."""
+    mocker.patch.object(optimize, "_HAS_PIKEPDF", False)
+    run_engine = optimize.engine.run_engine
+
+    def _failing_qpdf(argument_list, *args, **kwargs):
+        program = (f"open({argument_list[-1]!r}, 'w').write('%PDF partial'); "
+                   f"exit({exit_code})")
+        return run_engine([sys.executable, "-c", program], *args, **kwargs)
+
+    mocker.patch.object(optimize.engine, "run_engine",
+                        side_effect=_failing_qpdf)
+
+    success, error = optimize.optimize_pdf(compiled_pdf, {})
+
+    assert success == optimized
+    if not optimized:
+        assert error.severity_level == 10
+        assert "exit code 2" in error.message
+        assert open(f"{compiled_pdf}.pdf").read() == "%PDF-1.5 compiled"
+        assert sorted(os.listdir()) == [f"{compiled_pdf}.pdf"]
+
+
+def test_optimize_pdf_E_missingPdf(tmp_path, monkeypatch):
+    """Tests that a missing PDF is reported as a minor issue."""
+    monkeypatch.chdir(tmp_path)
+
+    success, error = optimize.optimize_pdf("[piped]_test_file", {})
+
+    assert not success
+    assert error.severity_level == 10
+
+
+def test_deduplicate_streams():
+    """Tests that identical images are stored once."""
+    pikepdf = pytest.importorskip("pikepdf")
+    pdf = pikepdf.new()
+    for _ in range(2):
+        pdf.add_blank_page()
+        image = pikepdf.Stream(pdf, b"\xff" * 3)
+        image.Type = pikepdf.Name.XObject
+        image.Subtype = pikepdf.Name.Image
+        image.Width, image.Height, image.BitsPerComponent = 1, 1, 8
+        image.ColorSpace = pikepdf.Name.DeviceRGB
+        pdf.pages[-1].Resources = pikepdf.Dictionary(
+            XObject=pikepdf.Dictionary(Im0=pdf.make_indirect(image))
+        )
+
+    replaced = optimize.deduplicate_streams(pdf)
+
+    images = [page.Resources.XObject.Im0 for page in pdf.pages]
+    assert replaced == 1
+    assert images[0].objgen == images[1].objgen
@@ -4,6 +4,7 @@
 created 29.07.2022
 """
 
+from src.pipetex import engine
 from src.pipetex.pipeline import Pipeline
 from tests import util_functions
 
@@ -107,6 +108,16 @@ def test_pipeline_init():
     assert len(underTest.order_of_operations) == 6
 
 
+def test_pipeline_init_includeOnly():
+    """Tests that the includeonly operation is only added when needed."""
+    file_name = "test_file_for_init"
+
+    underTest = Pipeline(file_name, include_only=["chapter"])
+
+    assert len(underTest.order_of_operations) == 6
+    assert underTest.config_dict["include_only"] == ["chapter"]
+
+
 def test_execution(simple_test_environment, config_dict):
     """Tests the correct execution of the pipeline."""
     file_name = simple_test_environment
@@ -184,3 +195,56 @@ def test_execution_E_critical_severityLevel():
     assert error
     assert 20 < error.severity_level <= 30
 
+
+@pytest.mark.skipif(not shutil.which("pdflatex"), reason="needs pdflatex")
+def test_execution_reproducible(tmp_path, monkeypatch):
+    """Tests that two checkouts of the same sources are byte-identical."""
+    monkeypatch.setenv("SOURCE_DATE_EPOCH", "1700000000")
+
+    builds = []
+    for checkout, mtime in [("first", 1600000000), ("second", 1650000000)]:
+        (tmp_path / checkout).mkdir()
+        monkeypatch.chdir(tmp_path / checkout)
+        with open("test_file.tex", "w", encoding="utf-8") as f:
+            f.write(
+                "\\documentclass{article}\n"
+                "\\begin{document}\n"
+                "Built on \\today.\n"
+                "\\end{document}\n"
+            )
+        os.utime("test_file.tex", (mtime, mtime))
+
+        underTest = Pipeline("test_file", reproducible=True)
+        underTest.execute("test_file")
+
+        names = os.listdir("DEPLOY")
+        with open(os.path.join("DEPLOY", names[0]), "rb") as pdf_file:
+            builds.append((names, pdf_file.read()))
+
+    assert builds[0] == builds[1]
+    assert b"D:20231114" in builds[0][1]
+
+
+def test_pipeline_reproducibleCheckouts(tmp_path, monkeypatch):
+    """Tests that the date of a build does not depend on the checkout."""
+    monkeypatch.setenv("SOURCE_DATE_EPOCH", "1700000000")
+
+    environments = []
+    for checkout, mtime in [("first", 1600000000), ("second", 1650000000)]:
+        (tmp_path / checkout).mkdir()
+        (tmp_path / checkout / "test_file.tex").write_text("")
+        os.utime(tmp_path / checkout / "test_file.tex", (mtime, mtime))
+
+        underTest = Pipeline("test_file", reproducible=True,
+                             work_dir=str(tmp_path / checkout))
+        environments.append(
+            engine.reproducible_environment(underTest.config_dict)
+        )
+
+    assert environments[0] == environments[1] == {
+        "SOURCE_DATE_EPOCH": "1700000000", "FORCE_SOURCE_DATE": "1"
+    }
+
+    monkeypatch.delenv("SOURCE_DATE_EPOCH")
+    with pytest.raises(ValueError):
+        Pipeline("test_file", reproducible=True)
@@ -0,0 +1,124 @@
+""" Test the dry run of the pipeline.
+
+@author Max Weise
+created 19.10.2026
+"""
+
+from src.pipetex import pipeline
+from src.pipetex import planner
+
+import os
+import pytest
+import shutil
+
+
+# === Fixtures ===
+@pytest.fixture
+def planned_testfile():
+    """Generates a tex file which loads a part and a .bib file."""
+    file_name = "test_file"
+    with open(f"{file_name}.tex", "w+", encoding="utf-8") as f:
+        f.write(
+            "\\documentclass[a4paper]{article}\n"
+            "\\addbibresource{test_file_sources.bib}\n"
+            "\\begin{document}\n"
+            "\\input{test_file_part}\n"
+            "% \\input{test_file_commented}\n"
+            "\\end{document}\n"
+        )
+
+    for name in ["test_file_part.tex", "test_file_sources.bib"]:
+        with open(name, "w+", encoding="utf-8") as f:
+            f.write("content")
+
+    yield file_name
+
+    for name in [f"{file_name}.tex", "test_file_part.tex",
+                 "test_file_sources.bib"]:
+        os.remove(name)
+
+    if ".pipetex" in os.listdir():
+        shutil.rmtree(".pipetex")
+
+
+@pytest.fixture
+def recorded_pipeline(planned_testfile, mocker):
+    """A pipeline with a recorded successful run."""
+    mocker.patch.object(planner.shutil, "which", return_value="/bin/tool")
+    underTest = pipeline.Pipeline(planned_testfile, create_bib=True)
+    stages = planner.stage_labels(underTest.order_of_operations)
+
+    planner.record_run(planned_testfile, underTest.config_dict,
+                       planner.project_inputs(planned_testfile),
+                       [(stage, 2.0, True, None) for stage in stages])
+
+    return underTest
+
+
+# === Test Functions ===
+def test_project_inputs(planned_testfile):
+    """Tests that loaded files are found and commented ones ignored."""
+    inputs = planner.project_inputs(planned_testfile)
+
+    assert set(inputs["tex"]) == {"test_file.tex", "test_file_part.tex"}
+    assert set(inputs["bib"]) == {"test_file_sources.bib"}
+
+
+def test_stage_labels():
+    """Tests that repeated operations are numbered."""
+    underTest = pipeline.Pipeline("test_file")
+
+    labels = planner.stage_labels(underTest.order_of_operations)
+
+    assert labels == ["copy", "remove_draft", "compile", "compile #2",
+                      "clean"]
+
+
+def test_plan_upToDate(recorded_pipeline):
+    """Tests that nothing runs if no input changed."""
+    plans = recorded_pipeline.plan()
+
+    assert [p.status for p in plans] == ["skip"] * 6
+    assert plans[2].estimate == 2.0
+
+
+def test_plan_changedInput(recorded_pipeline):
+    """Tests that a changed input is reported as reason."""
+    with open("test_file_sources.bib", "a", encoding="utf-8") as f:
+        f.write("more content")
+
+    plans = {p.stage: p for p in recorded_pipeline.plan()}
+
+    assert plans["bibliography"].status == "run"
+    assert plans["bibliography"].reason == "test_file_sources.bib changed"
+    assert plans["compile"].status == "run"
+
+
+def test_plan_changedOptions(recorded_pipeline):
+    """Tests that changed options cause all stages to run."""
+    recorded_pipeline.config_dict["bib_backend"] = "bibtex"
+
+    plans = recorded_pipeline.plan()
+
+    assert {p.reason for p in plans} == {"the options changed"}
+
+
+def test_plan_volatileOptions(recorded_pipeline):
+    """Tests that options which only change how a build runs are ignored."""
+    recorded_pipeline.config_dict["verbose"] = True
+    recorded_pipeline.config_dict["jobs"] = 4
+    recorded_pipeline.config_dict["timeouts"] = {"compile": 10}
+
+    plans = recorded_pipeline.plan()
+
+    assert {p.status for p in plans} == {"skip"}
+
+
+def test_plan_blocked(recorded_pipeline, mocker):
+    """Tests that stages after a missing engine are blocked."""
+    mocker.patch.object(planner.shutil, "which", return_value=None)
+
+    plans = recorded_pipeline.plan()
+
+    assert [p.status for p in plans][2:] == ["blocked"] * 4
+    assert plans[2].reason == "pdflatex is not installed"
@@ -0,0 +1,164 @@
+""" Test the checks which run before any engine.
+
+@author Max Weise
+created 19.10.2026
+"""
+
+from src.pipetex import preflight
+from src.pipetex.enums import SeverityLevels
+from src.pipetex.pipeline import Pipeline
+
+import pytest
+
+
+_FOUND_BY_KPSEWHICH = preflight._found_by_kpsewhich
+
+
+# === Fixtures ===
+@pytest.fixture
+def document(tmp_path, monkeypatch, mocker):
+    """A document with a chapter, a figure and a bibliography."""
+    monkeypatch.chdir(tmp_path)
+    mocker.patch.object(preflight, "_found_by_kpsewhich",
+                        lambda names: {"amsmath.sty"} & set(names))
+    mocker.patch("shutil.which", side_effect=lambda name: (
+        "/usr/bin/kpsewhich" if name == "kpsewhich" else None
+    ))
+
+    (tmp_path / "figures").mkdir()
+    (tmp_path / "figures" / "plot.png").write_bytes(b"")
+    (tmp_path / "sources.bib").write_text("")
+    (tmp_path / "chapter.tex").write_text(
+        "\\section{Results}\n"
+        "\\begin{figure}\n"
+        "    \\includegraphics[width=5cm]{plot}\n"
+        "\\end{figure}\n"
+    )
+    (tmp_path / "document.tex").write_text(
+        "\\documentclass{article}\n"
+        "\\usepackage{amsmath}\n"
+        "\\graphicspath{{figures/}}\n"
+        "\\newcommand{\\quote}{\\begin{quote}}\n"
+        "\\addbibresource{sources.bib}\n"
+        "\\begin{document}\n"
+        "\\input{chapter}\n"
+        "% \\input{outline}\n"
+        "\\begin{verbatim}\n"
+        "\\end{itemize} \\input{missing}\n"
+        "\\end{verbatim}\n"
+        "\\end{document}\n"
+    )
+
+    return tmp_path
+
+
+# === Test Functions ===
+def test_preflight(document):
+    """Tests that a document without problems passes."""
+    assert preflight.preflight("document", {}) == (True, None)
+
+
+def test_preflight_missingFiles(document):
+    """Tests that files which do not exist are reported with their line."""
+    (document / "chapter.tex").write_text(
+        "\\includegraphics{chart}\n"
+        "\\bibliography{references}\n"
+        "\\usepackage{unknown}\n"
+    )
+
+    rv, ex = preflight.preflight("document", {})
+
+    assert not rv
+    assert ex.severity_level == SeverityLevels.CRITICAL
+    assert "chart at chapter.tex:1 does not exist" in ex.message
+    assert "references.bib at chapter.tex:2 does not exist" in ex.message
+    assert "unknown.sty at chapter.tex:3 does not exist" in ex.message
+
+
+def test_preflight_environments(document):
+    """Tests that unbalanced environments of the body are reported."""
+    (document / "chapter.tex").write_text(
+        "\\begin{itemize}\n"
+        "\\begin{enumerate}\n"
+        "\\end{itemize}\n"
+        "\\end{center}\n"
+        "\\begin{table}\n"
+    )
+
+    findings = preflight.check_document("document", [])
+
+    assert findings == [
+        "\\end{itemize} at chapter.tex:3 closes \\begin{enumerate} from "
+        "chapter.tex:2",
+        "\\end{center} at chapter.tex:4 closes \\begin{itemize} from "
+        "chapter.tex:1",
+        "\\begin{table} at chapter.tex:5 is never closed",
+    ]
+
+
+def test_preflight_programs(document, mocker):
+    """Tests that programs needed by the stages are checked."""
+    mocker.patch("shutil.which", return_value=None)
+
+    findings = preflight.check_document("document", ["copy", "compile"])
+
+    assert findings == ["pdflatex is not installed"]
+
+
+def test_pipeline_preflight():
+    """Tests that the preflight runs before any other operation."""
+    underTest = Pipeline("test_file", preflight=True)
+
+    assert [op.name for op in underTest.order_of_operations][:2] == [
+        "preflight", "copy"
+    ]
+    assert underTest.config_dict["operations"][0] == "preflight"
+
+
+def test_preflight_macroArguments(document):
+    """Tests that file names only known to TeX are not checked."""
+    (document / "chapter.tex").write_text(
+        "\\newcommand{\\fig}[1]{\\includegraphics{#1}}\n"
+        "\\newcommand{\\figdir}{figures}\n"
+        "\\input{\\figdir/part}\n"
+        "\\includegraphics{\\figdir/plot}\n"
+    )
+
+    assert preflight.check_document("document", []) == []
+
+
+def test_preflight_noKpsewhich(document, mocker):
+    """Tests that files of the distribution are not checked without it."""
+    mocker.patch.object(preflight, "_found_by_kpsewhich", _FOUND_BY_KPSEWHICH)
+    mocker.patch("shutil.which", return_value=None)
+    (document / "chapter.tex").write_text("\\usepackage{unknown}\n")
+
+    rv, ex = preflight.preflight("document", {})
+
+    assert not rv
+    assert ex.severity_level == SeverityLevels.LOW
+    assert "kpsewhich" in ex.message
+
+
+def test_preflight_miktex(document, mocker):
+    """Tests that MiKTeX may install packages when they are used."""
+    mocker.patch.object(preflight, "_found_by_kpsewhich", _FOUND_BY_KPSEWHICH)
+    mocker.patch("shutil.which", side_effect=lambda name: f"/bin/{name}")
+    mocker.patch("subprocess.run").return_value.stdout = ""
+    (document / "chapter.tex").write_text(
+        "\\usepackage{ondemand}\n"
+        "\\input{missing}\n"
+    )
+
+    assert preflight.check_document("document", []) == [
+        "missing.tex at chapter.tex:2 does not exist"
+    ]
+
+
+def test_preflight_remoteResource(document):
+    """Tests that resources given by a URL are not looked up."""
+    (document / "chapter.tex").write_text(
+        "\\addbibresource[location=remote]{https://example.org/refs.bib}\n"
+    )
+
+    assert preflight.check_document("document", []) == []
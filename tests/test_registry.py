@@ -0,0 +1,124 @@
+""" Test the registry of pipeline operations.
+
+@author Max Weise
+created 19.10.2026
+"""
+
+from src.pipetex import pipeline
+from src.pipetex import registry
+
+import pytest
+import sys
+
+
+# === Fixtures ===
+@pytest.fixture
+def plugin_operation():
+    """Registers an operation which is not imported yet."""
+    # The pipeline uses the registry of the installed package
+    operation = pipeline.registry.register(
+        "test_stage", "tests.test_registry:_plugin_stage", phase="finish"
+    )
+
+    yield operation
+
+    del pipeline.registry.REGISTRY["test_stage"]
+
+
+def _plugin_stage(file_name, config_dict):
+    config_dict["test_stage"] = file_name
+    return True, None
+
+
+# === Test Functions ===
+def test_operation_lazyImport():
+    """Tests that the module of an operation is imported when it is called."""
+    sys.modules.pop("json.tool", None)
+    operation = registry.Operation("lazy", "json.tool:main")
+
+    assert "json.tool" not in sys.modules
+    assert callable(operation.load())
+    assert "json.tool" in sys.modules
+
+
+def test_operation_call(plugin_operation):
+    """Tests that an operation is called like the function it refers to."""
+    config_dict = {}
+
+    success, error = plugin_operation("test_file", config_dict)
+
+    assert success
+    assert not error
+    assert config_dict["test_stage"] == "test_file"
+
+
+def test_operation_unknownPhase():
+    """Tests that an operation must belong to a known phase."""
+    with pytest.raises(ValueError):
+        registry.Operation("broken", "json:dumps", phase="never")
+
+
+def test_get_unknownOperation(mocker):
+    """Tests that an unknown name is reported."""
+    mocker.patch("importlib.metadata.entry_points", return_value=[])
+    mocker.patch.object(registry, "_entry_points_loaded", False)
+
+    with pytest.raises(KeyError):
+        registry.get("not_an_operation")
+
+
+def test_load_entry_points(mocker):
+    """Tests that operations of installed plugins are registered."""
+    entry_point = mocker.Mock(value="json:dumps")
+    entry_point.name = "plugin_stage"
+    mocker.patch("importlib.metadata.entry_points",
+                 return_value=[entry_point])
+    mocker.patch.object(registry, "_entry_points_loaded", False)
+    mocker.patch.dict(registry.REGISTRY)
+    mocker.patch.dict(registry._PLUGINS)
+
+    operation = registry.get("plugin_stage")
+
+    assert operation.target == "json:dumps"
+
+
+def test_load_entry_points_metadata(mocker):
+    """Tests that plugins declare their metadata and are loaded lazily."""
+    entry_points = []
+    for name, loaded in [
+        ("finish_stage", {"target": "json:dumps", "phase": "finish",
+                          "outputs": [".json"], "cost": "low"}),
+        ("index_stage", registry.Operation("index_stage", "json:loads",
+                                           phase="index")),
+    ]:
+        entry_point = mocker.Mock(value=f"plugin:{name}")
+        entry_point.name = name
+        entry_point.load.return_value = loaded
+        entry_points.append(entry_point)
+
+    mocker.patch("importlib.metadata.entry_points",
+                 return_value=entry_points)
+    mocker.patch.object(registry, "_entry_points_loaded", False)
+    mocker.patch.dict(registry.REGISTRY)
+    mocker.patch.dict(registry._PLUGINS)
+
+    operation = registry.get("finish_stage")
+
+    assert operation.phase == "finish"
+    assert operation.outputs == [".json"]
+    assert operation.target == "json:dumps"
+    assert not entry_points[1].load.called
+
+    assert registry.get("index_stage").phase == "index"
+
+
+def test_pipeline_stages(plugin_operation):
+    """Tests that further stages are placed at the end of their phase."""
+    underTest = pipeline.Pipeline("test_file", create_bib=True,
+                                  stages=["test_stage", "subset_bibliography"])
+
+    names = [operation.name for operation in underTest.order_of_operations]
+
+    assert names == ["copy", "remove_draft", "compile", "bibliography",
+                     "subset_bibliography", "compile", "test_stage",
+                     "clean"]
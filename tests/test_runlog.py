@@ -0,0 +1,84 @@
+""" Test the log files of the pipeline runs.
+
+@author Max Weise
+created 19.10.2026
+"""
+
+from src.pipetex import runlog
+
+import atexit
+import logging
+import os
+import pytest
+import shutil
+import time
+
+
+# === Fixtures ===
+@pytest.fixture
+def log_folder():
+    """Generates a folder with the log files of older runs."""
+    folder = "log_folder"
+    os.mkdir(folder)
+    for index in range(5):
+        path = os.path.join(folder, f"run-{index}.log")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("x" * 100)
+
+        # Older runs have older modification times
+        os.utime(path, (time.time() - 100 + index, time.time() - 100 + index))
+
+    yield folder
+
+    shutil.rmtree(folder)
+
+
+# === Test Functions ===
+def test_apply_retention_count(log_folder):
+    """Tests that only the most recent files are kept."""
+    removed = runlog.apply_retention(log_folder, max_files=3)
+
+    assert sorted(os.listdir(log_folder)) == ["run-2.log", "run-3.log",
+                                              "run-4.log"]
+    assert len(removed) == 2
+
+
+def test_apply_retention_size(log_folder):
+    """Tests that the oldest files beyond the size limit are removed."""
+    runlog.apply_retention(log_folder, max_bytes=250)
+
+    assert sorted(os.listdir(log_folder)) == ["run-3.log", "run-4.log"]
+
+
+def test_new_log_file(log_folder, mocker):
+    """Tests that each run gets its own file starting with a header."""
+    mocker.patch.object(runlog, "MAX_LOG_FILES", 3)
+
+    path = runlog.new_log_file(log_folder)
+
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read()
+
+    assert len(os.listdir(log_folder)) == 3
+    assert content.startswith("# pipetex")
+    assert f"# pid:      {os.getpid()}" in content
+
+
+def test_start_listener(log_folder):
+    """Tests that records are written by the listener, not the caller."""
+    logger = logging.getLogger("test_runlog")
+    logger.setLevel(logging.DEBUG)
+    path = os.path.join(log_folder, "listener.log")
+    handler = logging.FileHandler(path, encoding="utf-8")
+
+    listener = runlog.start_listener(logger, handler)
+    logger.info("Compiled %s in %d passes", "test_file", 2)
+    listener.stop()
+    atexit.unregister(listener.stop)
+
+    handler.close()
+    for queue_handler in logger.handlers[:]:
+        logger.removeHandler(queue_handler)
+
+    with open(path, "r", encoding="utf-8") as f:
+        assert f.read() == "Compiled test_file in 2 passes\n"
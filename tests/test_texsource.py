@@ -0,0 +1,40 @@
+""" Test the helpers which read tex sources.
+
+@author Max Weise
+created 19.10.2026
+"""
+
+from src.pipetex import texsource
+
+
+# === Test Functions ===
+def test_is_commented():
+    """Tests that only positions after an unescaped % sign are comments."""
+    text = "50\\% done % \\input{hidden}\n\\input{shown}"
+
+    assert texsource.is_commented(text, text.index("\\input{hidden}"))
+    assert not texsource.is_commented(text, text.index("\\input{shown}"))
+    assert not texsource.is_commented(text, text.index("done"))
+
+
+def test_find_included_parts():
+    """Tests that commented out parts are not reported."""
+    lines = ["\\include{chapters/one}\n", "% \\include{chapters/two}\n",
+             "\\include{three} % \\include{four}\n"]
+
+    assert texsource.find_included_parts(lines) == ["chapters/one", "three"]
+
+
+def test_resolve_graphic(tmp_path, monkeypatch):
+    """Tests that graphics are found in the folders of graphicspath."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "figures").mkdir()
+    (tmp_path / "figures" / "plot.png").write_bytes(b"")
+
+    folders = [""] + texsource.graphicspath_folders(
+        "\\graphicspath{{images/}{figures/}}"
+    )
+
+    assert folders == ["", "images/", "figures/"]
+    assert texsource.resolve_graphic("plot", folders) == "figures/plot.png"
+    assert texsource.resolve_graphic("plot.eps", folders) is None
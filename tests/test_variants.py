@@ -0,0 +1,158 @@
+""" Test the builds of several variants of a document.
+
+@author Max Weise
+created 19.10.2026
+"""
+
+from src.pipetex import variants
+
+from concurrent.futures import ThreadPoolExecutor
+
+import os
+import pytest
+
+
+# === Fixtures ===
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    """A project folder with a tex file, restoring the environment."""
+    monkeypatch.chdir(tmp_path)
+    for variable in ["TEXINPUTS", "PIPETEX_CACHE_DIR", "PIPETEX_HISTORY_DB"]:
+        monkeypatch.setenv(variable, "")
+
+    with open("test_file.tex", "w", encoding="utf-8") as tex_file:
+        tex_file.write("\\documentclass[11pt]{article}\n"
+                       "\\begin{document}\nVariant\n\\end{document}\n")
+
+    return str(tmp_path)
+
+
+# === Test Functions ===
+def test_variant_parse():
+    """Tests that variants are read from the command line format."""
+    variant = variants.Variant.parse("print:twoside,a4paper:isprint=1")
+
+    assert variant.name == "print"
+    assert variant.class_options == ["twoside", "a4paper"]
+    assert variant.defines == {"isprint": "1"}
+    assert variants.Variant.parse("final").as_dict() == {
+        "name": "final", "class_options": [], "defines": {}
+    }
+
+    with pytest.raises(ValueError):
+        variants.Variant.parse("print::isprint")
+
+
+def test_apply_variant(project):
+    """Tests that class options and defines are added to the file."""
+    config_dict = {"variant": variants.Variant(
+        "draft", ["draft", "11pt"], {"isdraft": "1"}
+    ).as_dict()}
+
+    success, error = variants.apply_variant("test_file", config_dict)
+
+    with open("test_file.tex", "r", encoding="utf-8") as tex_file:
+        lines = tex_file.read().splitlines()
+
+    assert success
+    assert not error
+    assert lines[:2] == ["\\def\\isdraft{1}",
+                         "\\documentclass[11pt,draft]{article}"]
+
+
+def test_build_variants(project, mocker):
+    """Tests that the variants share the outputs of the index stages."""
+    with open("[piped]_test_file.bbl", "w", encoding="utf-8") as bbl_file:
+        bbl_file.write("\\begin{thebibliography}{1}")
+    mocker.patch.object(
+        variants, "_build_indexes",
+        return_value=((True, None), "[piped]_test_file",
+                      [os.path.abspath("[piped]_test_file.bbl")])
+    )
+    build_variant = mocker.patch.object(variants, "_build_variant",
+                                        return_value=(True, None, None))
+
+    results = variants.build_variants(
+        "test_file", [variants.Variant("draft"), variants.Variant("print")],
+        {"create_bib": True, "verbose": False},
+        executor_factory=ThreadPoolExecutor
+    )
+
+    assert results == {"draft": (True, None), "print": (True, None)}
+    for call in build_variant.call_args_list:
+        project_dir, file_name, options, variant, shared = call.args
+        assert options == {"verbose": False}
+        assert shared == [os.path.join(project, "[piped]_test_file.bbl")]
+    assert os.listdir() == ["test_file.tex"]
+
+
+def test_build_variants_E_indexFailed(project, mocker):
+    """Tests that no variant is built if the shared run stops."""
+    error = variants.exceptions.InternalException(
+        "No tex file", variants.SeverityLevels.CRITICAL
+    )
+    mocker.patch.object(variants, "_build_indexes",
+                        return_value=((False, error), "[piped]_test_file", []))
+    build_variant = mocker.patch.object(variants, "_build_variant")
+
+    results = variants.build_variants(
+        "test_file", [variants.Variant("draft")], {"create_glo": True},
+        executor_factory=ThreadPoolExecutor
+    )
+
+    assert results == {"draft": (False, error)}
+    assert build_variant.call_count == 0
+
+
+def test_build_variant(project, mocker):
+    """Tests that a variant is built in its own folder and published."""
+    def _execute(self, file_name):
+        os.makedirs("DEPLOY")
+        with open(os.path.join("DEPLOY", "2026_test_file.pdf"), "w") as f:
+            f.write(os.getcwd())
+        return True, None
+
+    mocker.patch.object(variants.pipeline.Pipeline, "execute", _execute)
+
+    result = variants._build_variant(project, "test_file", {},
+                                     {"name": "print"}, [])
+
+    with open(os.path.join("DEPLOY", "test_file-print.pdf")) as pdf_file:
+        build_dir = pdf_file.read()
+
+    assert result == (True, None, None)
+    assert build_dir == os.path.join(project, ".pipetex", "variants",
+                                     "print")
+    assert not os.path.isdir(build_dir)
+    assert os.environ["TEXINPUTS"].startswith(project + os.pathsep)
+
+
+def test_build_variant_includeFromSubfolder(project, mocker):
+    """Tests that the folders of included parts exist in the variant."""
+    with open("test_file.tex", "w", encoding="utf-8") as tex_file:
+        tex_file.write("\\documentclass{report}\n\\begin{document}\n"
+                       "\\include{chapters/intro}\n\\end{document}\n")
+
+    folders = []
+
+    def _execute(self, file_name):
+        folders.append(os.path.isdir("chapters"))
+        return True, None
+
+    mocker.patch.object(variants.pipeline.Pipeline, "execute", _execute)
+
+    variants._build_variant(project, "test_file", {}, {"name": "print"}, [])
+
+    assert folders == [True]
+
+
+def test_build_variant_E_executeRaises(project, mocker):
+    """Tests that the project folder is restored if the build raises."""
+    mocker.patch.object(variants.pipeline.Pipeline, "execute",
+                        side_effect=RuntimeError("engine crashed"))
+
+    with pytest.raises(RuntimeError):
+        variants._build_variant(project, "test_file", {}, {"name": "print"},
+                                [])
+
+    assert os.getcwd() == project
@@ -0,0 +1,173 @@
+""" Test the shared job queue and the build workers.
+
+@author Max Weise
+created 19.10.2026
+"""
+
+from src.pipetex import workers
+
+import os
+import pytest
+import tarfile
+import threading
+
+
+# === Fixtures ===
+@pytest.fixture
+def project(tmp_path):
+    """A project folder with a tex file and leftovers of a local build."""
+    project_dir = tmp_path / "project"
+    (project_dir / "chapters").mkdir(parents=True)
+    (project_dir / ".pipetex").mkdir()
+    (project_dir / "test_file.tex").write_text("\\input{chapters/intro}")
+    (project_dir / "chapters" / "intro.tex").write_text("Hello")
+    (project_dir / "[piped]_test_file.aux").write_text("")
+    (project_dir / ".pipetex" / "history.sqlite").write_text("")
+
+    return str(project_dir)
+
+
+@pytest.fixture
+def broker(tmp_path):
+    return workers.SQLiteBroker(str(tmp_path / "queue"))
+
+
+def _fake_execute(self, file_name):
+    """Writes the PDF file a successful build would deploy."""
+    os.makedirs("DEPLOY")
+    with open(os.path.join("DEPLOY", f"{file_name}.pdf"), "w") as pdf_file:
+        pdf_file.write(open(f"{file_name}.tex").read())
+
+    self.stage_results = [("compile", 1.0, True, 1024)]
+    return True, None
+
+
+# === Test Functions ===
+def test_snapshot_project(project, tmp_path):
+    """Tests that build products are not part of a snapshot."""
+    workers.snapshot_project(project, str(tmp_path / "snapshot.tar.gz"))
+
+    with tarfile.open(tmp_path / "snapshot.tar.gz") as archive:
+        names = archive.getnames()
+
+    assert sorted(names) == ["chapters", "chapters/intro.tex",
+                             "test_file.tex"]
+
+
+def test_execute_job(project, broker, tmp_path, mocker):
+    """Tests that a worker builds a job and pushes back the PDF file."""
+    mocker.patch.object(workers.pipeline.Pipeline, "execute", _fake_execute)
+    previous_dir = os.getcwd()
+    job_id = broker.submit(project, "test_file", {"create_bib": True})
+
+    assert broker.report(job_id) is None
+    assert workers.run_worker(broker, "test_worker", idle_timeout=0) == 1
+
+    report = broker.report(job_id)
+    artifacts = broker.fetch_artifacts(job_id, str(tmp_path / "received"))
+
+    assert os.getcwd() == previous_dir
+    assert report["success"]
+    assert report["worker"] == "test_worker"
+    assert report["stages"][0]["peak_rss"] == 1024
+    assert report["artifacts"] == ["test_file.pdf"]
+    assert open(artifacts[0]).read() == "\\input{chapters/intro}"
+
+
+def test_execute_job_error(project, broker, mocker):
+    """Tests that a failing build is reported instead of stopping."""
+    mocker.patch.object(workers.pipeline.Pipeline, "execute",
+                        side_effect=RuntimeError("broken"))
+    job_id = broker.submit(project, "test_file", {})
+
+    workers.run_worker(broker, "test_worker", max_jobs=1)
+    success, error = workers.report_to_monad(broker.report(job_id))
+
+    assert not success
+    assert error.severity_level == 30
+    assert "broken" in error.message
+
+
+def test_claim_concurrent(project, broker):
+    """Tests that every job is claimed by exactly one worker."""
+    job_ids = [broker.submit(project, "test_file", {}) for _ in range(20)]
+    claimed = []
+
+    def _claim_all(worker_id):
+        while job := broker.claim(worker_id):
+            claimed.append(job.job_id)
+
+    threads = [threading.Thread(target=_claim_all, args=(f"worker_{i}",))
+               for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(claimed) == sorted(job_ids)
+
+
+def test_claim_leaseExpired(project, tmp_path):
+    """Tests that jobs of lost workers are given to another worker."""
+    broker = workers.SQLiteBroker(str(tmp_path / "queue"), lease=-1)
+    job_id = broker.submit(project, "test_file", {})
+
+    attempts = [broker.claim("lost_worker").attempt
+                for _ in range(workers.MAX_ATTEMPTS)]
+
+    assert attempts == [1, 2, 3]
+    assert broker.claim("test_worker") is None
+    assert not broker.report(job_id)["success"]
+
+
+def test_complete_leaseLost(project, tmp_path):
+    """Tests that a worker which lost its job does not store its files."""
+    broker = workers.SQLiteBroker(str(tmp_path / "queue"), lease=-1)
+    job_id = broker.submit(project, "test_file", {})
+    lost_job = broker.claim("lost_worker")
+    broker.claim("test_worker")
+
+    broker.complete(lost_job, {"success": True},
+                    [os.path.join(project, "test_file.tex")])
+
+    assert broker.report(job_id) is None
+    assert broker.fetch_artifacts(job_id, str(tmp_path / "received")) == []
+
+
+def test_fetch_snapshot_withoutDataFilter(project, broker, tmp_path,
+                                          monkeypatch):
+    """Tests that members are checked on Python versions without filters."""
+    monkeypatch.delattr(tarfile, "data_filter", raising=False)
+    broker.submit(project, "test_file", {})
+    job = broker.claim("test_worker")
+
+    broker.fetch_snapshot(job, str(tmp_path / "work"))
+    assert (tmp_path / "work" / "chapters" / "intro.tex").is_file()
+
+    with tarfile.open(broker._snapshot_path(job.job_id), "w:gz") as archive:
+        archive.add(os.path.join(project, "test_file.tex"), "../escaped.tex")
+
+    with pytest.raises(tarfile.TarError):
+        broker.fetch_snapshot(job, str(tmp_path / "other"))
+    assert not (tmp_path / "escaped.tex").exists()
+
+
+def test_broker_incomplete():
+    """Tests that a broker which misses a method can not be created."""
+    class IncompleteBroker(workers.Broker):
+        def submit(self, project_dir, file_name, options):
+            return "job"
+
+    with pytest.raises(TypeError):
+        IncompleteBroker()
+
+
+def test_open_broker(tmp_path):
+    """Tests that brokers are looked up by the scheme of the url."""
+    broker = workers.open_broker(f"sqlite:{tmp_path}")
+
+    assert isinstance(broker, workers.SQLiteBroker)
+    assert broker.folder == str(tmp_path)
+
+    with pytest.raises(ValueError):
+        workers.open_broker("unknown:queue")